@@ -0,0 +1,117 @@
+# carteira/aging.py
+"""
+Aging dos recebíveis: saldo em aberto por faixa de dias de atraso (a vencer, 0–30, 31–60,
+61–90, 90+), por lojista e, opcionalmente, por cliente.
+
+Uma única agregação com Case/When sobre ContaCarteira. As faixas são comparações de
+`vencimento` com datas fixas calculadas em Python (hoje − 30, − 60, − 90), sem aritmética de
+datas no SQL: a consulta é a mesma no MySQL e no SQLite e percorre o índice
+(owner, status, vencimento) só nas contas com saldo (EM_ABERTO/ATRASO).
+
+O relatório do lojista fica no cache com a data do dia na chave (as faixas mudam à meia-noite)
+e é apagado junto com os totais do dashboard (totais.invalidar_totais) a cada mudança nas contas.
+Como os totais, ele é calculado no primário mesmo nas views que leem da réplica.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Case, Count, DecimalField, F, Q, Sum, When
+from django.utils import timezone
+
+from .models import ContaCarteira
+
+DEC = DecimalField(max_digits=12, decimal_places=2)
+ZERO = Decimal("0.00")
+CACHE_TIMEOUT = getattr(settings, "CARTEIRA_AGING_CACHE_TIMEOUT", 24 * 60 * 60)
+LIMITE_CLIENTES = 200
+
+# (chave, rótulo, dias mínimos de atraso); "a_vencer" inclui contas sem vencimento
+FAIXAS = (
+    ("a_vencer", "A vencer", None),
+    ("d0_30", "0–30 dias", 0),
+    ("d31_60", "31–60 dias", 31),
+    ("d61_90", "61–90 dias", 61),
+    ("d90_mais", "90+ dias", 91),
+)
+
+
+def _chave(owner_id, hoje, por_cliente):
+    return f"carteira:aging:{owner_id}:{hoje:%Y%m%d}:{'clientes' if por_cliente else 'total'}"
+
+
+def chaves_do_dia(owner_id):
+    hoje = timezone.localdate()
+    return [_chave(owner_id, hoje, False), _chave(owner_id, hoje, True)]
+
+
+def _condicoes(hoje):
+    """Q de cada faixa. 0–30 começa no dia do vencimento (vencimento == hoje: 0 dias)."""
+    limites = [dias for _, _, dias in FAIXAS if dias is not None]
+    conds = {}
+    for chave, _, dias in FAIXAS:
+        if dias is None:
+            conds[chave] = Q(vencimento__isnull=True) | Q(vencimento__gt=hoje)
+            continue
+        q = Q(vencimento__lte=hoje - timedelta(days=dias))
+        proximo = next((d for d in limites if d > dias), None)
+        if proximo is not None:
+            q &= Q(vencimento__gt=hoje - timedelta(days=proximo))
+        conds[chave] = q
+    return conds
+
+
+def _agregados(hoje):
+    agg = {
+        chave: Sum(Case(When(cond, then=F("saldo")), default=ZERO, output_field=DEC), default=ZERO)
+        for chave, cond in _condicoes(hoje).items()
+    }
+    agg["saldo_total"] = Sum("saldo", default=ZERO)
+    agg["n_contas"] = Count("id")
+    return agg
+
+
+def _em_aberto(owner, using=None):
+    return ContaCarteira.objects.using(using).filter(owner=owner, is_deleted=False, status__in=("EM_ABERTO", "ATRASO"))
+
+
+def calcular(owner, cliente_id=None, por_cliente=False, hoje=None, limite=LIMITE_CLIENTES, using=None):
+    """
+    {"faixas": {...}, "total": ..., "contas": n} do lojista (ou só de `cliente_id`);
+    com `por_cliente`, lista desses dicts com "cliente_id"/"cliente" dos `limite` clientes
+    de maior saldo. `using` fixa o banco (None: o do router).
+    """
+    hoje = hoje or timezone.localdate()
+    qs = _em_aberto(owner, using)
+    if cliente_id is not None:
+        qs = qs.filter(cliente_id=cliente_id)
+    if not por_cliente:
+        return _linha(qs.aggregate(**_agregados(hoje)))
+    rows = (
+        qs.values("cliente_id", "cliente__nome")
+        .annotate(**_agregados(hoje))
+        .order_by("-saldo_total", "cliente_id")[:limite]
+    )
+    return [{"cliente_id": r["cliente_id"], "cliente": r["cliente__nome"], **_linha(r)} for r in rows]
+
+
+def _linha(r):
+    return {
+        "faixas": {chave: (r[chave] or ZERO).quantize(ZERO) for chave, _, _ in FAIXAS},
+        "total": (r["saldo_total"] or ZERO).quantize(ZERO),
+        "contas": r["n_contas"],
+    }
+
+
+def aging_do_lojista(owner, por_cliente=False):
+    """Relatório do dia do lojista inteiro, lido do cache quando possível."""
+    hoje = timezone.localdate()
+    chave = _chave(owner.pk, hoje, por_cliente)
+    relatorio = cache.get(chave)
+    if relatorio is None:
+        # no primário: o cache sobrevive à request e a réplica pode estar atrasada
+        relatorio = calcular(owner, por_cliente=por_cliente, hoje=hoje, using=DEFAULT_DB_ALIAS)
+        cache.set(chave, relatorio, CACHE_TIMEOUT)
+    return relatorio
@@ -0,0 +1,351 @@
+# carteira/api.py
+"""
+API JSON (v1) para os tablets de PDV e apps: clientes, contas, itens e pagamentos do lojista.
+
+Rotas (prefixo /api/v1/; mesma sessão de login do site, escritas com o cabeçalho X-CSRFToken):
+    GET   clientes/                 lista (?q=, ?campos=, ?cursor=, ?limite=)
+    POST  clientes/                 cria cliente {"nome", "cpf", "telefone", "email", "endereco"}
+    GET   clientes/<id>/            um cliente (?campos=)
+    PATCH clientes/<id>/            altera só os campos enviados
+    GET   contas/                   lista (?status=, ?cliente=, ?q=, ?venc_ini=, ?venc_fim=, ?campos=, ?cursor=, ?limite=)
+    POST  contas/                   cria conta {"cliente_id", "vencimento", "itens": [{"produto", "quantidade", "valor_unit"}]}
+    GET   contas/<id>/              conta com itens e pagamentos (?campos=)
+    POST  contas/<id>/pagamentos/   registra pagamento {"valor", "data_pagamento", "observacao"}
+
+Respostas compactas: só os campos de ?campos=a,b,c (padrão: todos), decimais como texto,
+datas ISO. Listas em páginas por cursor (carteira.pagination): {"results": [...], "next": cursor|null}.
+Erros: {"error": "...", "erros": {campo: [mensagens]}} com 400/401/404/412.
+
+ETag / If-None-Match (304 sem montar a resposta):
+- conta: ContaCarteira.versao, que sobe a cada item, pagamento, mudança de status ou do cliente
+  (a mesma versão dos recibos em cache) — o 304 custa uma consulta pela chave primária;
+- lista de contas: totais.versao_do_lojista, apagada junto com os totais a cada mudança nas contas;
+- clientes: sugestoes.geracao, nova a cada cliente salvo/apagado.
+As duas últimas vêm do cache, sem consultar o banco; com mais de um processo, o cache precisa
+ser compartilhado (como para os totais). If-Match no PATCH de cliente e no POST de pagamento
+recusa (412) a escrita sobre um estado que o aparelho não viu.
+
+As leituras ficam no primário (sem @le_da_replica): a versão do cache muda no commit do
+primário e, servida com dados de uma réplica atrasada, marcaria dados antigos com o ETag novo.
+"""
+import json
+from functools import wraps
+from operator import attrgetter
+
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.http import quote_etag
+from django.views.decorators.http import condition, require_http_methods
+
+from . import sugestoes
+from .busca import buscar_clientes
+from .forms import ClienteForm, ContaForm, ItemInlineForm, PagamentoForm
+from .models import Cliente, ContaCarteira, ItemVenda, Pagamento
+from .pagination import PAGE_SIZE, keyset_page
+from .services import registrar_venda
+from .totais import versao_do_lojista
+from .utils import log_event
+from .views import _apply_filters
+
+VERSAO = 1  # entra nos ETags: mudar o formato das respostas invalida o que os aparelhos guardaram
+LIMITE_MAXIMO = 200
+
+
+# ====== CAMPOS (nome na resposta -> (caminho para .only(), leitura na instância)) ======
+def _itens(conta):
+    return [
+        {"id": i.id, "produto": i.produto, "quantidade": i.quantidade, "valor_unit": i.valor_unit, "subtotal": i.subtotal()}
+        for i in conta.itens.all()
+    ]
+
+
+def _pagamento(p):
+    return {"id": p.id, "valor": p.valor, "data_pagamento": p.data_pagamento, "observacao": p.observacao}
+
+
+def _pagamentos(conta):
+    return [_pagamento(p) for p in conta.pagamentos.all()]
+
+
+CAMPOS_CLIENTE = {
+    campo: (campo, attrgetter(campo)) for campo in ("id", "nome", "cpf", "telefone", "email", "endereco")
+}
+
+CAMPOS_CONTA = {
+    "id": ("id", attrgetter("id")),
+    "cliente_id": ("cliente", attrgetter("cliente_id")),
+    "cliente_nome": ("cliente__nome", attrgetter("cliente.nome")),
+    **{
+        campo: (campo, attrgetter(campo))
+        for campo in ("criado_em", "vencimento", "total", "total_pago", "saldo", "status", "versao")
+    },
+}
+
+# só no detalhe da conta (uma consulta a mais cada, e só se pedidos)
+CAMPOS_DETALHE = {**CAMPOS_CONTA, "itens": (None, _itens), "pagamentos": (None, _pagamentos)}
+
+
+def _campos(request, tabela):
+    """Campos pedidos em ?campos= (todos se ausente) ou None se algum não existe."""
+    pedidos = list(dict.fromkeys(c.strip() for c in request.GET.get("campos", "").split(",") if c.strip()))
+    if not pedidos:
+        return list(tabela)
+    return None if set(pedidos) - tabela.keys() else pedidos
+
+
+def _only(qs, campos, tabela):
+    """Lê só as colunas dos campos pedidos (e o JOIN com o cliente só se o nome foi pedido)."""
+    caminhos = {"id"} | {tabela[c][0] for c in campos if tabela[c][0]}
+    relacoes = {c.split("__")[0] for c in caminhos if "__" in c}
+    if relacoes:
+        qs = qs.select_related(*relacoes)
+    return qs.only(*caminhos | relacoes)
+
+
+def _dados(obj, campos, tabela):
+    return {c: tabela[c][1](obj) for c in campos}
+
+
+def _limite(request):
+    try:
+        return min(max(int(request.GET.get("limite", PAGE_SIZE)), 1), LIMITE_MAXIMO)
+    except ValueError:
+        return PAGE_SIZE
+
+
+def _pagina(request, qs, campos, tabela, direcao):
+    rows, proximo = keyset_page(
+        _only(qs, campos, tabela), "id", direcao, request.GET.get("cursor"), limit=_limite(request),
+    )
+    return JsonResponse({"results": [_dados(r, campos, tabela) for r in rows], "next": proximo})
+
+
+# ====== HELPERS ======
+def _erro(mensagem, status=400, erros=None):
+    corpo = {"error": mensagem}
+    if erros:
+        corpo["erros"] = erros
+    return JsonResponse(corpo, status=status)
+
+
+def _erros(*forms):
+    return {campo: [str(m) for m in msgs] for form in forms for campo, msgs in form.errors.items()}
+
+
+def _corpo(request):
+    """Corpo JSON da request (dict) ou None se inválido."""
+    try:
+        dados = json.loads(request.body or b"{}")
+    except ValueError:
+        return None
+    return dados if isinstance(dados, dict) else None
+
+
+def _api(view):
+    """401 em JSON (em vez do redirect do login_required) e respostas sempre revalidadas pelo ETag."""
+    @wraps(view)
+    def _wrapped(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return _erro("autenticação necessária", status=401)
+        response = view(request, *args, **kwargs)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    return _wrapped
+
+
+# ====== ETAGS ======
+def _etag_da_conta(conta_id, versao):
+    return f"v{VERSAO}-conta-{conta_id}-{versao}"
+
+
+def _etag_conta(request, conta_id):
+    qs = ContaCarteira.objects.filter(owner=request.user, is_deleted=False, pk=conta_id)
+    if request.method not in ("GET", "HEAD"):
+        # escrita: trava a conta até o commit, para o If-Match valer até a gravação
+        qs = qs.select_for_update()
+    versao = qs.values_list("versao", flat=True).first()
+    return None if versao is None else _etag_da_conta(conta_id, versao)
+
+
+def _etag_contas(request):
+    return f"v{VERSAO}-contas-{versao_do_lojista(request.user.pk)}"
+
+
+def _etag_clientes(request, cliente_id=None):
+    return f"v{VERSAO}-clientes-{sugestoes.geracao(request.user.pk)}"
+
+
+# ====== CLIENTES ======
+@_api
+@require_http_methods(["GET", "HEAD", "POST"])
+@condition(etag_func=_etag_clientes)
+def clientes(request):
+    if request.method == "POST":
+        return _criar_cliente(request)
+    campos = _campos(request, CAMPOS_CLIENTE)
+    if campos is None:
+        return _erro("campos inválidos")
+    q = request.GET.get("q", "").strip()
+    qs = buscar_clientes(request.user, q) if q else Cliente.objects.filter(owner=request.user)
+    return _pagina(request, qs.order_by("id"), campos, CAMPOS_CLIENTE, "asc")
+
+
+@_api
+@require_http_methods(["GET", "HEAD", "PATCH"])
+@condition(etag_func=_etag_clientes)
+def cliente(request, cliente_id):
+    if request.method == "PATCH":
+        return _alterar_cliente(request, cliente_id)
+    campos = _campos(request, CAMPOS_CLIENTE)
+    if campos is None:
+        return _erro("campos inválidos")
+    obj = _only(Cliente.objects.filter(owner=request.user, pk=cliente_id), campos, CAMPOS_CLIENTE).first()
+    if obj is None:
+        return _erro("cliente não encontrado", status=404)
+    return JsonResponse(_dados(obj, campos, CAMPOS_CLIENTE))
+
+
+@transaction.atomic
+def _criar_cliente(request):
+    dados = _corpo(request)
+    if dados is None:
+        return _erro("JSON inválido")
+    form = ClienteForm(dados)
+    if not form.is_valid():
+        return _erro("dados inválidos", erros=_erros(form))
+    obj = form.save(commit=False)
+    obj.owner = request.user
+    obj.save()
+    return JsonResponse(_dados(obj, list(CAMPOS_CLIENTE), CAMPOS_CLIENTE), status=201)
+
+
+@transaction.atomic
+def _alterar_cliente(request, cliente_id):
+    obj = Cliente.objects.filter(owner=request.user, pk=cliente_id).first()
+    if obj is None:
+        return _erro("cliente não encontrado", status=404)
+    dados = _corpo(request)
+    if dados is None:
+        return _erro("JSON inválido")
+    editaveis = ClienteForm._meta.fields
+    if set(dados) - set(editaveis):
+        return _erro("campos inválidos", erros={c: ["não editável"] for c in set(dados) - set(editaveis)})
+    form = ClienteForm({**{c: getattr(obj, c) for c in editaveis}, **dados}, instance=obj)
+    if not form.is_valid():
+        return _erro("dados inválidos", erros=_erros(form))
+    form.save()
+    return JsonResponse(_dados(obj, list(CAMPOS_CLIENTE), CAMPOS_CLIENTE))
+
+
+# ====== CONTAS ======
+@_api
+@require_http_methods(["GET", "HEAD", "POST"])
+@condition(etag_func=_etag_contas)
+def contas(request):
+    if request.method == "POST":
+        return _criar_conta(request)
+    campos = _campos(request, CAMPOS_CONTA)
+    if campos is None:
+        return _erro("campos inválidos")
+    qs = _apply_filters(ContaCarteira.objects.filter(owner=request.user, is_deleted=False), request.GET, request.user)
+    cliente_id = request.GET.get("cliente", "").strip()
+    if cliente_id:
+        if not cliente_id.isdigit():
+            return _erro("cliente inválido")
+        qs = qs.filter(cliente_id=int(cliente_id))
+    return _pagina(request, qs.order_by("-id"), campos, CAMPOS_CONTA, "desc")
+
+
+def _detalhe(owner, conta_id, campos):
+    qs = _only(ContaCarteira.objects.filter(owner=owner, is_deleted=False, pk=conta_id), campos, CAMPOS_DETALHE)
+    if "itens" in campos:
+        qs = qs.prefetch_related(Prefetch("itens", queryset=ItemVenda.objects.order_by("id")))
+    if "pagamentos" in campos:
+        qs = qs.prefetch_related(Prefetch("pagamentos", queryset=Pagamento.objects.order_by("id")))
+    obj = qs.first()
+    return None if obj is None else _dados(obj, campos, CAMPOS_DETALHE)
+
+
+def _com_etag(corpo, conta, status=200):
+    """Resposta de escrita com o ETag novo da conta (o aparelho não precisa reler para o próximo If-Match)."""
+    resp = JsonResponse(corpo, status=status)
+    resp["ETag"] = quote_etag(_etag_da_conta(conta["id"], conta["versao"]))
+    return resp
+
+
+@_api
+@require_http_methods(["GET", "HEAD"])
+@condition(etag_func=_etag_conta)
+def conta(request, conta_id):
+    campos = _campos(request, CAMPOS_DETALHE)
+    if campos is None:
+        return _erro("campos inválidos")
+    dados = _detalhe(request.user, conta_id, campos)
+    if dados is None:
+        return _erro("conta não encontrada", status=404)
+    return JsonResponse(dados)
+
+
+@transaction.atomic
+def _criar_conta(request):
+    dados = _corpo(request)
+    if dados is None:
+        return _erro("JSON inválido")
+    cliente_id = str(dados.get("cliente_id", ""))
+    cliente = Cliente.objects.filter(owner=request.user, pk=cliente_id).first() if cliente_id.isdigit() else None
+    if cliente is None:
+        return _erro("dados inválidos", erros={"cliente_id": ["cliente não encontrado"]})
+    conta_form = ContaForm({"vencimento": dados.get("vencimento")})
+    itens = dados.get("itens")
+    if not isinstance(itens, list) or not itens or not all(isinstance(i, dict) for i in itens):
+        return _erro("dados inválidos", erros={"itens": ["informe ao menos um item"]})
+    itens_forms = [ItemInlineForm(i) for i in itens]
+    if not conta_form.is_valid() or not all(f.is_valid() for f in itens_forms):
+        erros = _erros(conta_form)
+        erros.update({f"itens.{n}.{c}": m for n, f in enumerate(itens_forms) for c, m in _erros(f).items()})
+        return _erro("dados inválidos", erros=erros)
+
+    nova = registrar_venda(
+        request.user, cliente, conta_form.cleaned_data.get("vencimento"), [f.cleaned_data for f in itens_forms],
+    )
+    log_event(
+        request,
+        action="conta_criar",
+        descricao=f"Usuário {request.user}: Criou conta #{nova.id} para {cliente.nome}",
+        extra={"conta_id": nova.id, "cliente_id": cliente.id},
+    )
+    detalhe = _detalhe(request.user, nova.id, list(CAMPOS_DETALHE))
+    return _com_etag(detalhe, detalhe, status=201)
+
+
+@_api
+@require_http_methods(["POST"])
+@transaction.atomic
+@condition(etag_func=_etag_conta)
+def pagamentos(request, conta_id):
+    obj = ContaCarteira.objects.filter(owner=request.user, is_deleted=False, pk=conta_id).first()
+    if obj is None:
+        return _erro("conta não encontrada", status=404)
+    dados = _corpo(request)
+    if dados is None:
+        return _erro("JSON inválido")
+    form = PagamentoForm(dados)
+    if not form.is_valid():
+        return _erro("dados inválidos", erros=_erros(form))
+    pgto = form.save(commit=False)
+    pgto.conta = obj
+    if not pgto.data_pagamento:
+        pgto.data_pagamento = timezone.now()
+    pgto.save()
+    log_event(
+        request,
+        action="pgto_registrar",
+        descricao=f"Usuário {request.user}: Registrou pagamento #{pgto.id} na conta #{obj.id} (R$ {pgto.valor})",
+        extra={"conta_id": obj.id, "pagamento_id": pgto.id, "valor": str(pgto.valor)},
+    )
+    obj.refresh_from_db(fields=["total", "total_pago", "saldo", "status", "versao"])
+    resumo_conta = _dados(obj, ["id", "total", "total_pago", "saldo", "status", "versao"], CAMPOS_CONTA)
+    return _com_etag({"pagamento": _pagamento(pgto), "conta": resumo_conta}, resumo_conta, status=201)
@@ -0,0 +1,195 @@
+# carteira/arquivo.py
+"""
+Arquivo mensal do AuditLog em disco (JSONL comprimido).
+
+A tabela guarda só os meses "quentes" (CARTEIRA_AUDIT_MESES_QUENTES, padrão 3, contando o
+mês atual). O comando `arquivar_auditoria` move cada mês mais antigo para um arquivo por
+usuário, `<CARTEIRA_AUDIT_ARQUIVO_DIR>/AAAA-MM/<user_id>.jsonl.gz` ("sem-usuario" para os
+registros sem usuário), e apaga as linhas da tabela. `ler_mes` lê um mês arquivado sob demanda
+(usado pelo histórico), em streaming: o histórico de um lojista abre só os arquivos dele, e o
+custo não cresce com o volume dos outros lojistas.
+
+Arquivos do formato antigo, um por mês para todos (`auditlog-AAAA-MM*.jsonl.gz`), continuam
+sendo lidos (filtrados por usuário) e entram na retenção.
+"""
+import gzip
+import heapq
+import json
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import AuditLog
+
+MESES_QUENTES = getattr(settings, "CARTEIRA_AUDIT_MESES_QUENTES", 3)
+# None = arquivos guardados para sempre
+RETENCAO_MESES = getattr(settings, "CARTEIRA_AUDIT_RETENCAO_MESES", None)
+LEGADO = "auditlog-"
+CAMPOS = ["id", "user_id", "action", "descricao", "created_at", "path", "method", "ip", "user_agent", "extra"]
+
+
+def diretorio():
+    padrao = Path(getattr(settings, "BASE_DIR", ".")) / "arquivo_auditoria"
+    return Path(getattr(settings, "CARTEIRA_AUDIT_ARQUIVO_DIR", padrao))
+
+
+def _inicio_mes(ano, mes):
+    return timezone.make_aware(datetime(ano, mes, 1))
+
+
+def _somar_meses(ano, mes, n):
+    total = ano * 12 + (mes - 1) + n
+    return total // 12, total % 12 + 1
+
+
+def corte(meses_quentes=MESES_QUENTES):
+    """Início do mês mais antigo que continua na tabela."""
+    hoje = timezone.localdate()
+    return _inicio_mes(*_somar_meses(hoje.year, hoje.month, -(meses_quentes - 1)))
+
+
+def meses_frios(meses_quentes=MESES_QUENTES):
+    """(ano, mes) com registros na tabela anteriores ao corte."""
+    datas = AuditLog.objects.filter(created_at__lt=corte(meses_quentes)).dates("created_at", "month")
+    return [(d.year, d.month) for d in datas]
+
+
+def meses_arquivados():
+    """["AAAA-MM", ...] do mais recente para o mais antigo."""
+    pasta = diretorio()
+    if not pasta.exists():
+        return []
+    meses = {p.name[len(LEGADO):][:7] for p in pasta.glob(f"{LEGADO}*.jsonl.gz")}
+    meses |= {d.name for d in pasta.iterdir() if d.is_dir() and any(d.glob("*.jsonl.gz"))}
+    return sorted(meses, reverse=True)
+
+
+def _dono(user_id):
+    return "sem-usuario" if user_id is None else str(user_id)
+
+
+def _parte(arq):
+    """
+    N do sufixo ".N" (0 sem sufixo): auditlog-AAAA-MM.N.jsonl.gz no formato antigo,
+    <user_id>.N.jsonl.gz na pasta do mês.
+    """
+    base = arq.name[:-len(".jsonl.gz")]
+    sufixo = base[len(f"{LEGADO}AAAA-MM"):] if base.startswith(LEGADO) else base.partition(".")[2]
+    return int(sufixo.lstrip(".") or 0)
+
+
+def _partes_do_dono(pasta_mes, user_id):
+    # "<id>.*jsonl.gz" pega "<id>.jsonl.gz" e "<id>.N.jsonl.gz", mas não "<id>0.jsonl.gz"
+    return sorted(pasta_mes.glob(f"{_dono(user_id)}.*jsonl.gz"), key=_parte)
+
+
+def _arquivos_do_mes(ano_mes, user_id=None):
+    """
+    Arquivos do mês, do formato antigo e depois da pasta do mês, cada grupo em ordem numérica
+    de parte ("2024-01.2" antes de "2024-01.10"; a base antes de todas). Com `user_id`, da pasta
+    do mês só os desse usuário.
+    """
+    arquivos = sorted(diretorio().glob(f"{LEGADO}{ano_mes}*.jsonl.gz"), key=_parte)
+    pasta_mes = diretorio() / ano_mes
+    if user_id is not None:
+        return arquivos + _partes_do_dono(pasta_mes, user_id)
+    return arquivos + sorted(pasta_mes.glob("*.jsonl.gz"), key=lambda a: (a.name.partition(".")[0], _parte(a)))
+
+
+def _linha(log):
+    d = {c: getattr(log, c) for c in CAMPOS}
+    d["created_at"] = log.created_at.isoformat()
+    return json.dumps(d, ensure_ascii=False, default=str)
+
+
+def arquivar_mes(ano, mes, lote=2000):
+    """
+    Grava o mês em novos arquivos (um por usuário; lendo em ordem de usuário, só um fica aberto
+    por vez) e só então apaga as linhas da tabela. Se o processo cair entre uma coisa e outra, a
+    próxima execução gera outra parte do mesmo mês e `ler_mes` descarta ids repetidos.
+    """
+    inicio = _inicio_mes(ano, mes)
+    fim = _inicio_mes(*_somar_meses(ano, mes, 1))
+    qs = AuditLog.objects.filter(created_at__gte=inicio, created_at__lt=fim).order_by("user_id", "id")
+
+    pasta_mes = diretorio() / f"{ano:04d}-{mes:02d}"
+    gravados = []  # (tmp, destino)
+    ids = []
+    f = None
+    try:
+        for log in qs.iterator(chunk_size=lote):
+            if f is None or log.user_id != atual:
+                if f is not None:
+                    f.close()
+                atual = log.user_id
+                pasta_mes.mkdir(parents=True, exist_ok=True)
+                parte = len(_partes_do_dono(pasta_mes, atual))
+                destino = pasta_mes / (f"{_dono(atual)}.jsonl.gz" if not parte else f"{_dono(atual)}.{parte}.jsonl.gz")
+                gravados.append((destino.with_suffix(".tmp"), destino))
+                f = gzip.open(gravados[-1][0], "wt", encoding="utf-8")
+            f.write(_linha(log) + "\n")
+            ids.append(log.id)
+    finally:
+        if f is not None:
+            f.close()
+    for tmp, destino in gravados:
+        tmp.rename(destino)
+
+    for i in range(0, len(ids), lote):
+        AuditLog.objects.filter(id__in=ids[i:i + lote]).delete()
+    return len(ids)
+
+
+def remover_arquivos_antigos(retencao_meses=RETENCAO_MESES):
+    """Apaga arquivos de meses além da retenção. Retorna os meses removidos."""
+    if retencao_meses is None:
+        return []
+    hoje = timezone.localdate()
+    limite = "%04d-%02d" % _somar_meses(hoje.year, hoje.month, -retencao_meses)
+    removidos = [m for m in meses_arquivados() if m < limite]
+    for m in removidos:
+        for arq in diretorio().glob(f"{LEGADO}{m}*.jsonl.gz"):
+            arq.unlink()
+        shutil.rmtree(diretorio() / m, ignore_errors=True)
+    return removidos
+
+
+def ler_mes(ano_mes, user_id=None, q=None, limite=None):
+    """
+    Registros arquivados de um mês ("AAAA-MM"), do mais recente para o mais antigo, como
+    instâncias de AuditLog não salvas. Com `user_id`, abre só os arquivos desse usuário (e os do
+    formato antigo). Lê em streaming e guarda só os `limite` mais recentes (heap de
+    (created_at, id)): a memória não cresce com o tamanho do mês.
+    """
+    if limite is not None and limite <= 0:
+        return []
+    q = (q or "").lower()
+    heap, dados = [], {}  # chaves (created_at, id) retidas; id -> linha
+    for arq in _arquivos_do_mes(ano_mes, user_id):
+        with gzip.open(arq, "rt", encoding="utf-8") as f:
+            for linha in f:
+                d = json.loads(linha)
+                if user_id is not None and d["user_id"] != user_id:
+                    continue
+                if q and q not in (d["descricao"] or "").lower():
+                    continue
+                # id repetido (parte regravada depois de uma falha no arquivamento): se já está
+                # retido é ignorado; se já saiu do heap, a chave é menor que todas as retidas
+                if d["id"] in dados:
+                    continue
+                chave = (d["created_at"], d["id"])
+                if limite is None or len(heap) < limite:
+                    heapq.heappush(heap, chave)
+                elif chave > heap[0]:
+                    del dados[heapq.heapreplace(heap, chave)[1]]
+                else:
+                    continue
+                dados[d["id"]] = d
+    return [
+        AuditLog(**{**dados[pk], "created_at": parse_datetime(dados[pk]["created_at"])})
+        for _, pk in sorted(heap, reverse=True)
+    ]
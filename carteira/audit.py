@@ -0,0 +1,101 @@
+# carteira/audit.py
+"""
+Gravação assíncrona e em lote do AuditLog.
+
+`utils.log_event` monta o registro e o entrega aqui no commit da transação da request.
+Uma thread em segundo plano esvazia a fila com bulk_create, então a escrita sai do
+caminho da resposta. A fila é limitada: se encher, quem chamou espera um pouco e, se
+ainda assim não couber, grava o próprio registro (backpressure em vez de perder eventos).
+Na saída do processo o que restou na fila é gravado.
+
+Configuração (settings, todas opcionais):
+- CARTEIRA_AUDIT_ASSINCRONO (True): False grava na hora, sem fila;
+- CARTEIRA_AUDIT_FILA (10000): tamanho máximo da fila;
+- CARTEIRA_AUDIT_LOTE (200): registros por bulk_create;
+- CARTEIRA_AUDIT_ESPERA (0.05): segundos esperando vaga na fila cheia.
+"""
+import atexit
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import AuditLog
+from .replica import escrita_de_fundo
+
+logger = logging.getLogger(__name__)
+
+ASSINCRONO = getattr(settings, "CARTEIRA_AUDIT_ASSINCRONO", True)
+TAMANHO_FILA = getattr(settings, "CARTEIRA_AUDIT_FILA", 10000)
+LOTE = getattr(settings, "CARTEIRA_AUDIT_LOTE", 200)
+ESPERA_FILA_CHEIA = getattr(settings, "CARTEIRA_AUDIT_ESPERA", 0.05)
+
+_fila = queue.Queue(maxsize=TAMANHO_FILA)
+_gravando = threading.Lock()
+_iniciar_lock = threading.Lock()
+_thread = None
+
+
+def _gravar(lote):
+    try:
+        AuditLog.objects.bulk_create(lote, batch_size=LOTE)
+    except Exception:
+        # não quebrar a aplicação por falha de log
+        logger.exception("Falha ao gravar %d registro(s) de auditoria", len(lote))
+
+
+def _retirar(primeiro=None):
+    lote = [primeiro] if primeiro is not None else []
+    while len(lote) < LOTE:
+        try:
+            lote.append(_fila.get_nowait())
+        except queue.Empty:
+            break
+    return lote
+
+
+def flush():
+    """Grava agora tudo o que está na fila (usado no encerramento e onde a leitura precisa estar em dia)."""
+    # a fila é do processo: gravá-la não conta como escrita da request (carteira.replica)
+    with _gravando, escrita_de_fundo():
+        while True:
+            lote = _retirar()
+            if not lote:
+                return
+            _gravar(lote)
+
+
+def _trabalhador():
+    while True:
+        primeiro = _fila.get()
+        with _gravando:
+            close_old_connections()
+            _gravar(_retirar(primeiro))
+
+
+def _iniciar():
+    global _thread
+    if _thread is not None:
+        return
+    with _iniciar_lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_trabalhador, name="carteira-audit", daemon=True)
+            _thread.start()
+            atexit.register(flush)
+
+
+def registrar(evento):
+    """Enfileira um AuditLog ainda não salvo. Nunca levanta exceção."""
+    try:
+        if not ASSINCRONO:
+            _gravar([evento])
+            return
+        _iniciar()
+        try:
+            _fila.put(evento, timeout=ESPERA_FILA_CHEIA)
+        except queue.Full:
+            _gravar([evento])
+    except Exception:
+        logger.exception("Falha ao registrar evento de auditoria")
@@ -0,0 +1,216 @@
+# carteira/busca.py
+"""
+Busca de clientes por nome, CPF/CNPJ, telefone e e-mail.
+
+Cada cliente guarda:
+- `Cliente.busca`: texto normalizado (minúsculo, sem acentos, só dígitos em CPF/telefone);
+- linhas em `ClienteTermo`: um termo por palavra/documento, indexado por (owner, termo, cliente).
+
+A consulta casa o início de cada termo usando esse índice, sem varrer a tabela.
+Em PostgreSQL com a extensão pg_trgm instalada, usa-se `busca` com o índice trigram
+(casa trechos no meio das palavras).
+"""
+import re
+import unicodedata
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.db.models import Exists, OuterRef
+
+from .models import Cliente, ClienteTermo
+
+LIMITE_TERMO = 64
+_PONTUACAO_DOC = re.compile(r"[\d.\-/() ]+")
+_trigram_ok = {}
+
+
+def normalizar(texto):
+    """minúsculas + sem acentos ("João" -> "joao")."""
+    texto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(ch for ch in texto if not unicodedata.combining(ch)).lower().strip()
+
+
+def _digitos(texto):
+    return re.sub(r"\D+", "", texto or "")
+
+
+def _palavras(texto):
+    return re.findall(r"[^\W_]+", normalizar(texto))
+
+
+def texto_busca(nome, cpf, telefone, email):
+    return " ".join(p for p in (normalizar(nome), _digitos(cpf), _digitos(telefone), normalizar(email)) if p)
+
+
+def termos(nome, cpf, telefone, email):
+    """Termos indexados de um cliente (sem repetição)."""
+    out = list(_palavras(nome))
+    doc = _digitos(cpf)
+    if doc:
+        out.append(doc)
+    tel = _digitos(telefone)
+    if tel:
+        out.append(tel)
+        if len(tel) >= 10:
+            out.append(tel[2:])  # sem DDD
+    email = normalizar(email)
+    if email:
+        out.append(email)
+        out.extend(_palavras(email.split("@")[0]))
+    return list(dict.fromkeys(t[:LIMITE_TERMO] for t in out))
+
+
+def termos_da_consulta(q):
+    out = []
+    for palavra in normalizar(q).split():
+        if "@" in palavra:
+            out.append(palavra)
+        elif _PONTUACAO_DOC.fullmatch(palavra):
+            if _digitos(palavra):
+                out.append(_digitos(palavra))
+        else:
+            out.extend(_palavras(palavra))
+    return [t[:LIMITE_TERMO] for t in out]
+
+
+# ====== ÍNDICE ======
+def indexar_cliente(cliente):
+    """Regrava os termos de um cliente (chamado no post_save de Cliente)."""
+    ClienteTermo.objects.filter(cliente_id=cliente.pk).delete()
+    ClienteTermo.objects.bulk_create([
+        ClienteTermo(owner_id=cliente.owner_id, cliente_id=cliente.pk, termo=t)
+        for t in termos(cliente.nome, cliente.cpf, cliente.telefone, cliente.email)
+    ])
+    from .sugestoes import invalidar
+    invalidar(cliente.owner_id)
+
+
+def indexar_em_lote(clientes):
+    """
+    Termos de vários clientes criados com bulk_create (que não dispara o post_save).
+
+    São ~10 termos por cliente: o INSERT vai direto por executemany, sem instanciar um
+    ClienteTermo por linha (o custo do ORM dominava a importação em massa).
+    """
+    linhas = [
+        (c.owner_id, c.pk, t)
+        for c in clientes
+        for t in termos(c.nome, c.cpf, c.telefone, c.email)
+    ]
+    if not linhas:
+        return
+    from .sugestoes import invalidar
+    invalidar(*{c.owner_id for c in clientes})
+    qn = connection.ops.quote_name
+    meta = ClienteTermo._meta
+    colunas = ", ".join(qn(meta.get_field(f).column) for f in ("owner", "cliente", "termo"))
+    sql = f"INSERT INTO {qn(meta.db_table)} ({colunas}) VALUES (%s, %s, %s)"
+    with connection.cursor() as cur:
+        for i in range(0, len(linhas), 2000):
+            cur.executemany(sql, linhas[i:i + 2000])
+
+
+# ====== CONSULTA ======
+def _usa_trigram():
+    if connection.vendor != "postgresql":
+        return False
+    if connection.alias not in _trigram_ok:
+        with connection.cursor() as cur:
+            cur.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _trigram_ok[connection.alias] = cur.fetchone() is not None
+    return _trigram_ok[connection.alias]
+
+
+async def ausa_trigram():
+    """_usa_trigram para código async: só vai ao banco (fora do event loop) na primeira vez, no PostgreSQL."""
+    if connection.vendor != "postgresql" or connection.alias in _trigram_ok:
+        return _usa_trigram()
+    return await sync_to_async(_usa_trigram)()
+
+
+def _faixa(termo):
+    """
+    Prefixo sargável: no SQLite o LIKE não usa índice (é case-insensitive), então vira faixa
+    em ordem binária; MySQL/PostgreSQL usam LIKE 'x%' direto no índice.
+    """
+    if connection.vendor == "sqlite":
+        return {"termo__gte": termo, "termo__lt": termo + "\uffff"}
+    return {"termo__startswith": termo}
+
+
+def _ids_com_termo(owner, termo):
+    return ClienteTermo.objects.filter(owner=owner, **_faixa(termo)).values("cliente_id")
+
+
+def buscar_clientes(owner, q):
+    """Queryset de Cliente do lojista que casa todas as palavras de `q` (sem ordenação definida)."""
+    qs = Cliente.objects.filter(owner=owner)
+    palavras = termos_da_consulta(q)
+    if _usa_trigram():
+        for p in palavras:
+            qs = qs.filter(busca__contains=p)
+        return qs
+    for p in palavras:
+        qs = qs.filter(id__in=_ids_com_termo(owner, p))
+    return qs
+
+
+def _candidatos(owner, palavras, limite):
+    """cliente_id dos termos que casam, na ordem do índice (owner, termo, cliente); com folga para repetidos."""
+    primeira, resto = palavras[0], palavras[1:]
+    qs = ClienteTermo.objects.filter(owner=owner, **_faixa(primeira))
+    for p in resto:
+        # EXISTS correlacionado: confere só os candidatos lidos, sem materializar a outra lista
+        qs = qs.filter(Exists(ClienteTermo.objects.filter(cliente_id=OuterRef("cliente_id"), **_faixa(p))))
+    return qs.order_by("termo", "cliente_id").values_list("cliente_id", flat=True)[:limite * 4]
+
+
+def sugerir_clientes(owner, q, limite=10):
+    """
+    Autocomplete: até `limite` clientes, em ordem de nome. Sem trigram, percorre o índice
+    (owner, termo, cliente) já ordenado e para no limite, sem ordenar todos os clientes que casam.
+    """
+    return _sugestoes(owner, q, limite)[0]
+
+
+def _sugestoes(owner, q, limite):
+    """(clientes, completo): `completo` diz que a lista tem todos os clientes que casam com `q`."""
+    palavras = termos_da_consulta(q)
+    if not palavras:
+        return [], True
+    if _usa_trigram():
+        clientes = list(buscar_clientes(owner, q).order_by("nome")[:limite])
+        return clientes, len(clientes) < limite
+
+    ids, lidos = [], 0
+    for cid in _candidatos(owner, palavras, limite):
+        lidos += 1
+        if cid not in ids:
+            ids.append(cid)
+            if len(ids) == limite:
+                break
+    return list(Cliente.objects.filter(id__in=ids).order_by("nome")), len(ids) < limite and lidos < limite * 4
+
+
+async def asugerir_clientes(owner, q, limite=10):
+    """sugerir_clientes para views async (ORM async)."""
+    return (await _asugestoes(owner, q, limite))[0]
+
+
+async def _asugestoes(owner, q, limite):
+    palavras = termos_da_consulta(q)
+    if not palavras:
+        return [], True
+    if await ausa_trigram():
+        clientes = [c async for c in buscar_clientes(owner, q).order_by("nome")[:limite]]
+        return clientes, len(clientes) < limite
+
+    ids, lidos = [], 0
+    async for cid in _candidatos(owner, palavras, limite):
+        lidos += 1
+        if cid not in ids:
+            ids.append(cid)
+            if len(ids) == limite:
+                break
+    clientes = [c async for c in Cliente.objects.filter(id__in=ids).order_by("nome")]
+    return clientes, len(ids) < limite and lidos < limite * 4
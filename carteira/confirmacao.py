@@ -0,0 +1,53 @@
+# carteira/confirmacao.py
+"""
+Confirmação por senha das ações destrutivas (excluir/restaurar conta) com janela de reuso.
+
+Cada `check_password` roda o hasher inteiro (PBKDF2 com centenas de milhares de iterações:
+dezenas/centenas de ms de CPU). Quem exclui ou restaura várias contas seguidas digitava a
+senha — e pagava o hash — a cada uma. Depois de uma senha correta, a sessão guarda uma marca
+válida por CARTEIRA_CONFIRMACAO_SEGUNDOS (300 s; 0 desliga): dentro da janela as próximas
+confirmações não pedem senha nem calculam hash.
+
+A marca fica na sessão do próprio usuário (não vale em outro navegador/sessão), tem prazo
+fixo (usar não renova) e leva o `get_session_auth_hash` do usuário: trocar a senha a invalida.
+Senha errada apaga a marca.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import update_session_auth_hash
+from django.utils.crypto import constant_time_compare
+
+SESSAO = "carteira_confirmado"
+
+
+def _janela():
+    return getattr(settings, "CARTEIRA_CONFIRMACAO_SEGUNDOS", 5 * 60)
+
+
+def recente(request):
+    """True se o usuário confirmou a senha nesta sessão há menos de CARTEIRA_CONFIRMACAO_SEGUNDOS."""
+    marca = request.session.get(SESSAO)
+    if not marca or not _janela():
+        return False
+    return marca["ate"] > time.time() and constant_time_compare(marca["hash"], request.user.get_session_auth_hash())
+
+
+def confirmar(request, senha):
+    """
+    Confirma a ação: dentro da janela não precisa de senha; fora dela, confere `senha`
+    (um hash) e abre uma nova janela. Retorna False se a senha for necessária e estiver errada.
+    """
+    if recente(request):
+        return True
+    hash_anterior = request.user.password
+    if not senha or not request.user.check_password(senha):
+        request.session.pop(SESSAO, None)
+        return False
+    if request.user.password != hash_anterior:
+        # check_password regravou o hash com a política atual (fiado_pro.hashers): sem isto a
+        # sessão deixaria de bater com o usuário e ele seria deslogado na próxima request
+        update_session_auth_hash(request, request.user)
+    if _janela():
+        request.session[SESSAO] = {"ate": time.time() + _janela(), "hash": request.user.get_session_auth_hash()}
+    return True
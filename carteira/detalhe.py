@@ -0,0 +1,47 @@
+# carteira/detalhe.py
+"""
+Carregamento das telas de uma conta (detalhe e recibos) num número fixo de consultas.
+
+- conta + cliente + lojista + Empresa do lojista: 1 consulta (JOINs);
+- itens, já com o subtotal calculado no banco (`valor_subtotal`): 1 consulta;
+- pagamentos: 1 consulta.
+
+Os templates continuam usando `conta.itens.all` / `conta.pagamentos.all`, que passam a
+ler do prefetch, e a empresa vem de `empresa_do_lojista(conta)` sem nova consulta.
+"""
+from django.db.models import DecimalField, ExpressionWrapper, F, Prefetch
+from django.shortcuts import get_object_or_404
+
+from .models import ContaCarteira, ItemVenda, Pagamento
+
+ITENS = ItemVenda.objects.annotate(
+    valor_subtotal=ExpressionWrapper(F("quantidade") * F("valor_unit"), output_field=DecimalField(max_digits=12, decimal_places=2)),
+).order_by("id")
+
+
+def carregar_conta(owner, conta_id, include_deleted=False):
+    """Conta do lojista com cliente, Empresa, itens e pagamentos (3 consultas) ou 404."""
+    qs = (
+        ContaCarteira.objects.filter(owner=owner)
+        .select_related("cliente", "owner__empresa")
+        .prefetch_related(
+            Prefetch("itens", queryset=ITENS),
+            Prefetch("pagamentos", queryset=Pagamento.objects.order_by("id")),
+        )
+    )
+    if not include_deleted:
+        qs = qs.filter(is_deleted=False)
+    return get_object_or_404(qs, pk=conta_id)
+
+
+def carregar_pagamento(owner, pagamento_id):
+    """Pagamento do lojista com conta, cliente e Empresa (1 consulta) ou 404."""
+    return get_object_or_404(
+        Pagamento.objects.filter(owner=owner).select_related("conta__cliente", "conta__owner__empresa"),
+        pk=pagamento_id,
+    )
+
+
+def empresa_do_lojista(conta):
+    """Empresa do dono da conta (já carregada pelo select_related) ou None se não cadastrada."""
+    return getattr(conta.owner, "empresa", None)
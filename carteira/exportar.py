@@ -0,0 +1,164 @@
+# carteira/exportar.py
+"""
+Exportação em streaming (CSV e XLSX) de contas, itens, pagamentos e clientes.
+
+As linhas são lidas em lotes por id (keyset), como tuplas, e escritas na resposta à medida
+que chegam: a memória não cresce com o tamanho da carteira e o primeiro byte sai antes de a
+consulta terminar. (Lotes por id em vez de um único `.iterator()`: o driver do MySQL traz o
+resultado inteiro para a memória do cliente.)
+"""
+import csv
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.utils import timezone
+
+LOTE = 2000
+
+EXPORTACOES = {
+    "contas": {
+        "cabecalho": ["id", "cliente", "cpf", "criado_em", "vencimento", "total", "pago", "saldo", "status"],
+        "campos": ["id", "cliente__nome", "cliente__cpf", "criado_em", "vencimento", "total", "total_pago", "saldo", "status"],
+    },
+    "itens": {
+        "cabecalho": ["id", "conta", "cliente", "produto", "quantidade", "valor_unit", "subtotal"],
+        "campos": ["id", "conta_id", "conta__cliente__nome", "produto", "quantidade", "valor_unit"],
+    },
+    "pagamentos": {
+        "cabecalho": ["id", "conta", "cliente", "data_pagamento", "valor", "observacao"],
+        "campos": ["id", "conta_id", "conta__cliente__nome", "data_pagamento", "valor", "observacao"],
+    },
+    "clientes": {
+        "cabecalho": ["id", "nome", "cpf", "telefone", "email", "endereco"],
+        "campos": ["id", "nome", "cpf", "telefone", "email", "endereco"],
+    },
+}
+
+
+def _valor(v):
+    if isinstance(v, datetime):
+        return timezone.localtime(v).strftime("%d/%m/%Y %H:%M")
+    if isinstance(v, date):
+        return v.strftime("%d/%m/%Y")
+    return "" if v is None else v
+
+
+def linhas(tipo, qs, lote=LOTE):
+    """Cabeçalho + tuplas do queryset, em lotes por id."""
+    cfg = EXPORTACOES[tipo]
+    yield cfg["cabecalho"]
+    qs = qs.order_by("id").values_list(*cfg["campos"])
+    ultimo = None
+    while True:
+        pagina = qs if ultimo is None else qs.filter(id__gt=ultimo)
+        bloco = list(pagina[:lote])
+        for row in bloco:
+            row = [_valor(v) for v in row]
+            if tipo == "itens":
+                row.append(row[4] * row[5])  # subtotal
+            yield row
+        if len(bloco) < lote:
+            return
+        ultimo = bloco[-1][0]
+
+
+# ====== CSV ======
+class _Eco:
+    """Buffer que só devolve o que recebe (csv.writer escrevendo direto na resposta)."""
+    def write(self, value):
+        return value
+
+
+def stream_csv(linhas):
+    # BOM + ';' para o Excel em pt-BR abrir acentos e colunas corretamente
+    yield "﻿"
+    writer = csv.writer(_Eco(), delimiter=";")
+    for row in linhas:
+        yield writer.writerow(row)
+
+
+# ====== XLSX ======
+class _Saida:
+    """Arquivo só-escrita e sem seek: o zipfile escreve aqui e o gerador repassa os bytes."""
+    def __init__(self):
+        self.partes = []
+
+    def write(self, b):
+        self.partes.append(bytes(b))
+        return len(b)
+
+    def flush(self):
+        pass
+
+    def esvaziar(self):
+        dados, self.partes = b"".join(self.partes), []
+        return dados
+
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{nome}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+
+# caracteres que o XML 1.0 não aceita nem escapados: um só invalida a planilha inteira no Excel
+_FORA_DO_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+
+def _texto_xml(v):
+    return escape(_FORA_DO_XML.sub("", str(v)))
+
+
+def _celula(v):
+    if isinstance(v, (int, Decimal)) and not isinstance(v, bool):
+        return f"<c><v>{v}</v></c>"
+    return f'<c t="inlineStr"><is><t>{_texto_xml(v)}</t></is></c>'
+
+
+def stream_xlsx(linhas, nome_planilha="Dados"):
+    """Planilha XLSX mínima (uma aba, strings inline) gerada em streaming, sem dependências."""
+    saida = _Saida()
+    with zipfile.ZipFile(saida, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _RELS)
+        zf.writestr("xl/workbook.xml", _WORKBOOK.format(nome=_texto_xml(nome_planilha)))
+        zf.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        yield saida.esvaziar()
+        with zf.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            for row in linhas:
+                sheet.write(("<row>" + "".join(_celula(v) for v in row) + "</row>").encode())
+                dados = saida.esvaziar()
+                if dados:
+                    yield dados
+            sheet.write(b"</sheetData></worksheet>")
+    yield saida.esvaziar()
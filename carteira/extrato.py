@@ -0,0 +1,150 @@
+# carteira/extrato.py
+"""
+Extrato do cliente: compras (itens) e pagamentos de todas as contas dele, em ordem
+cronológica, com saldo corrente (compras − pagamentos, sem o corte em zero do saldo da conta).
+
+- saldo anterior ao período: 2 agregações no banco (itens e pagamentos antes de `inicio`);
+- período: itens e pagamentos lidos em lotes keyset, já ordenados pelo banco, e intercalados
+  numa única passada (heapq.merge) que acumula o saldo linha a linha.
+
+Nada é carregado de uma vez: a memória fica em dois lotes, qualquer que seja o histórico do
+cliente. Contas excluídas (soft delete) não entram.
+
+A data de uma compra é a da conta (`criado_em`, início do dia); a de um pagamento é
+`data_pagamento`. No mesmo dia, as compras vêm antes dos pagamentos.
+"""
+import heapq
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import DecimalField, ExpressionWrapper, F, Q, Sum
+from django.utils import timezone
+
+from .models import ItemVenda, Pagamento
+
+LOTE = 1000
+DEC = DecimalField(max_digits=12, decimal_places=2)
+SUBTOTAL = ExpressionWrapper(F("quantidade") * F("valor_unit"), output_field=DEC)
+
+
+def _inicio_do_dia(dia):
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def _itens(owner, cliente_id):
+    return ItemVenda.objects.filter(owner=owner, conta__cliente_id=cliente_id, conta__is_deleted=False)
+
+
+def _pagamentos(owner, cliente_id):
+    return Pagamento.objects.filter(owner=owner, conta__cliente_id=cliente_id, conta__is_deleted=False)
+
+
+def _depois_de(campos, valores):
+    """Q de keyset: (campos) > (valores) em ordem lexicográfica."""
+    q = Q()
+    for i, campo in enumerate(campos):
+        iguais = {c: v for c, v in zip(campos[:i], valores[:i])}
+        q |= Q(**iguais, **{f"{campo}__gt": valores[i]})
+    return q
+
+
+def _em_lotes(qs, campos, lote):
+    """values() de `qs` ordenado por `campos`, lido em lotes keyset."""
+    qs = qs.order_by(*campos)
+    ultimo = None
+    while True:
+        pagina = qs if ultimo is None else qs.filter(_depois_de(campos, ultimo))
+        bloco = list(pagina[:lote])
+        yield from bloco
+        if len(bloco) < lote:
+            return
+        ultimo = [bloco[-1][c] for c in campos]
+
+
+# ====== SALDOS ======
+def _saldo(owner, cliente_id, antes_de=None):
+    itens, pagamentos = _itens(owner, cliente_id), _pagamentos(owner, cliente_id)
+    if antes_de is not None:
+        itens = itens.filter(conta__criado_em__lt=antes_de)
+        pagamentos = pagamentos.filter(data_pagamento__lt=_inicio_do_dia(antes_de))
+    compras = itens.aggregate(t=Sum(SUBTOTAL, default=Decimal("0")))["t"]
+    pagos = pagamentos.aggregate(t=Sum("valor", default=Decimal("0")))["t"]
+    return compras - pagos
+
+
+def saldo_anterior(owner, cliente_id, inicio):
+    """Compras − pagamentos do cliente antes de `inicio` (date); 0 sem `inicio`."""
+    return Decimal("0") if inicio is None else _saldo(owner, cliente_id, inicio)
+
+
+def saldo_ate(owner, cliente_id, fim=None):
+    """Compras − pagamentos do cliente até `fim` (date, inclusivo); sem `fim`, o saldo de todo o histórico."""
+    return _saldo(owner, cliente_id, fim + timedelta(days=1) if fim else None)
+
+
+# ====== LINHAS ======
+def _compras(owner, cliente_id, inicio, fim, lote, using):
+    qs = _itens(owner, cliente_id).using(using).annotate(subtotal=SUBTOTAL)
+    if inicio:
+        qs = qs.filter(conta__criado_em__gte=inicio)
+    if fim:
+        qs = qs.filter(conta__criado_em__lte=fim)
+    qs = qs.values("id", "conta_id", "conta__criado_em", "produto", "quantidade", "subtotal")
+    for r in _em_lotes(qs, ["conta__criado_em", "conta_id", "id"], lote):
+        yield {
+            "chave": (_inicio_do_dia(r["conta__criado_em"]), 0, r["conta_id"], r["id"]),
+            "data": r["conta__criado_em"],
+            "tipo": "compra",
+            "conta_id": r["conta_id"],
+            "descricao": f"{r['produto']} (x{r['quantidade']})",
+            "debito": r["subtotal"],
+            "credito": Decimal("0"),
+        }
+
+
+def _creditos(owner, cliente_id, inicio, fim, lote, using):
+    qs = _pagamentos(owner, cliente_id).using(using)
+    if inicio:
+        qs = qs.filter(data_pagamento__gte=_inicio_do_dia(inicio))
+    if fim:
+        qs = qs.filter(data_pagamento__lt=_inicio_do_dia(fim + timedelta(days=1)))
+    qs = qs.values("id", "conta_id", "data_pagamento", "valor", "observacao")
+    for r in _em_lotes(qs, ["data_pagamento", "id"], lote):
+        yield {
+            "chave": (r["data_pagamento"], 1, r["conta_id"], r["id"]),
+            "data": timezone.localtime(r["data_pagamento"]),
+            "tipo": "pagamento",
+            "conta_id": r["conta_id"],
+            "descricao": "Pagamento" + (f" — {r['observacao']}" if r["observacao"] else ""),
+            "debito": Decimal("0"),
+            "credito": r["valor"],
+        }
+
+
+def extrato(owner, cliente_id, inicio=None, fim=None, saldo_inicial=None, lote=LOTE, using=None):
+    """
+    Linhas do extrato entre `inicio` e `fim` (dates, inclusivos; None = sem limite), em ordem,
+    cada uma com o `saldo` acumulado. `saldo_inicial` evita recalcular o saldo anterior
+    quando quem chama já o tem; `using` fixa o banco (respostas em streaming, ver carteira.replica).
+    """
+    saldo = saldo_anterior(owner, cliente_id, inicio) if saldo_inicial is None else saldo_inicial
+    linhas = heapq.merge(
+        _compras(owner, cliente_id, inicio, fim, lote, using),
+        _creditos(owner, cliente_id, inicio, fim, lote, using),
+        key=lambda linha: linha["chave"],
+    )
+    for linha in linhas:
+        saldo += linha["debito"] - linha["credito"]
+        linha["saldo"] = saldo
+        yield linha
+
+
+CABECALHO_CSV = ["data", "tipo", "conta", "descricao", "debito", "credito", "saldo"]
+
+
+def linhas_csv(linhas):
+    """Cabeçalho + tuplas do extrato para exportar.stream_csv."""
+    yield CABECALHO_CSV
+    for l in linhas:
+        data = l["data"].strftime("%d/%m/%Y %H:%M" if l["tipo"] == "pagamento" else "%d/%m/%Y")
+        yield [data, l["tipo"], l["conta_id"], l["descricao"], l["debito"], l["credito"], l["saldo"]]
@@ -21,6 +21,22 @@ class PagamentoForm(forms.ModelForm):
         }
 
 
+def limpar_cpf(v):
+    """Só os dígitos de um CPF (11) ou CNPJ (14). Também usado na importação em lote."""
+    digits = re.sub(r"\D+", "", v or "")
+    if len(digits) not in (11, 14):
+        raise ValidationError("Informe um CPF (11 dígitos) ou CNPJ (14 dígitos) válido.")
+    return digits
+
+
+def limpar_telefone(v):
+    """Só os dígitos de um telefone com DDD (10 ou 11)."""
+    digits = re.sub(r"\D+", "", v or "")
+    if len(digits) not in (10, 11):
+        raise ValidationError("Informe um telefone válido (DDD + número).")
+    return digits
+
+
 class ClienteForm(forms.ModelForm):
     class Meta:
         model = Cliente
@@ -55,18 +71,10 @@ class ClienteForm(forms.ModelForm):
         }
 
     def clean_cpf(self):
-        v = self.cleaned_data.get("cpf", "") or ""
-        digits = re.sub(r"\D+", "", v)
-        if len(digits) not in (11, 14):
-            raise ValidationError("Informe um CPF (11 dígitos) ou CNPJ (14 dígitos) válido.")
-        return digits
+        return limpar_cpf(self.cleaned_data.get("cpf", ""))
 
     def clean_telefone(self):
-        v = self.cleaned_data.get("telefone", "") or ""
-        digits = re.sub(r"\D+", "", v)
-        if len(digits) not in (10, 11):
-            raise ValidationError("Informe um telefone válido (DDD + número).")
-        return digits
+        return limpar_telefone(self.cleaned_data.get("telefone", ""))
 
 
 class ContaForm(forms.ModelForm):
@@ -92,14 +100,25 @@ class DeleteConfirmForm(forms.Form):
         max_length=255,
         widget=forms.TextInput(attrs={"class": "form-control", "placeholder": "Informe o motivo"}),
     )
+    # opcional: dispensada logo depois de uma confirmação (carteira.confirmacao)
     senha = forms.CharField(
         label="Sua senha",
+        required=False,
         widget=forms.PasswordInput(attrs={"class": "form-control", "placeholder": "Confirme sua senha"}),
     )
 
 
 class RestoreConfirmForm(forms.Form):
+    # opcional: dispensada logo depois de uma confirmação (carteira.confirmacao)
     senha = forms.CharField(
         label="Sua senha",
+        required=False,
         widget=forms.PasswordInput(attrs={"class": "form-control", "placeholder": "Confirme sua senha"}),
-    )
\ No newline at end of file
+    )
+
+
+class ImportarClientesForm(forms.Form):
+    arquivo = forms.FileField(
+        label="Arquivo CSV",
+        widget=forms.ClearableFileInput(attrs={"class": "form-control", "accept": ".csv,text/csv"}),
+    )
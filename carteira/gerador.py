@@ -0,0 +1,208 @@
+# carteira/gerador.py
+"""
+Gerador de dados de teste em volume: N lojistas × M clientes × ~K contas por cliente,
+com itens e pagamentos em distribuições parecidas com as de uma loja real.
+
+- itens por conta: 1 a 8, concentrados em 1–3; preços log-normais (centavos a centenas de reais);
+- pagamentos: ~55% das contas quitadas, ~25% com pagamento parcial, o resto sem pagamento;
+- criação espalhada nos últimos ~2 anos, vencimento 15–60 dias depois (algumas sem vencimento).
+
+Tudo é gravado com bulk_create e os totais/saldo/status das contas já saem calculados,
+coerentes com `verificar_saldos`. Os usuários gerados têm o prefixo USUARIO_PREFIXO
+e podem ser removidos com `remover`.
+"""
+import random
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .busca import indexar_em_lote, texto_busca
+from . import resumo
+from .models import Cliente, ClienteTermo, ContaCarteira, ItemVenda, Pagamento, ResumoDiario
+
+User = get_user_model()
+
+USUARIO_PREFIXO = "__gerado__"
+LOTE = 2000
+
+NOMES = [
+    "Ana", "Maria", "José", "João", "Antônio", "Francisca", "Carlos", "Paulo", "Pedro", "Lucas",
+    "Luiz", "Marcos", "Luís", "Gabriel", "Rafael", "Daniel", "Marcelo", "Bruno", "Eduardo", "Felipe",
+    "Raimundo", "Adriana", "Juliana", "Márcia", "Fernanda", "Patrícia", "Aline", "Sandra", "Camila", "Amanda",
+]
+SOBRENOMES = [
+    "Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira", "Lima", "Gomes",
+    "Costa", "Ribeiro", "Martins", "Carvalho", "Almeida", "Lopes", "Soares", "Fernandes", "Vieira", "Barbosa",
+    "Rocha", "Dias", "Nascimento", "Andrade", "Moreira", "Nunes", "Marques", "Machado", "Mendes", "Freitas",
+]
+PRODUTOS = [
+    "Arroz 5kg", "Feijão 1kg", "Açúcar 2kg", "Café 500g", "Óleo 900ml", "Leite 1L", "Pão francês",
+    "Farinha 1kg", "Macarrão 500g", "Sabão em pó", "Detergente", "Papel higiênico", "Refrigerante 2L",
+    "Frango kg", "Carne kg", "Ovos dz", "Gás 13kg", "Cerveja lata", "Biscoito", "Manteiga",
+]
+PESO_ITENS = [30, 25, 18, 10, 7, 5, 3, 2]  # 1..8 itens
+
+
+def _cpf(rng):
+    return f"{rng.randrange(10 ** 10, 10 ** 11):011d}"
+
+
+def _preco(rng):
+    return Decimal(str(round(min(max(rng.lognormvariate(2.3, 0.9), 0.5), 900), 2))).quantize(Decimal("0.01"))
+
+
+def _momento(dia, rng):
+    return timezone.make_aware(datetime.combine(dia, time(rng.randint(7, 20), rng.randint(0, 59))))
+
+
+def _ids_inseridos(model, objs, id_antes, **filtro):
+    """
+    Preenche o pk de objetos recém-inseridos em backends sem RETURNING (MySQL). Os lojistas
+    são exclusivos do gerador, então as linhas novas deles estão na ordem do INSERT.
+    """
+    if connection.features.can_return_rows_from_bulk_insert:
+        return
+    ids = model.objects.filter(id__gt=id_antes, **filtro).order_by("id").values_list("id", flat=True)
+    for obj, pk in zip(objs, ids):
+        obj.pk = pk
+
+
+def _ultimo_id(model):
+    return model.objects.order_by("-id").values_list("id", flat=True).first() or 0
+
+
+def _contas_do_cliente(owner, cliente, k, hoje, rng):
+    contas, itens, pagamentos = [], [], []
+    # média k por cliente, com cauda longa (poucos clientes concentram muitas contas)
+    for _ in range(round(rng.expovariate(1 / k)) if k > 0 else 0):
+        criado = hoje - timedelta(days=rng.randint(0, 720))
+        venc = criado + timedelta(days=rng.randint(15, 60)) if rng.random() > 0.1 else None
+        linhas = [
+            (rng.choice(PRODUTOS), rng.choices((1, 2, 3, 6), (70, 18, 8, 4))[0], _preco(rng))
+            for _ in range(rng.choices(range(1, 9), PESO_ITENS)[0])
+        ]
+        total = sum((q * v for _, q, v in linhas), start=Decimal("0"))
+
+        sorte = rng.random()
+        if sorte < 0.55:
+            valores = [total] if rng.random() < 0.7 else [(total / 2).quantize(Decimal("0.01")), total - (total / 2).quantize(Decimal("0.01"))]
+        elif sorte < 0.80:
+            valores = [(total * Decimal(rng.uniform(0.1, 0.9))).quantize(Decimal("0.01"))]
+        else:
+            valores = []
+        valores = [v for v in valores if v > 0]
+        pago = sum(valores, start=Decimal("0"))
+        saldo, status = ContaCarteira.calcular_saldo_status(total, pago, venc)
+
+        conta = ContaCarteira(
+            owner=owner, cliente=cliente, criado_em=criado, vencimento=venc,
+            total=total, total_pago=pago, saldo=saldo, status=status,
+        )
+        contas.append(conta)
+        itens.append([ItemVenda(produto=p, quantidade=q, valor_unit=v) for p, q, v in linhas])
+        dias = max((hoje - criado).days, 0)
+        pagamentos.append([
+            Pagamento(valor=v, data_pagamento=_momento(criado + timedelta(days=rng.randint(0, dias)), rng))
+            for v in valores
+        ])
+    return contas, itens, pagamentos
+
+
+@transaction.atomic
+def _gravar_contas(contas, itens, pagamentos, owner_ids):
+    id_antes = _ultimo_id(ContaCarteira)
+    ContaCarteira.objects.bulk_create(contas, batch_size=LOTE)
+    _ids_inseridos(ContaCarteira, contas, id_antes, owner_id__in=owner_ids)
+    novos_itens, novos_pgtos = [], []
+    for conta, its, pgs in zip(contas, itens, pagamentos):
+        for obj in its:
+            obj.conta_id = conta.pk
+            obj.owner_id = conta.owner_id
+            novos_itens.append(obj)
+        for obj in pgs:
+            obj.conta_id = conta.pk
+            obj.owner_id = conta.owner_id
+            obj.data = obj.data_pagamento
+            novos_pgtos.append(obj)
+    # bulk_create não dispara os sinais do ledger: os totais já vieram calculados
+    ItemVenda.objects.bulk_create(novos_itens, batch_size=LOTE)
+    Pagamento.objects.bulk_create(novos_pgtos, batch_size=LOTE)
+    return len(novos_itens), len(novos_pgtos)
+
+
+def gerar(lojistas, clientes, contas_por_cliente, semente=None, prefixo=USUARIO_PREFIXO, progresso=None):
+    """
+    Cria `lojistas` usuários novos, cada um com `clientes` clientes e, em média,
+    `contas_por_cliente` contas por cliente. Retorna um dict com as contagens e os ids dos lojistas.
+    """
+    rng = random.Random(semente)
+    hoje = timezone.localdate()
+    inicio = User.objects.filter(username__startswith=prefixo).count()
+    owners = [
+        User.objects.create_user(username=f"{prefixo}{inicio + i}", password=None)
+        for i in range(lojistas)
+    ]
+    res = {"lojistas": [o.pk for o in owners], "clientes": 0, "contas": 0, "itens": 0, "pagamentos": 0}
+
+    for owner in owners:
+        for ini in range(0, clientes, LOTE):
+            with transaction.atomic():
+                lote = []
+                for _ in range(min(LOTE, clientes - ini)):
+                    nome = f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}"
+                    c = Cliente(
+                        owner=owner, nome=nome, cpf=_cpf(rng),
+                        telefone=f"63{rng.randint(90000000, 99999999):09d}",
+                        email=f"{nome.split()[0].lower()}{rng.randint(1, 9999)}@exemplo.com.br",
+                    )
+                    c.busca = texto_busca(c.nome, c.cpf, c.telefone, c.email)
+                    lote.append(c)
+                id_antes = _ultimo_id(Cliente)
+                Cliente.objects.bulk_create(lote, batch_size=LOTE)
+                _ids_inseridos(Cliente, lote, id_antes, owner=owner)
+                indexar_em_lote(lote)
+            res["clientes"] += len(lote)
+
+            contas, itens, pagamentos = [], [], []
+            for cliente in lote:
+                c, i, p = _contas_do_cliente(owner, cliente, contas_por_cliente, hoje, rng)
+                contas += c
+                itens += i
+                pagamentos += p
+            n_itens, n_pgtos = _gravar_contas(contas, itens, pagamentos, [owner.pk])
+            res["contas"] += len(contas)
+            res["itens"] += n_itens
+            res["pagamentos"] += n_pgtos
+            if progresso:
+                progresso(res)
+        # bulk_create não passa pelos sinais: resumo diário refeito de uma vez por lojista
+        resumo.reconstruir([owner.pk])
+    return res
+
+
+@transaction.atomic
+def remover(prefixo=USUARIO_PREFIXO, owner_ids=None):
+    """
+    Apaga os lojistas gerados e todos os dados deles, tabela por tabela. Termos e resumo
+    (sem sinais) saem num DELETE cada; pagamentos, itens e clientes passam pelos sinais
+    (ledger, resumo, busca) linha a linha — os pagamentos e itens antes das contas e do resumo
+    que eles atualizam.
+    """
+    owners = User.objects.filter(pk__in=owner_ids) if owner_ids is not None else User.objects.filter(username__startswith=prefixo)
+    ids = list(owners.values_list("id", flat=True))
+    if not ids:
+        return 0
+    for qs in (
+        Pagamento.objects.filter(owner_id__in=ids),
+        ItemVenda.objects.filter(owner_id__in=ids),
+        ContaCarteira.objects.filter(owner_id__in=ids),
+        ClienteTermo.objects.filter(owner_id__in=ids),
+        ResumoDiario.objects.filter(owner_id__in=ids),
+        Cliente.objects.filter(owner_id__in=ids),
+    ):
+        qs.delete()
+    User.objects.filter(pk__in=ids).delete()
+    return len(ids)
@@ -0,0 +1,243 @@
+# carteira/importar.py
+"""
+Importação em lote de clientes e contas em aberto a partir de CSV.
+
+Uma linha por cliente, com uma conta em aberto opcional. As colunas são identificadas pelo
+cabeçalho, sem distinguir maiúsculas nem acentos, e o separador pode ser ';' ou ',':
+
+    nome; cpf; telefone; email; endereco; vencimento; valor; produto
+
+- nome, cpf e telefone são obrigatórios e validados com as regras do ClienteForm;
+- clientes são identificados por lojista + CPF: um CPF já cadastrado (ou repetido no
+  arquivo) reaproveita o cliente existente, sem duplicar;
+- com `valor` preenchido, cria-se uma conta com um item (`produto`, padrão "Saldo anterior").
+
+O arquivo é lido linha a linha e gravado em lotes (bulk_create), cada lote numa transação.
+Linhas inválidas são puladas e relatadas; se a importação parar no meio, os lotes anteriores
+já estão gravados e reimportar o arquivo não duplica clientes, só as contas.
+"""
+import csv
+import io
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import resumo
+from .busca import indexar_em_lote, normalizar, texto_busca
+from .forms import limpar_cpf, limpar_telefone
+from .models import Cliente, ContaCarteira, ItemVenda
+from .totais import invalidar_totais
+
+LOTE = 1000
+MAX_ERROS = 200
+PRODUTO_PADRAO = "Saldo anterior"
+
+COLUNAS = {
+    "nome": "nome",
+    "cliente": "nome",
+    "cpf": "cpf",
+    "cnpj": "cpf",
+    "cpf/cnpj": "cpf",
+    "cpf_cnpj": "cpf",
+    "documento": "cpf",
+    "telefone": "telefone",
+    "celular": "telefone",
+    "email": "email",
+    "e-mail": "email",
+    "endereco": "endereco",
+    "vencimento": "vencimento",
+    "valor": "valor",
+    "saldo": "valor",
+    "produto": "produto",
+    "descricao": "produto",
+}
+
+
+def _resultado():
+    return {
+        "linhas": 0,
+        "clientes_criados": 0,
+        "clientes_existentes": 0,  # linhas que reaproveitaram um cliente (CPF já visto)
+        "contas_criadas": 0,
+        "erros": [],  # [(linha, mensagem)], no máximo MAX_ERROS
+        "total_erros": 0,
+        "segundos": 0.0,
+    }
+
+
+def linhas_por_segundo(res):
+    return res["linhas"] / res["segundos"] if res["segundos"] else 0.0
+
+
+def _data(v):
+    v = (v or "").strip()
+    if not v:
+        return None
+    for fmt in ("%d/%m/%Y", "%Y-%m-%d", "%d/%m/%y"):
+        try:
+            return datetime.strptime(v, fmt).date()
+        except ValueError:
+            pass
+    raise ValidationError(f"vencimento inválido: {v!r} (use DD/MM/AAAA)")
+
+
+def _decimal(v):
+    v = (v or "").strip().replace("R$", "").replace(" ", "")
+    if not v:
+        return None
+    if "," in v:  # formato brasileiro: 1.234,56
+        v = v.replace(".", "").replace(",", ".")
+    try:
+        d = Decimal(v).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        raise ValidationError(f"valor inválido: {v!r}")
+    if d <= 0:
+        raise ValidationError("valor deve ser maior que zero")
+    return d
+
+
+def _validar(row):
+    """Dict bruto do CSV -> dados limpos (levanta ValidationError)."""
+    nome = (row.get("nome") or "").strip()
+    if not nome:
+        raise ValidationError("nome obrigatório")
+    if len(nome) > 150:
+        raise ValidationError("nome com mais de 150 caracteres")
+    cpf = limpar_cpf(row.get("cpf"))
+    telefone = limpar_telefone(row.get("telefone"))
+    valor = _decimal(row.get("valor"))
+    return {
+        "nome": nome,
+        "cpf": cpf,
+        "telefone": telefone,
+        "email": (row.get("email") or "").strip()[:150],
+        "endereco": (row.get("endereco") or "").strip()[:150],
+        "vencimento": _data(row.get("vencimento")) if valor else None,
+        "valor": valor,
+        "produto": ((row.get("produto") or "").strip() or PRODUTO_PADRAO)[:120],
+    }
+
+
+def _leitor(arquivo):
+    """csv.DictReader em streaming sobre um arquivo binário, com as colunas normalizadas."""
+    texto = io.TextIOWrapper(arquivo, encoding="utf-8-sig", newline="")
+    cabecalho = texto.readline()
+    delimitador = ";" if cabecalho.count(";") >= cabecalho.count(",") else ","
+    nomes = [COLUNAS.get(normalizar(c), normalizar(c)) for c in next(csv.reader([cabecalho], delimiter=delimitador))]
+    if "nome" not in nomes or "cpf" not in nomes:
+        raise ValueError("O cabeçalho precisa ter ao menos as colunas nome e cpf.")
+    return csv.DictReader(texto, fieldnames=nomes, delimiter=delimitador)
+
+
+def _clientes_do_lojista(owner):
+    """{cpf (só dígitos): id} dos clientes já cadastrados."""
+    mapa = {}
+    for pk, cpf in Cliente.objects.filter(owner=owner).exclude(cpf="").values_list("id", "cpf").iterator(chunk_size=5000):
+        mapa.setdefault("".join(ch for ch in cpf if ch.isdigit()), pk)
+    return mapa
+
+
+def _preencher_ids_contas(owner, contas, id_antes):
+    """
+    Backends sem RETURNING no bulk_create (MySQL) não devolvem os ids. As contas do lote são as
+    criadas depois de `id_antes` para estes clientes, na ordem do INSERT.
+    """
+    fila = defaultdict(deque)
+    novas = (
+        ContaCarteira.objects.filter(owner=owner, id__gt=id_antes, cliente_id__in={c.cliente_id for c in contas})
+        .order_by("id").values_list("id", "cliente_id")
+    )
+    for pk, cliente_id in novas:
+        fila[cliente_id].append(pk)
+    for c in contas:
+        c.pk = fila[c.cliente_id].popleft()
+
+
+@transaction.atomic
+def _gravar_lote(owner, lote, cpfs, res):
+    novos = {}
+    for _, d in lote:
+        if d["cpf"] in cpfs or d["cpf"] in novos:
+            res["clientes_existentes"] += 1
+            continue
+        c = Cliente(
+            owner=owner, nome=d["nome"], cpf=d["cpf"], telefone=d["telefone"],
+            email=d["email"] or Cliente._meta.get_field("email").get_default(),
+            endereco=d["endereco"] or Cliente._meta.get_field("endereco").get_default(),
+        )
+        # bulk_create não dispara o pre_save/post_save de Cliente: busca e termos feitos aqui
+        c.busca = texto_busca(c.nome, c.cpf, c.telefone, c.email)
+        novos[d["cpf"]] = c
+
+    if novos:
+        Cliente.objects.bulk_create(novos.values(), batch_size=LOTE)
+        if not connection.features.can_return_rows_from_bulk_insert:
+            ids = dict(Cliente.objects.filter(owner=owner, cpf__in=novos.keys()).values_list("cpf", "id"))
+            for cpf, c in novos.items():
+                c.pk = ids[cpf]
+        indexar_em_lote(novos.values())
+        for cpf, c in novos.items():
+            cpfs[cpf] = c.pk
+        res["clientes_criados"] += len(novos)
+
+    contas, itens = [], []
+    for _, d in lote:
+        if not d["valor"]:
+            continue
+        saldo, status = ContaCarteira.calcular_saldo_status(d["valor"], Decimal("0"), d["vencimento"])
+        contas.append(ContaCarteira(
+            owner=owner, cliente_id=cpfs[d["cpf"]], vencimento=d["vencimento"],
+            total=d["valor"], saldo=saldo, status=status,
+        ))
+        itens.append(ItemVenda(owner=owner, produto=d["produto"], quantidade=1, valor_unit=d["valor"]))
+    if contas:
+        id_antes = ContaCarteira.objects.filter(owner=owner).order_by("-id").values_list("id", flat=True).first() or 0
+        ContaCarteira.objects.bulk_create(contas, batch_size=LOTE)
+        if not connection.features.can_return_rows_from_bulk_insert:
+            _preencher_ids_contas(owner, contas, id_antes)
+        for conta, item in zip(contas, itens):
+            item.conta_id = conta.pk
+        ItemVenda.objects.bulk_create(itens, batch_size=LOTE)
+        # contas criadas hoje (default de criado_em)
+        resumo.somar(owner.pk, timezone.localdate(), vendas=sum(c.total for c in contas))
+        res["contas_criadas"] += len(contas)
+        invalidar_totais(owner.pk)
+
+
+def importar_csv(owner, arquivo, lote=LOTE, progresso=None):
+    """
+    Importa um CSV (arquivo binário) para o lojista `owner`. `progresso(res)` é chamado
+    a cada lote gravado. Retorna o dict de resultado (ver _resultado).
+    """
+    res = _resultado()
+    inicio = time.perf_counter()
+    cpfs = _clientes_do_lojista(owner)
+    pendentes = []
+
+    def _descarregar():
+        _gravar_lote(owner, pendentes, cpfs, res)
+        pendentes.clear()
+        res["segundos"] = time.perf_counter() - inicio
+        if progresso:
+            progresso(res)
+
+    for row in _leitor(arquivo):
+        res["linhas"] += 1
+        num = res["linhas"] + 1  # linha no arquivo (o cabeçalho é a 1)
+        try:
+            pendentes.append((num, _validar(row)))
+        except ValidationError as e:
+            res["total_erros"] += 1
+            if len(res["erros"]) < MAX_ERROS:
+                res["erros"].append((num, " ".join(e.messages)))
+        if len(pendentes) >= lote:
+            _descarregar()
+    if pendentes:
+        _descarregar()
+    res["segundos"] = time.perf_counter() - inicio
+    return res
@@ -0,0 +1,122 @@
+# carteira/ledger.py
+"""
+Manutenção incremental de total/saldo/status de ContaCarteira.
+
+Cada alteração em ItemVenda/Pagamento aplica apenas a diferença (delta) na conta
+com um único UPDATE atômico baseado em F(), sem recarregar itens e pagamentos.
+O recálculo completo continua disponível em ContaCarteira.atualizar_totais()
+e no comando `verificar_saldos`, que detecta e corrige divergências.
+"""
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, F, Value, When
+from django.db.models.functions import Round
+from django.db.models.lookups import LessThanOrEqual
+from django.utils import timezone
+
+from .models import ContaCarteira, ItemVenda
+from .totais import invalidar_totais
+
+ZERO = Decimal("0")
+DEC = DecimalField(max_digits=12, decimal_places=2)
+
+
+def aplicar_delta(conta_id, delta_total=ZERO, delta_pago=ZERO):
+    """
+    Soma `delta_total` ao total e `delta_pago` ao total pago da conta e recalcula
+    saldo/status na mesma instrução. Sempre avança a `versao` da conta (mesmo sem delta:
+    produto ou observação podem ter mudado). Retorna o número de linhas atualizadas.
+    """
+    if not delta_total and not delta_pago:
+        return ContaCarteira.objects.filter(pk=conta_id).update(versao=F("versao") + 1)
+
+    # arredondado em SQL: no SQLite a conta é feita em ponto flutuante (0.10 + 0.20 - 0.30 vira
+    # 5.5e-17, que deixaria a conta quitada "EM_ABERTO"); no MySQL o DECIMAL já é exato
+    novo_total = Round(F("total") + Value(delta_total, output_field=DEC), 2, output_field=DEC)
+    novo_pago = Round(F("total_pago") + Value(delta_pago, output_field=DEC), 2, output_field=DEC)
+    restante = Round(
+        F("total") + Value(delta_total, output_field=DEC) - F("total_pago") - Value(delta_pago, output_field=DEC),
+        2, output_field=DEC,
+    )
+    quitada = LessThanOrEqual(restante, Value(ZERO, output_field=DEC))
+    hoje = timezone.localdate()
+
+    # saldo/status vêm antes de total/total_pago: o MySQL avalia as atribuições do
+    # UPDATE da esquerda para a direita, então precisam enxergar os valores antigos.
+    return ContaCarteira.objects.filter(pk=conta_id).update(
+        saldo=Case(When(quitada, then=Value(ZERO)), default=restante, output_field=DEC),
+        status=Case(
+            When(quitada, then=Value("PAGO")),
+            When(vencimento__lt=hoje, then=Value("ATRASO")),
+            default=Value("EM_ABERTO"),
+        ),
+        total=novo_total,
+        total_pago=novo_pago,
+        versao=F("versao") + 1,
+    )
+
+
+# ====== HOOKS (chamados pelos sinais em models.py) ======
+def _estado(instance):
+    """(conta_id, valor) de um item/pagamento — valor = subtotal do item ou valor pago."""
+    valor = instance.subtotal() if isinstance(instance, ItemVenda) else instance.valor
+    return instance.conta_id, Decimal(valor or 0)
+
+
+def _aplicar(conta_id, valor, is_item):
+    if is_item:
+        aplicar_delta(conta_id, delta_total=valor)
+    else:
+        aplicar_delta(conta_id, delta_pago=valor)
+
+
+def _owner_id(instance, conta_id):
+    """Dono da conta sem nova consulta quando é a conta atual da instância (cópia em owner_id)."""
+    if conta_id == instance.conta_id and instance.owner_id is not None:
+        return instance.owner_id
+    conta = instance._state.fields_cache.get("conta")
+    if conta is not None and conta.pk == conta_id:
+        return conta.owner_id
+    return ContaCarteira.objects.filter(pk=conta_id).values_list("owner_id", flat=True).first()
+
+
+def registrar_save(instance, created):
+    is_item = isinstance(instance, ItemVenda)
+    atual = _estado(instance)
+    original = getattr(instance, "_ledger_original", None)
+
+    if created:
+        _aplicar(atual[0], atual[1], is_item)
+    elif original is None:
+        # instância não veio do banco (ex.: montada com pk): sem base para o delta
+        instance.conta.atualizar_totais()
+    elif original[0] == atual[0]:
+        _aplicar(atual[0], atual[1] - original[1], is_item)
+    else:
+        # mudou de conta: tira da antiga e soma na nova
+        _aplicar(original[0], -original[1], is_item)
+        _aplicar(atual[0], atual[1], is_item)
+        invalidar_totais(_owner_id(instance, original[0]))
+
+    instance._ledger_original = atual
+    invalidar_totais(_owner_id(instance, atual[0]))
+
+
+def registrar_delete(instance):
+    is_item = isinstance(instance, ItemVenda)
+    conta_id, valor = getattr(instance, "_ledger_original", None) or _estado(instance)
+    _aplicar(conta_id, -valor, is_item)
+    invalidar_totais(_owner_id(instance, conta_id))
+
+
+def marcar_atrasos(hoje=None):
+    """
+    Passa para ATRASO todas as contas EM_ABERTO com vencimento já passado, de todos os
+    lojistas, num único UPDATE (índice status+vencimento). Retorna o nº de contas alteradas.
+    """
+    hoje = hoje or timezone.localdate()
+    vencidas = ContaCarteira.objects.filter(status="EM_ABERTO", vencimento__lt=hoje)
+    owners = set(vencidas.order_by().values_list("owner_id", flat=True).distinct())
+    alteradas = vencidas.update(status="ATRASO", versao=F("versao") + 1)
+    invalidar_totais(*owners)
+    return alteradas
@@ -0,0 +1,30 @@
+# carteira/management/commands/arquivar_auditoria.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from carteira import arquivo
+
+
+class Command(BaseCommand):
+    help = (
+        "Move os meses antigos do AuditLog para arquivos JSONL comprimidos e aplica a retenção. "
+        "Agende mensalmente (ex.: cron '30 1 1 * * python manage.py arquivar_auditoria')."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--meses-quentes", type=int, default=arquivo.MESES_QUENTES,
+                            help="Meses mantidos na tabela, contando o atual.")
+        parser.add_argument("--retencao-meses", type=int, default=arquivo.RETENCAO_MESES,
+                            help="Apaga arquivos mais antigos que isso (padrão: nunca).")
+
+    def handle(self, *args, **opts):
+        inicio = time.perf_counter()
+        total = 0
+        for ano, mes in arquivo.meses_frios(max(opts["meses_quentes"], 1)):
+            n = arquivo.arquivar_mes(ano, mes)
+            total += n
+            self.stdout.write(f"{ano:04d}-{mes:02d}: {n} registro(s) arquivado(s).")
+        for m in arquivo.remover_arquivos_antigos(opts["retencao_meses"]):
+            self.stdout.write(f"{m}: arquivo removido (retenção).")
+        self.stdout.write(f"{total} registro(s) movido(s) para {arquivo.diretorio()} em {time.perf_counter() - inicio:.1f} s.")
@@ -0,0 +1,72 @@
+# carteira/management/commands/bench_api.py
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from carteira import gerador
+from carteira.models import ContaCarteira
+
+PREFIXO = "__bench_api__"
+
+
+class _Rollback(Exception):
+    pass
+
+
+# (nome, caminho, reenviar o ETag da primeira resposta?)
+def _cenarios(conta_id):
+    return [
+        ("dashboard (HTML)", "/", False),
+        ("conta_detalhe (HTML)", f"/conta/{conta_id}/", False),
+        ("api contas", "/api/v1/contas/", False),
+        ("api contas ?campos=", "/api/v1/contas/?campos=id,cliente_id,saldo,status,versao", False),
+        ("api contas If-None-Match", "/api/v1/contas/", True),
+        ("api conta", f"/api/v1/contas/{conta_id}/", False),
+        ("api conta If-None-Match", f"/api/v1/contas/{conta_id}/", True),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara o que um tablet de PDV baixa ao ler as contas pelo HTML (dashboard, conta_detalhe) "
+        "e pela API JSON (carteira/api.py), com e sem If-None-Match: status, bytes, consultas e ms. "
+        "Dados gerados e desfeitos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clientes", type=int, default=200)
+        parser.add_argument("--contas-por-cliente", type=float, default=3)
+        parser.add_argument("--repeticoes", type=int, default=20)
+
+    def handle(self, *args, **opts):
+        try:
+            with transaction.atomic():
+                gerado = gerador.gerar(1, opts["clientes"], opts["contas_por_cliente"], semente=1, prefixo=PREFIXO)
+                owner = gerador.User.objects.get(pk=gerado["lojistas"][0])
+                conta = ContaCarteira.objects.filter(owner=owner, is_deleted=False).order_by("id").first()
+                client = Client()
+                client.force_login(owner)
+
+                self.stdout.write(
+                    f"{gerado['contas']} contas, {gerado['itens']} itens, {gerado['pagamentos']} pagamentos\n\n"
+                    f"{'':<26} | {'status':>6} | {'bytes':>8} | {'SQL':>4} | {'ms (mediana)':>12}"
+                )
+                for nome, caminho, condicional in _cenarios(conta.id):
+                    extra = {"HTTP_IF_NONE_MATCH": client.get(caminho)["ETag"]} if condicional else {}
+                    tempos = []
+                    for _ in range(opts["repeticoes"]):
+                        with CaptureQueriesContext(connection) as ctx:
+                            inicio = time.perf_counter()
+                            resp = client.get(caminho, **extra)
+                            tempos.append((time.perf_counter() - inicio) * 1000)
+                    self.stdout.write(
+                        f"{nome:<26} | {resp.status_code:>6} | {len(resp.content):>8} | "
+                        f"{len(ctx.captured_queries):>4} | {statistics.median(tempos):>12.2f}"
+                    )
+                raise _Rollback
+        except _Rollback:
+            pass
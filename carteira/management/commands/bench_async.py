@@ -0,0 +1,184 @@
+# carteira/management/commands/bench_async.py
+import asyncio
+import importlib
+import statistics
+import sys
+import threading
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import clear_url_caches
+
+from carteira import gerador
+from carteira.models import Cliente
+
+PREFIXO = "__bench_async__"
+HOST = "testserver"
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(int(round(p / 100 * (len(ordenados) - 1))), len(ordenados) - 1)]
+
+
+def _rotas(views_async):
+    """Liga as views sync ou async nas URLs (carteira/urls.py lê CARTEIRA_VIEWS_ASYNC ao importar)."""
+    with override_settings(CARTEIRA_VIEWS_ASYNC=views_async):
+        importlib.reload(importlib.import_module("carteira.urls"))
+        importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+    clear_url_caches()
+
+
+# ====== WSGI: N clientes, T threads no servidor (como gunicorn --threads T) ======
+def _environ(caminho, cookie):
+    path, _, query = caminho.partition("?")
+    return {
+        "REQUEST_METHOD": "GET", "PATH_INFO": path, "QUERY_STRING": query, "SCRIPT_NAME": "",
+        "SERVER_NAME": HOST, "SERVER_PORT": "80", "SERVER_PROTOCOL": "HTTP/1.1",
+        "HTTP_HOST": HOST, "HTTP_COOKIE": cookie, "REMOTE_ADDR": "127.0.0.1",
+        "wsgi.input": BytesIO(), "wsgi.errors": sys.stderr, "wsgi.url_scheme": "http",
+        "wsgi.version": (1, 0), "wsgi.multithread": True, "wsgi.multiprocess": False, "wsgi.run_once": False,
+    }
+
+
+def _rodar_wsgi(caminho, cookie, concorrencia, requisicoes, threads):
+    app = WSGIHandler()
+    servidor = threading.BoundedSemaphore(threads)
+    tempos, erros = [], []
+    restantes = iter(range(requisicoes))
+    lock = threading.Lock()
+
+    def cliente():
+        while True:
+            with lock:
+                if next(restantes, None) is None:
+                    return
+            inicio = time.perf_counter()
+            with servidor:
+                status = []
+                corpo = app(_environ(caminho, cookie), lambda s, h, *a: status.append(s))
+                try:
+                    b"".join(corpo)
+                finally:
+                    getattr(corpo, "close", lambda: None)()
+            with lock:
+                tempos.append((time.perf_counter() - inicio) * 1000)
+                if not status[0].startswith("200"):
+                    erros.append(status[0])
+
+    inicio = time.perf_counter()
+    clientes = [threading.Thread(target=cliente) for _ in range(concorrencia)]
+    for t in clientes:
+        t.start()
+    for t in clientes:
+        t.join()
+    return time.perf_counter() - inicio, tempos, erros
+
+
+# ====== ASGI: N clientes num event loop (como uvicorn) ======
+def _scope(caminho, cookie):
+    path, _, query = caminho.partition("?")
+    return {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": [(b"host", HOST.encode()), (b"cookie", cookie.encode())],
+        "client": ("127.0.0.1", 50000), "server": (HOST, 80),
+    }
+
+
+async def _rodar_asgi(caminho, cookie, concorrencia, requisicoes):
+    app = ASGIHandler()
+    tempos, erros = [], []
+    restantes = iter(range(requisicoes))
+
+    async def uma():
+        recebido = False
+        desconexao = asyncio.Event()
+
+        async def receive():
+            nonlocal recebido
+            if not recebido:
+                recebido = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await desconexao.wait()  # o cliente não desconecta
+            return {"type": "http.disconnect"}
+
+        status = []
+
+        async def send(msg):
+            if msg["type"] == "http.response.start":
+                status.append(msg["status"])
+
+        inicio = time.perf_counter()
+        await app(_scope(caminho, cookie), receive, send)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        if status[0] != 200:
+            erros.append(status[0])
+
+    async def cliente():
+        while next(restantes, None) is not None:
+            await uma()
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente() for _ in range(concorrencia)))
+    return time.perf_counter() - inicio, tempos, erros
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara vazão (req/s) e latência (p50/p95) das views de leitura sob WSGI com as views "
+        "síncronas x ASGI com as async (carteira/views_async.py), em vários níveis de concorrência. "
+        "Os handlers do Django são chamados no próprio processo, sem rede: WSGI com T threads de "
+        "servidor (como gunicorn --threads), ASGI num event loop (como uvicorn). Dados gerados e "
+        "apagados ao final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concorrencia", type=int, nargs="+", default=[1, 8, 32, 64],
+                            help="Clientes simultâneos em cada rodada.")
+        parser.add_argument("--requisicoes", type=int, default=200, help="Requisições por rodada.")
+        parser.add_argument("--threads", type=int, default=8, help="Threads do servidor WSGI.")
+        parser.add_argument("--clientes", type=int, default=500, help="Clientes do lojista gerado.")
+        parser.add_argument("--cenarios", nargs="+", default=["api_clientes_busca", "dashboard", "clientes_lista", "historico"])
+
+    def handle(self, *args, **opts):
+        gerado = gerador.gerar(1, opts["clientes"], 2, semente=1, prefixo=PREFIXO)
+        owner = gerador.User.objects.get(pk=gerado["lojistas"][0])
+        termo = Cliente.objects.filter(owner=owner).order_by("id").first().nome.split()[0][:3]
+        caminhos = {
+            "api_clientes_busca": f"/api/clientes/busca/?q={termo}",
+            "dashboard": "/",
+            "clientes_lista": "/clientes/",
+            "historico": "/historico/",
+        }
+        client = Client()
+        client.force_login(owner)
+        cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+        try:
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, HOST]):
+                for nome in opts["cenarios"]:
+                    self.stdout.write(f"\n{nome} ({caminhos[nome]})")
+                    self.stdout.write(f"  {'conc.':>5} | {'modo':<5} | {'req/s':>8} | {'p50 ms':>8} | {'p95 ms':>8} | erros")
+                    for n in opts["concorrencia"]:
+                        for modo in ("wsgi", "asgi"):
+                            self._rodada(modo, nome, caminhos[nome], cookie, n, opts)
+        finally:
+            _rotas(False)
+            client.logout()
+            gerador.remover(PREFIXO)
+
+    def _rodada(self, modo, nome, caminho, cookie, concorrencia, opts):
+        _rotas(modo == "asgi")
+        if modo == "wsgi":
+            duracao, tempos, erros = _rodar_wsgi(caminho, cookie, concorrencia, opts["requisicoes"], opts["threads"])
+        else:
+            duracao, tempos, erros = asyncio.run(_rodar_asgi(caminho, cookie, concorrencia, opts["requisicoes"]))
+        self.stdout.write(
+            f"  {concorrencia:>5} | {modo:<5} | {len(tempos) / duracao:>8.1f} | {statistics.median(tempos):>8.1f} | "
+            f"{_percentil(tempos, 95):>8.1f} | {len(erros) or ''}{f' ({erros[0]})' if erros else ''}"
+        )
@@ -0,0 +1,93 @@
+# carteira/management/commands/bench_autocomplete.py
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from carteira import gerador, sugestoes
+from carteira.busca import sugerir_clientes
+from carteira.models import Cliente
+
+PREFIXO = "__bench_autocomplete__"
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _sessao(nome, rng):
+    """Teclas de quem digita parte de `nome` (com erros corrigidos): [(texto no campo, ms até a próxima tecla)]."""
+    alvo = nome[:rng.randint(min(len(nome), len(nome.split()[0]) + 2), len(nome))]
+    texto, teclas = "", []
+    for ch in alvo:
+        if ch.isalpha() and rng.random() < 0.08:
+            # letra errada + backspace
+            teclas.append((texto + rng.choice("qwxz"), rng.uniform(80, 250)))
+            teclas.append((texto, rng.uniform(80, 250)))
+        texto += ch
+        pausa = rng.uniform(400, 900) if rng.random() < 0.15 else rng.uniform(60, 250)
+        teclas.append((texto, pausa))
+    return teclas
+
+
+def _requisicoes(teclas, debounce_ms):
+    """Termos enviados ao servidor: a cada tecla (debounce 0) ou só nas pausas >= debounce, sem repetir termo."""
+    termos, vistos = [], set()
+    for i, (texto, pausa) in enumerate(teclas):
+        termo = texto.strip()
+        if len(termo) < 2:
+            continue
+        if debounce_ms:
+            if pausa < debounce_ms and i < len(teclas) - 1:
+                continue
+            if termo.lower() in vistos:  # cache do JS (Map por página)
+                continue
+            vistos.add(termo.lower())
+        termos.append(termo)
+    return termos
+
+
+class Command(BaseCommand):
+    help = (
+        "Simula sessões de digitação no autocomplete de clientes e conta requisições (a cada tecla x "
+        "com debounce) e consultas ao banco (sem cache x LRU de carteira.sugestoes). Dados gerados e desfeitos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clientes", type=int, default=2000)
+        parser.add_argument("--sessoes", type=int, default=50)
+        parser.add_argument("--debounce-ms", type=int, default=300)
+        parser.add_argument("--semente", type=int, default=1)
+
+    def _consultas(self, fn, owner, termos):
+        with CaptureQueriesContext(connection) as ctx:
+            for termo in termos:
+                fn(owner, termo)
+        return len(ctx.captured_queries)
+
+    def handle(self, *args, **opts):
+        rng = random.Random(opts["semente"])
+        try:
+            with transaction.atomic():
+                gerado = gerador.gerar(1, opts["clientes"], 1, semente=opts["semente"], prefixo=PREFIXO)
+                owner = gerador.User.objects.get(pk=gerado["lojistas"][0])
+                nomes = list(Cliente.objects.filter(owner=owner).values_list("nome", flat=True))
+                sessoes = [_sessao(rng.choice(nomes), rng) for _ in range(opts["sessoes"])]
+                teclas = sum(len(s) for s in sessoes)
+
+                self.stdout.write(
+                    f"{opts['sessoes']} sessões, {teclas} teclas, {opts['clientes']} clientes\n\n"
+                    f"{'':<22} | {'requisições':>11} | {'SQL sem cache':>13} | {'SQL com LRU':>11}"
+                )
+                for rotulo, debounce in (("a cada tecla", 0), (f"debounce {opts['debounce_ms']} ms", opts["debounce_ms"])):
+                    termos = [t for s in sessoes for t in _requisicoes(s, debounce)]
+                    sem_cache = self._consultas(lambda o, t: sugerir_clientes(o, t, limite=sugestoes.LIMITE), owner, termos)
+                    sugestoes.limpar()
+                    com_lru = self._consultas(sugestoes.sugerir, owner, termos)
+                    self.stdout.write(f"{rotulo:<22} | {len(termos):>11} | {sem_cache:>13} | {com_lru:>11}")
+                raise _Rollback
+        except _Rollback:
+            pass
+        finally:
+            sugestoes.limpar()
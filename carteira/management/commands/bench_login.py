@@ -0,0 +1,103 @@
+# carteira/management/commands/bench_login.py
+import statistics
+import time
+
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from fiado_pro.auth_backends import _chave_falha, buscar_usuario
+
+User = get_user_model()
+
+PREFIXO = "__bench_login__"
+SENHA = "senha-do-bench"
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _busca_antiga(identificador):
+    """Como o backend fazia antes: email__iexact e, sem resultado, username__iexact."""
+    return (
+        User.objects.filter(email__iexact=identificador).first()
+        or User.objects.filter(username__iexact=identificador).first()
+    )
+
+
+def _sem_cache(fn):
+    """Apaga a marca de inexistente antes de cada chamada (mede a consulta, não o cache)."""
+    def medir(identificador):
+        cache.delete(_chave_falha(identificador.lower()))
+        return fn(identificador)
+    return medir
+
+
+def _login(identificador):
+    return authenticate(None, username=identificador, password=SENHA)
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede a latência (p50/p95) e o nº de queries do login em tabelas de usuários de vários tamanhos "
+        "(usuários gerados e desfeitos ao final): busca antiga (2x iexact) x busca atual (1 consulta, "
+        "índices LOWER) e authenticate completo, inclusive identificador inexistente com e sem cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tamanhos", type=int, nargs="+", default=[1000, 10000, 100000],
+                            help="Usuários na tabela em cada rodada.")
+        parser.add_argument("--repeticoes", type=int, default=50)
+
+    def _medir(self, fn, identificador, repeticoes):
+        tempos, queries = [], 0
+        for i in range(repeticoes + 1):  # a primeira é aquecimento
+            with CaptureQueriesContext(connection) as ctx:
+                inicio = time.perf_counter()
+                fn(identificador)
+                ms = (time.perf_counter() - inicio) * 1000
+            if i:
+                tempos.append(ms)
+                queries = max(queries, len(ctx.captured_queries))
+        ordenados = sorted(tempos)
+        return queries, statistics.median(tempos), ordenados[int(0.95 * (len(ordenados) - 1))]
+
+    def _rodada(self, tamanho, repeticoes):
+        senha = make_password(SENHA)
+        alvo = f"{PREFIXO}{tamanho // 2}"
+        cenarios = [
+            ("busca antiga, por e-mail", _busca_antiga, f"{alvo}@Exemplo.com"),
+            ("busca antiga, por username", _busca_antiga, alvo.upper()),
+            ("busca atual, por e-mail", buscar_usuario, f"{alvo}@Exemplo.com"),
+            ("busca atual, por username", buscar_usuario, alvo.upper()),
+            ("login por e-mail", _login, f"{alvo}@exemplo.com"),
+            ("login inexistente", _sem_cache(_login), "ninguem@exemplo.com"),
+            ("login inexistente (cache)", _login, "ninguem@exemplo.com"),
+        ]
+        try:
+            with transaction.atomic():
+                inicio = time.perf_counter()
+                User.objects.bulk_create(
+                    [
+                        User(username=f"{PREFIXO}{i}", email=f"{PREFIXO}{i}@exemplo.com", password=senha)
+                        for i in range(tamanho)
+                    ],
+                    batch_size=5000,
+                )
+                self.stdout.write(f"\n{tamanho} usuários gerados em {time.perf_counter() - inicio:.1f} s")
+                for nome, fn, identificador in cenarios:
+                    queries, p50, p95 = self._medir(fn, identificador, repeticoes)
+                    self.stdout.write(f"  {nome:<28} {queries:>2} queries | p50 {p50:>8.2f} ms | p95 {p95:>8.2f} ms")
+                raise _Rollback
+        except _Rollback:
+            pass
+        finally:
+            cache.delete(_chave_falha("ninguem@exemplo.com"))
+
+    def handle(self, *args, **opts):
+        for tamanho in opts["tamanhos"]:
+            self._rodada(tamanho, opts["repeticoes"])
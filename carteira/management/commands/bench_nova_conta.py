@@ -0,0 +1,58 @@
+# carteira/management/commands/bench_nova_conta.py
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from carteira.models import Cliente, ContaCarteira, ItemVenda
+from carteira.services import registrar_venda
+
+User = get_user_model()
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _por_item(owner, cliente, itens):
+    """Caminho antigo do nova_conta: um ItemVenda.objects.create (e seu sinal) por linha."""
+    conta = ContaCarteira.objects.create(owner=owner, cliente=cliente)
+    for it in itens:
+        ItemVenda.objects.create(conta=conta, **it)
+    conta.atualizar_totais()
+
+
+def _em_lote(owner, cliente, itens):
+    registrar_venda(owner, cliente, None, itens)
+
+
+class Command(BaseCommand):
+    help = "Compara nº de queries e tempo de criação de uma venda: item a item x registrar_venda (em lote)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--linhas", type=int, nargs="+", default=[1, 10, 50, 200])
+
+    def _medir(self, fn, n):
+        itens = [{"produto": f"Produto {i}", "quantidade": 1 + i % 3, "valor_unit": Decimal("9.90")} for i in range(n)]
+        try:
+            with transaction.atomic():
+                owner = User.objects.create(username="__bench_nova_conta__")
+                cliente = Cliente.objects.create(owner=owner, nome="Cliente Bench")
+                with CaptureQueriesContext(connection) as ctx:
+                    inicio = time.perf_counter()
+                    fn(owner, cliente, itens)
+                    ms = (time.perf_counter() - inicio) * 1000
+                raise _Rollback
+        except _Rollback:
+            pass
+        return len(ctx.captured_queries), ms
+
+    def handle(self, *args, **opts):
+        self.stdout.write(f"{'linhas':>7} | {'queries item a item':>20} | {'queries em lote':>16} | {'ms item a item':>15} | {'ms em lote':>11}")
+        for n in opts["linhas"]:
+            q_old, ms_old = self._medir(_por_item, n)
+            q_new, ms_new = self._medir(_em_lote, n)
+            self.stdout.write(f"{n:>7} | {q_old:>20} | {q_new:>16} | {ms_old:>15.1f} | {ms_new:>11.1f}")
@@ -0,0 +1,59 @@
+# carteira/management/commands/bench_senha.py
+import statistics
+import time
+
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, get_hasher
+from django.core.management.base import BaseCommand
+
+from fiado_pro.hashers import MINIMO_ITERACOES
+
+SENHA = "senha-do-bench"
+
+
+def _medir(hasher, encoded, repeticoes):
+    """(ms de CPU, ms de relógio) medianos de uma verificação de senha."""
+    cpu, relogio = [], []
+    for _ in range(repeticoes):
+        c, r = time.process_time(), time.perf_counter()
+        hasher.verify(SENHA, encoded)
+        cpu.append((time.process_time() - c) * 1000)
+        relogio.append((time.perf_counter() - r) * 1000)
+    return statistics.median(cpu), statistics.median(relogio)
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede o custo de CPU de uma verificação de senha (login, confirmação de exclusão/restauração) "
+        "com PBKDF2 em vários nºs de iterações e sugere CARTEIRA_PBKDF2_ITERACOES para um alvo em ms."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iteracoes", type=int, nargs="+", default=[100_000, 300_000, 600_000, 1_000_000])
+        parser.add_argument("--repeticoes", type=int, default=10)
+        parser.add_argument("--alvo-ms", type=float, default=100,
+                            help="CPU por verificação aceita na política (padrão 100 ms).")
+
+    def handle(self, *args, **opts):
+        atual = get_hasher("default")
+        self.stdout.write(
+            f"Hasher padrão: {type(atual).__module__}.{type(atual).__name__} "
+            f"({getattr(atual, 'iterations', '-')} iterações)"
+        )
+        self.stdout.write(f"\n{'iterações':>10} | {'ms CPU':>8} | {'ms relógio':>10} | {'verificações/s por núcleo':>26}")
+        ms_por_iteracao = []
+        for n in opts["iteracoes"]:
+            hasher = PBKDF2PasswordHasher()
+            encoded = hasher.encode(SENHA, hasher.salt(), n)
+            cpu, relogio = _medir(hasher, encoded, opts["repeticoes"])
+            ms_por_iteracao.append(cpu / n)
+            self.stdout.write(f"{n:>10} | {cpu:>8.1f} | {relogio:>10.1f} | {1000 / cpu if cpu else 0:>26.1f}")
+
+        sugerido = int(opts["alvo_ms"] / statistics.median(ms_por_iteracao) // 10_000 * 10_000)
+        sugerido = max(sugerido, MINIMO_ITERACOES)  # o hasher não aceita menos que isso
+        self.stdout.write(
+            f"\nPara ~{opts['alvo_ms']:.0f} ms de CPU por verificação nesta máquina: "
+            f"CARTEIRA_PBKDF2_ITERACOES = {sugerido:_}"
+        )
+        self.stdout.write(
+            "Confirmações dentro da janela (CARTEIRA_CONFIRMACAO_SEGUNDOS) não verificam senha: custo de hash zero."
+        )
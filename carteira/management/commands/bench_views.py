@@ -0,0 +1,183 @@
+# carteira/management/commands/bench_views.py
+import json
+import statistics
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from carteira import gerador
+from carteira.models import Cliente, ContaCarteira
+from carteira.totais import invalidar_totais
+
+PREFIXO = "__bench_views__"
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _alvos(owner):
+    """Conta com itens e pagamentos, cliente e termo de busca usados nos cenários."""
+    conta = (
+        ContaCarteira.objects.filter(owner=owner, is_deleted=False, status__in=["EM_ABERTO", "ATRASO"])
+        .order_by("id").first()
+    )
+    cliente = Cliente.objects.filter(owner=owner).order_by("id").first()
+    return {"conta_id": conta.id, "cliente_id": cliente.id, "termo": cliente.nome.split()[1][:3]}
+
+
+def _nova_conta_post(alvos):
+    dados = {
+        "cliente_id": alvos["cliente_id"],
+        "vencimento": (timezone.localdate() + timedelta(days=30)).isoformat(),
+        "itens-TOTAL_FORMS": "3",
+        "itens-INITIAL_FORMS": "0",
+    }
+    for i in range(3):
+        dados.update({f"itens-{i}-produto": f"Produto {i}", f"itens-{i}-quantidade": "2", f"itens-{i}-valor_unit": "4.50"})
+    return dados
+
+
+# (nome, escreve?, requisição) — escreve=True roda dentro de um savepoint desfeito a cada repetição
+CENARIOS = [
+    ("dashboard", False, lambda c, a: c.get("/")),
+    ("clientes_lista", False, lambda c, a: c.get("/clientes/")),
+    ("conta_detalhe", False, lambda c, a: c.get(f"/conta/{a['conta_id']}/")),
+    ("pagar", True, lambda c, a: c.post(f"/conta/{a['conta_id']}/pagar/", {"valor": "1.00"})),
+    ("nova_conta", True, lambda c, a: c.post("/nova/", _nova_conta_post(a))),
+    ("api_clientes_busca", False, lambda c, a: c.get("/api/clientes/busca/", {"q": a["termo"]})),
+]
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(int(round(p / 100 * (len(ordenados) - 1))), len(ordenados) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede nº de queries e latência (p50/p95) das views principais em vários tamanhos de carteira "
+        "(dados gerados e desfeitos ao final). --gravar salva o resultado como baseline JSON; "
+        "--comparar acusa regressões em relação a ele."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tamanhos", type=int, nargs="+", default=[100, 1000, 10000],
+                            help="Clientes por lojista em cada rodada.")
+        parser.add_argument("--contas-por-cliente", type=float, default=3)
+        parser.add_argument("--lojistas", type=int, default=2,
+                            help="Lojistas gerados por rodada (o primeiro é o medido, os outros dividem as tabelas).")
+        parser.add_argument("--repeticoes", type=int, default=20)
+        parser.add_argument("--baseline", default=str(Path(settings.BASE_DIR) / "bench_baseline.json"))
+        parser.add_argument("--gravar", action="store_true", help="Grava o resultado em --baseline.")
+        parser.add_argument("--comparar", action="store_true", help="Compara com --baseline e falha em regressão.")
+        parser.add_argument("--tolerancia", type=float, default=0.25,
+                            help="Aumento relativo de p50 aceito antes de acusar regressão (padrão 25%%).")
+
+    def _medir(self, client, alvos, escreve, fn, repeticoes):
+        tempos, queries = [], []
+        for i in range(repeticoes + 1):  # a primeira é aquecimento
+            try:
+                with transaction.atomic():
+                    with CaptureQueriesContext(connection) as ctx:
+                        inicio = time.perf_counter()
+                        resp = fn(client, alvos)
+                        ms = (time.perf_counter() - inicio) * 1000
+                    if resp.status_code >= 400:
+                        raise CommandError(f"HTTP {resp.status_code}")
+                    if escreve:
+                        raise _Rollback
+            except _Rollback:
+                pass
+            if i:
+                tempos.append(ms)
+                queries.append(len(ctx.captured_queries))
+        return {
+            "queries": max(queries),
+            "p50_ms": round(statistics.median(tempos), 2),
+            "p95_ms": round(_percentil(tempos, 95), 2),
+            "max_ms": round(max(tempos), 2),
+        }
+
+    def _rodada(self, tamanho, opts):
+        resultado = {}
+        owner_ids = []
+        try:
+            with transaction.atomic():
+                inicio = time.perf_counter()
+                gerado = gerador.gerar(opts["lojistas"], tamanho, opts["contas_por_cliente"], semente=tamanho, prefixo=PREFIXO)
+                owner_ids = gerado["lojistas"]
+                self.stdout.write(
+                    f"\n{tamanho} clientes/lojista: {gerado['contas']} contas, {gerado['itens']} itens, "
+                    f"{gerado['pagamentos']} pagamentos gerados em {time.perf_counter() - inicio:.1f} s"
+                )
+                client = Client()
+                client.force_login(gerador.User.objects.get(pk=owner_ids[0]))
+                alvos = _alvos(owner_ids[0])
+                for nome, escreve, fn in CENARIOS:
+                    r = self._medir(client, alvos, escreve, fn, opts["repeticoes"])
+                    resultado[nome] = r
+                    self.stdout.write(
+                        f"  {nome:<20} {r['queries']:>4} queries | p50 {r['p50_ms']:>8.1f} ms | "
+                        f"p95 {r['p95_ms']:>8.1f} ms | max {r['max_ms']:>8.1f} ms"
+                    )
+                raise _Rollback
+        except _Rollback:
+            pass
+        finally:
+            # o cache de totais pode ter guardado lojistas que o rollback apagou
+            invalidar_totais(*owner_ids)
+        return resultado
+
+    def _comparar(self, atual, base, tolerancia):
+        regressoes = []
+        for tamanho, views in atual.items():
+            for nome, r in views.items():
+                b = base.get(tamanho, {}).get(nome)
+                if not b:
+                    continue
+                if r["queries"] > b["queries"]:
+                    regressoes.append(f"{tamanho}/{nome}: queries {b['queries']} -> {r['queries']}")
+                # ignora variações de poucos ms (ruído de máquina)
+                if r["p50_ms"] > b["p50_ms"] * (1 + tolerancia) and r["p50_ms"] - b["p50_ms"] > 5:
+                    regressoes.append(f"{tamanho}/{nome}: p50 {b['p50_ms']} ms -> {r['p50_ms']} ms")
+        return regressoes
+
+    def handle(self, *args, **opts):
+        setup_test_environment()  # ALLOWED_HOSTS do Client de teste
+        try:
+            resultados = {str(t): self._rodada(t, opts) for t in opts["tamanhos"]}
+        finally:
+            teardown_test_environment()
+
+        dados = {
+            "meta": {
+                "banco": connection.vendor,
+                "data": timezone.now().isoformat(timespec="seconds"),
+                "contas_por_cliente": opts["contas_por_cliente"],
+                "lojistas": opts["lojistas"],
+                "repeticoes": opts["repeticoes"],
+            },
+            "resultados": resultados,
+        }
+        caminho = Path(opts["baseline"])
+        if opts["comparar"]:
+            if not caminho.exists():
+                raise CommandError(f"Baseline {caminho} não encontrado (gere com --gravar).")
+            base = json.loads(caminho.read_text(encoding="utf-8"))["resultados"]
+            regressoes = self._comparar(resultados, base, opts["tolerancia"])
+            if regressoes:
+                for r in regressoes:
+                    self.stdout.write(self.style.ERROR(f"REGRESSÃO {r}"))
+                raise CommandError(f"{len(regressoes)} regressão(ões) em relação a {caminho}.")
+            self.stdout.write(self.style.SUCCESS(f"Sem regressões em relação a {caminho}."))
+        if opts["gravar"]:
+            caminho.write_text(json.dumps(dados, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+            self.stdout.write(f"Baseline gravado em {caminho}.")
@@ -0,0 +1,45 @@
+# carteira/management/commands/gerar_dados.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from carteira import gerador
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera lojistas de teste com clientes, contas, itens e pagamentos em volume (bulk insert). "
+        "Ex.: gerar_dados --lojistas 10 --clientes 5000 --contas-por-cliente 4"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lojistas", type=int, default=1)
+        parser.add_argument("--clientes", type=int, default=1000, help="Clientes por lojista.")
+        parser.add_argument("--contas-por-cliente", type=float, default=3, help="Média de contas por cliente.")
+        parser.add_argument("--semente", type=int, help="Semente do gerador (dados reproduzíveis).")
+        parser.add_argument("--remover", action="store_true", help=f"Apaga todos os lojistas '{gerador.USUARIO_PREFIXO}*' e sai.")
+
+    def handle(self, *args, **opts):
+        if opts["remover"]:
+            n = gerador.remover()
+            self.stdout.write(f"{n} lojista(s) gerado(s) removido(s).")
+            return
+
+        inicio = time.perf_counter()
+
+        def progresso(res):
+            seg = time.perf_counter() - inicio
+            self.stdout.write(
+                f"{res['clientes']} clientes | {res['contas']} contas | {res['itens']} itens | "
+                f"{res['pagamentos']} pagamentos | {res['contas'] / seg:.0f} contas/s"
+            )
+
+        res = gerador.gerar(
+            opts["lojistas"], opts["clientes"], opts["contas_por_cliente"],
+            semente=opts["semente"], progresso=progresso,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(res['lojistas'])} lojista(s) (ids {', '.join(map(str, res['lojistas']))}): "
+            f"{res['clientes']} clientes, {res['contas']} contas, {res['itens']} itens, "
+            f"{res['pagamentos']} pagamentos em {time.perf_counter() - inicio:.1f} s."
+        ))
@@ -0,0 +1,48 @@
+# carteira/management/commands/importar_clientes.py
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from carteira import importar
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa clientes e contas em aberto de um CSV para um lojista "
+        "(colunas: nome;cpf;telefone;email;endereco;vencimento;valor;produto)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("arquivo", help="Caminho do CSV (UTF-8, separado por ';' ou ',').")
+        parser.add_argument("--owner", required=True, help="Lojista dono dos dados (id ou username).")
+        parser.add_argument("--lote", type=int, default=importar.LOTE, help="Linhas por bulk_create/transação.")
+
+    def handle(self, *args, **opts):
+        User = get_user_model()
+        ref = opts["owner"]
+        try:
+            owner = User.objects.get(pk=int(ref)) if ref.isdigit() else User.objects.get(username=ref)
+        except User.DoesNotExist:
+            raise CommandError(f"Lojista {ref!r} não encontrado.")
+
+        def progresso(res):
+            self.stdout.write(
+                f"{res['linhas']} linha(s) | {res['clientes_criados']} cliente(s) | "
+                f"{res['contas_criadas']} conta(s) | {res['total_erros']} erro(s) | "
+                f"{importar.linhas_por_segundo(res):.0f} linhas/s"
+            )
+
+        try:
+            with open(opts["arquivo"], "rb") as f:
+                res = importar.importar_csv(owner, f, lote=max(opts["lote"], 1), progresso=progresso)
+        except (OSError, ValueError, UnicodeDecodeError) as e:
+            raise CommandError(str(e))
+
+        for linha, msg in res["erros"]:
+            self.stderr.write(f"Linha {linha}: {msg}")
+        if res["total_erros"] > len(res["erros"]):
+            self.stderr.write(f"... e mais {res['total_erros'] - len(res['erros'])} linha(s) com erro.")
+        self.stdout.write(self.style.SUCCESS(
+            f"{res['linhas']} linha(s) em {res['segundos']:.1f} s ({importar.linhas_por_segundo(res):.0f} linhas/s): "
+            f"{res['clientes_criados']} cliente(s) criado(s), {res['clientes_existentes']} reaproveitado(s), "
+            f"{res['contas_criadas']} conta(s), {res['total_erros']} erro(s)."
+        ))
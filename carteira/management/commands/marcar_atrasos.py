@@ -0,0 +1,19 @@
+# carteira/management/commands/marcar_atrasos.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from carteira.ledger import marcar_atrasos
+
+
+class Command(BaseCommand):
+    help = (
+        "Marca como ATRASO as contas em aberto com vencimento vencido. "
+        "Agende diariamente logo após a meia-noite (ex.: cron '5 0 * * * python manage.py marcar_atrasos')."
+    )
+
+    def handle(self, *args, **opts):
+        inicio = time.perf_counter()
+        alteradas = marcar_atrasos()
+        ms = (time.perf_counter() - inicio) * 1000
+        self.stdout.write(f"{alteradas} conta(s) marcada(s) como ATRASO em {ms:.1f} ms.")
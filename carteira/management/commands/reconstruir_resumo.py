@@ -0,0 +1,18 @@
+# carteira/management/commands/reconstruir_resumo.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from carteira.resumo import reconstruir
+
+
+class Command(BaseCommand):
+    help = "Refaz o resumo diário (vendas e recebimentos por lojista e dia) a partir de itens e pagamentos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--owner", type=int, action="append", help="Só este usuário (id); pode repetir.")
+
+    def handle(self, *args, **opts):
+        inicio = time.perf_counter()
+        n = reconstruir(opts["owner"])
+        self.stdout.write(f"{n} linha(s) de resumo gravada(s) em {time.perf_counter() - inicio:.1f} s.")
@@ -0,0 +1,28 @@
+# carteira/management/commands/verificar_donos.py
+from django.core.management.base import BaseCommand
+from django.db.models import F, OuterRef, Subquery
+
+from carteira.models import ContaCarteira, ItemVenda, Pagamento
+
+
+class Command(BaseCommand):
+    help = "Confere se o owner copiado em itens e pagamentos é o dono da conta (e corrige com --corrigir)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--corrigir", action="store_true", help="Copia de novo o dono da conta nas linhas divergentes.")
+
+    def handle(self, *args, **opts):
+        dono = ContaCarteira.objects.filter(pk=OuterRef("conta_id")).values("owner_id")[:1]
+        total = 0
+        for model in (ItemVenda, Pagamento):
+            divergentes = model.objects.exclude(owner_id=F("conta__owner_id"))
+            n = divergentes.count()
+            total += n
+            self.stdout.write(f"{model.__name__}: {n} divergente(s).")
+            if n and opts["corrigir"]:
+                corrigidas = model.objects.filter(pk__in=list(divergentes.values_list("pk", flat=True))).update(
+                    owner_id=Subquery(dono)
+                )
+                self.stdout.write(self.style.SUCCESS(f"{corrigidas} corrigida(s)."))
+        if total and not opts["corrigir"]:
+            self.stdout.write(self.style.WARNING(f"{total} linha(s) com owner diferente do dono da conta."))
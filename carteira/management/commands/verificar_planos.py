@@ -0,0 +1,118 @@
+# carteira/management/commands/verificar_planos.py
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from carteira.busca import _ids_com_termo, indexar_em_lote
+from carteira.models import Cliente, ContaCarteira
+from carteira.pagination import PAGE_SIZE
+from carteira.views import _order_qs
+
+User = get_user_model()
+BENCH_USER = "__bench_planos__"
+
+
+def _consultas(owner):
+    """(descrição, queryset, índices aceitos) — mesmas formas de consulta das views."""
+    base = ContaCarteira.objects.filter(owner=owner, is_deleted=False)
+    hoje = timezone.localdate()
+    return [
+        ("dashboard: seção por id", _order_qs(base.filter(status="ATRASO"), "id", "desc")[:PAGE_SIZE + 1],
+         {"conta_own_st_id_idx", "conta_own_st_venc_idx"}),
+        ("dashboard: seção por vencimento", _order_qs(base.filter(status="EM_ABERTO"), "vencimento", "asc")[:PAGE_SIZE + 1],
+         {"conta_own_st_venc_idx", "conta_own_st_id_idx"}),
+        ("dashboard: filtro por status", base.filter(status="PAGO").order_by().values("id"),
+         {"conta_own_st_id_idx", "conta_own_st_venc_idx"}),
+        ("lista por criação", base.order_by("-criado_em", "-id")[:PAGE_SIZE],
+         {"conta_own_criado_idx"}),
+        ("excluidos", ContaCarteira.objects.filter(owner=owner, is_deleted=True).order_by("-deleted_at", "-id"),
+         {"conta_own_deleted_at_idx"}),
+        ("clientes_lista", Cliente.objects.filter(owner=owner).order_by("nome"),
+         {"cliente_owner_nome_idx"}),
+        ("busca de clientes", _ids_com_termo(owner, "cliente"),
+         {"termo_owner_termo_idx"}),
+        ("marcar_atrasos", ContaCarteira.objects.filter(status="EM_ABERTO", vencimento__lt=hoje).values("id"),
+         {"conta_status_venc_idx"}),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Confere (EXPLAIN) se as consultas quentes usam os índices compostos. "
+        "Com --semear N cria N contas de teste, espalhadas entre --lojistas usuários próprios, antes da verificação."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--semear", type=int, default=0, help="Contas a gerar (ex.: 1000000).")
+        parser.add_argument("--lojistas", type=int, default=50, help="Quantos lojistas de teste dividem as contas.")
+        parser.add_argument("--limpar", action="store_true", help="Apaga os dados de teste ao final.")
+
+    def _semear(self, owners, n):
+        hoje = timezone.localdate()
+        n_clientes = max(n // 20 // len(owners), 1)
+        Cliente.objects.bulk_create(
+            [Cliente(owner=o, nome=f"Cliente {i:07d}", cpf=f"{i:011d}") for o in owners for i in range(n_clientes)],
+            batch_size=5000,
+        )
+        indexar_em_lote(Cliente.objects.filter(owner__in=owners))
+        clientes = list(Cliente.objects.filter(owner__in=owners).values_list("id", "owner_id"))
+        status = ["PAGO"] * 6 + ["EM_ABERTO"] * 3 + ["ATRASO"]
+        lote = []
+        for i in range(n):
+            st = random.choice(status)
+            total = Decimal(random.randint(1000, 50000)) / 100
+            cliente_id, owner_id = random.choice(clientes)
+            lote.append(ContaCarteira(
+                owner_id=owner_id, cliente_id=cliente_id, status=st, total=total,
+                saldo=Decimal("0") if st == "PAGO" else total,
+                criado_em=hoje - timedelta(days=random.randint(0, 720)),
+                vencimento=hoje + timedelta(days=random.randint(-300, 120)),
+                is_deleted=i % 100 == 0,
+                deleted_at=timezone.now() if i % 100 == 0 else None,
+            ))
+            if len(lote) == 10000:
+                ContaCarteira.objects.bulk_create(lote)
+                lote = []
+        ContaCarteira.objects.bulk_create(lote)
+
+    def _analyze(self):
+        with connection.cursor() as cur:
+            if connection.vendor == "mysql":
+                for model in (ContaCarteira, Cliente):
+                    cur.execute(f"ANALYZE TABLE {model._meta.db_table}")
+            else:
+                cur.execute("ANALYZE")
+
+    def handle(self, *args, **opts):
+        owners = [User.objects.get_or_create(username=f"{BENCH_USER}{k}")[0] for k in range(max(opts["lojistas"], 1))]
+        owner = owners[0]
+        if opts["semear"]:
+            inicio = time.perf_counter()
+            self._semear(owners, opts["semear"])
+            self.stdout.write(f"{opts['semear']} contas geradas em {time.perf_counter() - inicio:.1f} s.")
+        self._analyze()
+
+        falhas = []
+        for nome, qs, indices in _consultas(owner):
+            plano = qs.explain()
+            usado = sorted(i for i in indices if i in plano)
+            if usado:
+                self.stdout.write(self.style.SUCCESS(f"OK    {nome}: {', '.join(usado)}"))
+            else:
+                falhas.append(nome)
+                self.stdout.write(self.style.ERROR(f"FALHA {nome}: esperado {' ou '.join(sorted(indices))}"))
+                self.stdout.write(f"      {plano}")
+
+        if opts["limpar"]:
+            ContaCarteira.objects.filter(owner__in=owners).delete()
+            Cliente.objects.filter(owner__in=owners).delete()
+            User.objects.filter(pk__in=[o.pk for o in owners]).delete()
+
+        if falhas:
+            raise CommandError(f"{len(falhas)} consulta(s) sem o índice esperado.")
@@ -0,0 +1,64 @@
+# carteira/management/commands/verificar_saldos.py
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from carteira.models import ContaCarteira, ItemVenda, Pagamento
+
+DEC = DecimalField(max_digits=12, decimal_places=2)
+
+
+def _soma(model, expr):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(conta=OuterRef("pk")).order_by().values("conta")
+            .annotate(t=Sum(expr, output_field=DEC)).values("t")
+        ),
+        Decimal("0"),
+        output_field=DEC,
+    )
+
+
+class Command(BaseCommand):
+    help = "Compara total/total_pago/saldo/status gravados com a soma real de itens e pagamentos (e corrige com --corrigir)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--owner", type=int, help="Verifica só as contas deste usuário (id).")
+        parser.add_argument("--corrigir", action="store_true", help="Recalcula as contas divergentes.")
+
+    def handle(self, *args, **opts):
+        qs = ContaCarteira.objects.all()
+        if opts["owner"]:
+            qs = qs.filter(owner_id=opts["owner"])
+        qs = qs.annotate(
+            itens_real=_soma(ItemVenda, F("quantidade") * F("valor_unit")),
+            pago_real=_soma(Pagamento, F("valor")),
+        ).order_by("id")
+
+        verificadas = 0
+        divergentes = []
+        for conta in qs.iterator(chunk_size=2000):
+            verificadas += 1
+            saldo_real, status_real = ContaCarteira.calcular_saldo_status(
+                conta.itens_real, conta.pago_real, conta.vencimento,
+            )
+            gravado = (conta.total, conta.total_pago, conta.saldo, conta.status)
+            if gravado != (conta.itens_real, conta.pago_real, saldo_real, status_real):
+                divergentes.append(conta.id)
+                self.stdout.write(
+                    f"Conta #{conta.id}: total {conta.total}≠{conta.itens_real} | "
+                    f"pago {conta.total_pago}≠{conta.pago_real} | saldo {conta.saldo}≠{saldo_real} | "
+                    f"status {conta.status}≠{status_real}"
+                )
+
+        if divergentes and opts["corrigir"]:
+            with transaction.atomic():
+                for conta in ContaCarteira.objects.filter(id__in=divergentes):
+                    conta.atualizar_totais()
+            self.stdout.write(self.style.SUCCESS(f"{len(divergentes)} conta(s) corrigida(s)."))
+
+        msg = f"{verificadas} conta(s) verificada(s), {len(divergentes)} divergente(s)."
+        self.stdout.write(self.style.WARNING(msg) if divergentes and not opts["corrigir"] else msg)
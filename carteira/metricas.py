@@ -0,0 +1,186 @@
+# carteira/metricas.py
+"""
+Métricas por view: nº de queries, tempo de SQL, tempo de template e latência total.
+
+Opt-in: inclua "carteira.metricas.MetricasMiddleware" em MIDDLEWARE (depois do
+AuthenticationMiddleware). Cada request entra num histograma em memória do processo,
+por nome de rota ("carteira:dashboard", ...); `relatorio()` devolve p50/p95/p99 de cada uma
+e a view `metricas` (staff) expõe o relatório do processo que atendeu a request.
+
+Configuração (settings, opcionais):
+- CARTEIRA_METRICAS_LIMITE_QUERIES (None): loga (WARNING, logger "carteira.metricas")
+  toda request com mais queries que isso, com as SQLs mais repetidas;
+- CARTEIRA_METRICAS_LIMITE_MS (None): idem para a latência total.
+
+O tempo de template inclui as queries disparadas durante a renderização (querysets
+preguiçosos no template), que também entram em queries/SQL.
+"""
+import logging
+import math
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+METRICAS = ("queries", "sql_ms", "template_ms", "total_ms")
+FATOR = 1.1  # largura relativa dos baldes: percentis com erro de até 10%
+
+_local = threading.local()
+_lock = threading.Lock()
+_views = {}
+
+
+def _limite_queries():
+    return getattr(settings, "CARTEIRA_METRICAS_LIMITE_QUERIES", None)
+
+
+def _limite_ms():
+    return getattr(settings, "CARTEIRA_METRICAS_LIMITE_MS", None)
+
+
+# ====== HISTOGRAMA ======
+class Histograma:
+    """Baldes logarítmicos (memória constante, qualquer nº de amostras)."""
+
+    def __init__(self):
+        self.baldes = Counter()
+        self.n = 0
+        self.soma = 0.0
+        self.maximo = 0.0
+
+    def adicionar(self, valor):
+        self.baldes[math.ceil(math.log(valor, FATOR)) if valor >= 1 else 0] += 1
+        self.n += 1
+        self.soma += valor
+        self.maximo = max(self.maximo, valor)
+
+    def percentil(self, p):
+        """Limite superior do balde que contém o percentil p (0–100)."""
+        if not self.n:
+            return 0.0
+        alvo = p / 100 * self.n
+        acumulado = 0
+        for balde in sorted(self.baldes):
+            acumulado += self.baldes[balde]
+            if acumulado >= alvo:
+                return min(FATOR ** balde if balde else 1.0, self.maximo)
+        return self.maximo
+
+
+def registrar(rota, amostra):
+    with _lock:
+        hists = _views.setdefault(rota, {m: Histograma() for m in METRICAS})
+        for m in METRICAS:
+            hists[m].adicionar(amostra[m])
+
+
+def relatorio():
+    """{rota: {"n": ..., "queries": {"p50", "p95", "p99", "media", "max"}, ...}}, mais lentas primeiro."""
+    with _lock:
+        out = {}
+        for rota, hists in _views.items():
+            out[rota] = {"n": hists["total_ms"].n}
+            for m, h in hists.items():
+                out[rota][m] = {
+                    "p50": round(h.percentil(50), 1),
+                    "p95": round(h.percentil(95), 1),
+                    "p99": round(h.percentil(99), 1),
+                    "media": round(h.soma / h.n, 1),
+                    "max": round(h.maximo, 1),
+                }
+    return dict(sorted(out.items(), key=lambda kv: kv[1]["total_ms"]["p95"], reverse=True))
+
+
+def zerar():
+    with _lock:
+        _views.clear()
+
+
+# ====== COLETA ======
+def _contar_sql(execute, sql, params, many, context):
+    med = getattr(_local, "medicao", None)
+    if med is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        med["sql_ms"] += (time.perf_counter() - inicio) * 1000
+        med["queries"] += 1
+        if med["sqls"] is not None:
+            med["sqls"][sql] += 1
+
+
+_patch_lock = threading.Lock()
+_template_instrumentado = False
+
+
+def _instrumentar_templates():
+    """Soma o tempo de Template.render (backend do Django) na medição da request corrente."""
+    global _template_instrumentado
+    with _patch_lock:
+        if _template_instrumentado:
+            return
+        from django.template.backends.django import Template
+
+        original = Template.render
+
+        def render(self, *args, **kwargs):
+            med = getattr(_local, "medicao", None)
+            # só o template de fora conta: includes/extends renderizam dentro dele
+            if med is None or med["em_template"]:
+                return original(self, *args, **kwargs)
+            med["em_template"] = True
+            inicio = time.perf_counter()
+            try:
+                return original(self, *args, **kwargs)
+            finally:
+                med["template_ms"] += (time.perf_counter() - inicio) * 1000
+                med["em_template"] = False
+
+        Template.render = render
+        _template_instrumentado = True
+
+
+class MetricasMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        _instrumentar_templates()
+
+    def __call__(self, request):
+        # lidos a cada request: mudam sem reiniciar o processo (e com override_settings)
+        limite_queries, limite_ms = _limite_queries(), _limite_ms()
+        med = {
+            "queries": 0, "sql_ms": 0.0, "template_ms": 0.0, "em_template": False,
+            "sqls": Counter() if limite_queries is not None else None,
+        }
+        _local.medicao = med
+        inicio = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(_contar_sql))
+                response = self.get_response(request)
+        finally:
+            _local.medicao = None
+        med["total_ms"] = (time.perf_counter() - inicio) * 1000
+
+        match = getattr(request, "resolver_match", None)
+        rota = match.view_name if match else "<sem rota>"
+        registrar(rota, med)
+
+        excedeu_q = limite_queries is not None and med["queries"] > limite_queries
+        excedeu_ms = limite_ms is not None and med["total_ms"] > limite_ms
+        if excedeu_q or excedeu_ms:
+            repetidas = "; ".join(f"{n}x {sql[:200]}" for sql, n in (med["sqls"] or Counter()).most_common(3) if n > 1)
+            logger.warning(
+                "%s %s (%s): %d queries, SQL %.1f ms, template %.1f ms, total %.1f ms%s",
+                request.method, request.path, rota, med["queries"], med["sql_ms"], med["template_ms"],
+                med["total_ms"], f" | repetidas: {repetidas}" if repetidas else "",
+            )
+        return response
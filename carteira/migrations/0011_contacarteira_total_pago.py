@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:23
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def preencher_total_pago(apps, schema_editor):
+    ContaCarteira = apps.get_model("carteira", "ContaCarteira")
+    Pagamento = apps.get_model("carteira", "Pagamento")
+    soma = (
+        Pagamento.objects.filter(conta=OuterRef("pk"))
+        .order_by()
+        .values("conta")
+        .annotate(t=Sum("valor"))
+        .values("t")
+    )
+    ContaCarteira.objects.update(
+        total_pago=Coalesce(Subquery(soma), Decimal("0"), output_field=models.DecimalField(max_digits=12, decimal_places=2))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carteira', '0010_cliente_owner'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contacarteira',
+            name='total_pago',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.RunPython(preencher_total_pago, migrations.RunPython.noop),
+    ]
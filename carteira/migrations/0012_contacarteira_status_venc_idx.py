@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carteira', '0011_contacarteira_total_pago'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contacarteira',
+            index=models.Index(fields=['status', 'vencimento'], name='conta_status_venc_idx'),
+        ),
+    ]
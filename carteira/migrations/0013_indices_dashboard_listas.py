@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carteira', '0012_contacarteira_status_venc_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['owner', 'nome'], name='cliente_owner_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contacarteira',
+            index=models.Index(fields=['owner', 'status', 'id'], name='conta_own_st_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contacarteira',
+            index=models.Index(fields=['owner', 'status', 'vencimento', 'id'], name='conta_own_st_venc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contacarteira',
+            index=models.Index(fields=['owner', 'criado_em', 'id'], name='conta_own_criado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contacarteira',
+            index=models.Index(fields=['owner', 'deleted_at', 'id'], name='conta_own_deleted_at_idx'),
+        ),
+    ]
@@ -0,0 +1,111 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:32
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# cópia de carteira.busca como era nesta migração: mudanças futuras no tokenizador não
+# podem alterar o que ela faz num banco novo
+LIMITE_TERMO = 64
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(ch for ch in texto if not unicodedata.combining(ch)).lower().strip()
+
+
+def _digitos(texto):
+    return re.sub(r"\D+", "", texto or "")
+
+
+def _palavras(texto):
+    return re.findall(r"[^\W_]+", normalizar(texto))
+
+
+def texto_busca(nome, cpf, telefone, email):
+    return " ".join(p for p in (normalizar(nome), _digitos(cpf), _digitos(telefone), normalizar(email)) if p)
+
+
+def termos(nome, cpf, telefone, email):
+    out = list(_palavras(nome))
+    doc = _digitos(cpf)
+    if doc:
+        out.append(doc)
+    tel = _digitos(telefone)
+    if tel:
+        out.append(tel)
+        if len(tel) >= 10:
+            out.append(tel[2:])
+    email = normalizar(email)
+    if email:
+        out.append(email)
+        out.extend(_palavras(email.split("@")[0]))
+    return list(dict.fromkeys(t[:LIMITE_TERMO] for t in out))
+
+
+def indexar_clientes(apps, schema_editor):
+    Cliente = apps.get_model("carteira", "Cliente")
+    ClienteTermo = apps.get_model("carteira", "ClienteTermo")
+    lote, novos = [], []
+    for c in Cliente.objects.order_by("id").iterator(chunk_size=2000):
+        c.busca = texto_busca(c.nome, c.cpf, c.telefone, c.email)
+        lote.append(c)
+        novos.extend(
+            ClienteTermo(owner_id=c.owner_id, cliente_id=c.id, termo=t)
+            for t in termos(c.nome, c.cpf, c.telefone, c.email)
+        )
+        if len(lote) >= 2000:
+            Cliente.objects.bulk_update(lote, ["busca"])
+            ClienteTermo.objects.bulk_create(novos)
+            lote, novos = [], []
+    Cliente.objects.bulk_update(lote, ["busca"])
+    ClienteTermo.objects.bulk_create(novos)
+
+
+def criar_indice_trigram(apps, schema_editor):
+    # só PostgreSQL: substring (LIKE '%x%') em Cliente.busca via pg_trgm; os demais bancos usam ClienteTermo
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS cliente_busca_trgm_idx ON carteira_cliente USING gin (busca gin_trgm_ops)"
+    )
+
+
+def remover_indice_trigram(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS cliente_busca_trgm_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carteira', '0013_indices_dashboard_listas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='busca',
+            field=models.CharField(blank=True, editable=False, max_length=400),
+        ),
+        migrations.CreateModel(
+            name='ClienteTermo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('termo', models.CharField(max_length=64)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='termos', to='carteira.cliente')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', 'termo', 'cliente'], name='termo_owner_termo_idx')],
+            },
+        ),
+        migrations.RunPython(indexar_clientes, migrations.RunPython.noop),
+        migrations.RunPython(criar_indice_trigram, remover_indice_trigram),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carteira', '0015_auditlog_user_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contacarteira',
+            name='versao',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def preencher_resumo(apps, schema_editor):
+    """Mesma conta de carteira.resumo.reconstruir, com os modelos históricos."""
+    from collections import defaultdict
+    from decimal import Decimal
+
+    from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+    from django.utils import timezone
+
+    ContaCarteira = apps.get_model("carteira", "ContaCarteira")
+    ItemVenda = apps.get_model("carteira", "ItemVenda")
+    Pagamento = apps.get_model("carteira", "Pagamento")
+    ResumoDiario = apps.get_model("carteira", "ResumoDiario")
+
+    contas = ContaCarteira.objects.filter(is_deleted=False).values("id")
+    linhas = defaultdict(lambda: [Decimal("0"), Decimal("0"), 0])
+    subtotal = ExpressionWrapper(F("quantidade") * F("valor_unit"), output_field=DecimalField(max_digits=14, decimal_places=2))
+    for r in (
+        ItemVenda.objects.filter(conta__in=contas).values("conta__owner_id", "conta__criado_em")
+        .annotate(t=Sum(subtotal)).order_by()
+    ):
+        linhas[(r["conta__owner_id"], r["conta__criado_em"])][0] += r["t"] or 0
+    for owner_id, data, valor in (
+        Pagamento.objects.filter(conta__in=contas).values_list("conta__owner_id", "data_pagamento", "valor")
+        .iterator(chunk_size=5000)
+    ):
+        linha = linhas[(owner_id, timezone.localdate(data))]
+        linha[1] += valor
+        linha[2] += 1
+    ResumoDiario.objects.bulk_create(
+        [
+            ResumoDiario(owner_id=owner_id, dia=dia, vendas=v, recebido=r, n_pagamentos=n)
+            for (owner_id, dia), (v, r, n) in linhas.items()
+        ],
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carteira', '0016_contacarteira_versao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('vendas', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('recebido', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('n_pagamentos', models.IntegerField(default=0)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('owner', 'dia'), name='resumo_owner_dia_uniq')],
+            },
+        ),
+        migrations.RunPython(preencher_resumo, migrations.RunPython.noop),
+    ]
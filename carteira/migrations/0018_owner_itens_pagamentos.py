@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+
+LOTE = 5000
+
+
+def preencher_owner(apps, schema_editor):
+    """
+    Copia conta.owner para itens e pagamentos em faixas de id: cada UPDATE toca no máximo
+    LOTE linhas e, com a migração não atômica, é confirmado em seguida (travas curtas).
+    Só mexe em linhas ainda sem owner, então pode ser retomada se parar no meio.
+    """
+    ContaCarteira = apps.get_model("carteira", "ContaCarteira")
+    dono = ContaCarteira.objects.filter(pk=OuterRef("conta_id")).values("owner_id")[:1]
+    for nome in ("ItemVenda", "Pagamento"):
+        Model = apps.get_model("carteira", nome)
+        maximo = Model.objects.aggregate(m=Max("id"))["m"] or 0
+        for inicio in range(0, maximo, LOTE):
+            Model.objects.filter(id__gt=inicio, id__lte=inicio + LOTE, owner__isnull=True).update(
+                owner_id=Subquery(dono)
+            )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('carteira', '0017_resumodiario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemvenda',
+            name='owner',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='pagamento',
+            name='owner',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(preencher_owner, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='pagamento',
+            index=models.Index(fields=['owner', 'data_pagamento'], name='pgto_owner_data_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Índices funcionais LOWER(email) e LOWER(username) em auth_user, usados pelo login
+# (fiado_pro.auth_backends.buscar_usuario). auth_user é do contrib.auth: os índices são
+# criados pelo schema_editor (SQL certo para MySQL 8.0.13+ e SQLite) e não pelo state.
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Lower
+
+INDICES = [
+    models.Index(Lower("email"), name="auth_user_email_lower_idx"),
+    models.Index(Lower("username"), name="auth_user_username_lower_idx"),
+]
+
+
+def _usuario(apps):
+    return apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+
+
+def criar(apps, schema_editor):
+    for indice in INDICES:
+        schema_editor.add_index(_usuario(apps), indice)
+
+
+def remover(apps, schema_editor):
+    for indice in INDICES:
+        schema_editor.remove_index(_usuario(apps), indice)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carteira', '0019_owner_obrigatorio'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(criar, remover),
+    ]
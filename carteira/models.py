@@ -1,9 +1,10 @@
 # carteira/models.py
 from decimal import Decimal
 from django.db import models
+from django.db.models import F, Sum
 from django.utils import timezone
 from django.core.validators import MinValueValidator
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 from django.conf import settings
@@ -26,10 +27,64 @@ class Cliente(models.Model):
     telefone = models.CharField(max_length=20, blank=True)
     endereco = models.CharField(max_length=150, default="endereco aqui")
     email = models.CharField(max_length=150, default="email-do-cliente@mail.com.br")
+    # texto normalizado (sem acento, só dígitos nos documentos) — ver carteira.busca
+    busca = models.CharField(max_length=400, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["owner", "nome"], name="cliente_owner_nome_idx"),
+        ]
 
     def __str__(self):
         return f"{self.nome}" + (f" — {self.cpf}" if self.cpf else "")
 
+class ClienteTermo(models.Model):
+    """Termos de busca de um cliente (palavras do nome, CPF, telefone, e-mail), mantidos por carteira.busca."""
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name="termos")
+    termo = models.CharField(max_length=64)
+
+    class Meta:
+        indexes = [
+            # cliente no fim: a leitura em ordem (termo, cliente) do autocomplete sai do próprio índice
+            models.Index(fields=["owner", "termo", "cliente"], name="termo_owner_termo_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.termo} → {self.cliente_id}"
+
+@receiver(pre_save, sender=Cliente)
+def _cliente_texto_busca(sender, instance, **kwargs):
+    from .busca import texto_busca
+    instance.busca = texto_busca(instance.nome, instance.cpf, instance.telefone, instance.email)
+
+@receiver(post_save, sender=Cliente)
+def _cliente_indexar(sender, instance, **kwargs):
+    from .busca import indexar_cliente
+    indexar_cliente(instance)
+    if not kwargs["created"]:
+        # nome/CPF/telefone aparecem nos recibos (e o nome no aging por cliente)
+        from .totais import invalidar_totais
+        ContaCarteira.objects.filter(cliente_id=instance.pk).update(versao=F("versao") + 1)
+        invalidar_totais(instance.owner_id)
+
+@receiver(post_delete, sender=Cliente)
+def _cliente_removido(sender, instance, **kwargs):
+    from .sugestoes import invalidar
+    invalidar(instance.owner_id)
+
+@receiver(post_save, sender=Empresa)
+def _empresa_alterada(sender, instance, **kwargs):
+    ContaCarteira.objects.filter(owner_id=instance.owner_id).update(versao=F("versao") + 1)
+
+@receiver(post_save, sender=User)
+def _usuario_salvo(sender, instance, update_fields=None, **kwargs):
+    # e-mail/username novo ou alterado deixa de constar como inexistente no login
+    if update_fields and set(update_fields) <= {"last_login", "password", "is_active"}:
+        return
+    from fiado_pro.auth_backends import esquecer_falhas
+    esquecer_falhas(instance.email, instance.username)
+
 class ContaCarteira(models.Model):
     STATUS_CHOICES = (
         ("EM_ABERTO", "Em aberto"),
@@ -43,7 +98,12 @@ class ContaCarteira(models.Model):
     vencimento = models.DateField(null=True, blank=True)
 
     total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # soma dos pagamentos (sem o corte em zero do saldo) — base do cálculo incremental
+    total_pago = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     saldo = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # sobe a cada mudança visível da conta (itens, pagamentos, status, cliente, empresa);
+    # chave dos recibos em cache (carteira.recibos)
+    versao = models.PositiveIntegerField(default=0, editable=False)
     status = models.CharField(max_length=12, choices=STATUS_CHOICES, default="EM_ABERTO")
 
     # --- SOFT DELETE ---
@@ -57,38 +117,71 @@ class ContaCarteira(models.Model):
 
     class Meta:
         ordering = ["-criado_em", "-id"]
+        indexes = [
+            # varredura diária EM_ABERTO -> ATRASO (ledger.marcar_atrasos)
+            models.Index(fields=["status", "vencimento"], name="conta_status_venc_idx"),
+            # dashboard: seções por status, ordenadas por id ou vencimento (keyset).
+            # is_deleted fica fora do índice: o ORM gera "NOT is_deleted", que não é
+            # igualdade e cortaria o prefixo; como exclusões são raras, vira filtro residual.
+            models.Index(fields=["owner", "status", "id"], name="conta_own_st_id_idx"),
+            models.Index(fields=["owner", "status", "vencimento", "id"], name="conta_own_st_venc_idx"),
+            models.Index(fields=["owner", "criado_em", "id"], name="conta_own_criado_idx"),
+            # excluidos: ordenado por data de exclusão
+            models.Index(fields=["owner", "deleted_at", "id"], name="conta_own_deleted_at_idx"),
+        ]
 
     def __str__(self):
         return f"Conta #{self.id} — {self.cliente.nome}"
 
+    @staticmethod
+    def calcular_saldo_status(total, total_pago, vencimento):
+        novo_saldo = total - total_pago
+        if novo_saldo <= 0:
+            return Decimal("0"), "PAGO"
+        hoje = timezone.localdate()
+        if vencimento and vencimento < hoje:
+            return novo_saldo, "ATRASO"
+        return novo_saldo, "EM_ABERTO"
+
     def atualizar_totais(self, commit=True):
-        itens_total = sum((i.subtotal() for i in self.itens.all()), start=Decimal("0"))
-        total_pago = sum((p.valor for p in self.pagamentos.all()), start=Decimal("0"))
+        """Recálculo completo (somas no banco). O dia a dia usa os deltas de carteira.ledger."""
+        dec = models.DecimalField(max_digits=12, decimal_places=2)
+        itens_total = self.itens.aggregate(
+            t=Sum(F("quantidade") * F("valor_unit"), output_field=dec, default=Decimal("0"))
+        )["t"]
+        total_pago = self.pagamentos.aggregate(t=Sum("valor", default=Decimal("0")))["t"]
 
-        novo_saldo = itens_total - total_pago
-        if novo_saldo <= 0:
-            novo_status = "PAGO"
-            novo_saldo = Decimal("0")
-        else:
-            hoje = timezone.localdate()
-            if self.vencimento and self.vencimento < hoje:
-                novo_status = "ATRASO"
-            else:
-                novo_status = "EM_ABERTO"
+        novo_saldo, novo_status = self.calcular_saldo_status(itens_total, total_pago, self.vencimento)
 
         self.total = itens_total
+        self.total_pago = total_pago
         self.saldo = novo_saldo
         self.status = novo_status
         if commit:
-            self.save(update_fields=["total", "saldo", "status"])
+            from .totais import invalidar_totais
+            ContaCarteira.objects.filter(pk=self.pk).update(
+                total=self.total, total_pago=self.total_pago, saldo=self.saldo, status=self.status,
+                versao=F("versao") + 1,
+            )
+            invalidar_totais(self.owner_id)
         return self.total, self.saldo
 
 class ItemVenda(models.Model):
     conta = models.ForeignKey(ContaCarteira, on_delete=models.CASCADE, related_name="itens")
+    # cópia de conta.owner (preenchida no pre_save / nos bulk_create): filtro por lojista sem JOIN
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+", editable=False)
     produto = models.CharField(max_length=120)
     quantidade = models.PositiveIntegerField(validators=[MinValueValidator(1)])
     valor_unit = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # guarda o estado original para o delta aplicado pelo ledger no save/delete
+        if not instance.get_deferred_fields() & {"conta_id", "quantidade", "valor_unit"}:
+            instance._ledger_original = (instance.conta_id, instance.subtotal())
+        return instance
+
     def subtotal(self):
         return self.quantidade * self.valor_unit
 
@@ -97,6 +190,8 @@ class ItemVenda(models.Model):
 
 class Pagamento(models.Model):
     conta = models.ForeignKey(ContaCarteira, on_delete=models.CASCADE, related_name="pagamentos")
+    # cópia de conta.owner, como em ItemVenda; o índice (owner, data_pagamento) cobre o filtro por lojista
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+", editable=False, db_index=False)
     # Data de lançamento/registro (mantida por compatibilidade)
     data = models.DateTimeField(default=timezone.now)
     # NOVO: Data do pagamento efetivo
@@ -104,18 +199,78 @@ class Pagamento(models.Model):
     valor = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(0.01)])
     observacao = models.CharField(max_length=200, blank=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if not instance.get_deferred_fields() & {"conta_id", "valor"}:
+            instance._ledger_original = (instance.conta_id, instance.valor)
+        if "data_pagamento" not in instance.get_deferred_fields():
+            instance._data_original = instance.data_pagamento
+        return instance
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["owner", "data_pagamento"], name="pgto_owner_data_idx"),
+        ]
+
     def __str__(self):
         # Mostra a data efetiva do pagamento
         return f"Pgto {self.valor} em {self.data_pagamento:%d/%m/%Y %H:%M}"
 
-# --- SINAIS: recalcular sempre que itens/pagamentos mudarem ---
+class ResumoDiario(models.Model):
+    """
+    Vendas (itens, pela data da conta) e recebimentos (pagamentos, pela data do pagamento)
+    de um lojista num dia. Mantido por carteira.resumo; base dos gráficos.
+    """
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    dia = models.DateField()
+    vendas = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    recebido = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    n_pagamentos = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["owner", "dia"], name="resumo_owner_dia_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.owner_id} {self.dia:%d/%m/%Y}: vendas {self.vendas}, recebido {self.recebido}"
+
+@receiver(pre_save, sender=ItemVenda)
+@receiver(pre_save, sender=Pagamento)
+def _owner_da_conta(sender, instance, **kwargs):
+    """Mantém a cópia de conta.owner; consulta a conta só se ela não está carregada e mudou."""
+    conta = instance._state.fields_cache.get("conta")
+    if conta is not None and conta.pk == instance.conta_id:
+        instance.owner_id = conta.owner_id
+        return
+    original = getattr(instance, "_ledger_original", None)
+    if instance.owner_id is None or (original is not None and original[0] != instance.conta_id):
+        instance.owner_id = (
+            ContaCarteira.objects.filter(pk=instance.conta_id).values_list("owner_id", flat=True).first()
+        )
+
+# --- SINAIS: aplicar só a diferença sempre que itens/pagamentos mudarem ---
+# (o resumo diário roda antes do ledger: lê o estado original que o ledger atualiza)
 @receiver([post_save, post_delete], sender=ItemVenda)
 def _recalc_on_change_item(sender, instance, **kwargs):
-    instance.conta.atualizar_totais()
+    from . import ledger, resumo
+    if kwargs["signal"] is post_save:
+        resumo.registrar_save(instance, kwargs["created"])
+        ledger.registrar_save(instance, kwargs["created"])
+    else:
+        resumo.registrar_delete(instance)
+        ledger.registrar_delete(instance)
 
 @receiver([post_save, post_delete], sender=Pagamento)
 def _recalc_on_change_pgto(sender, instance, **kwargs):
-    instance.conta.atualizar_totais()
+    from . import ledger, resumo
+    if kwargs["signal"] is post_save:
+        resumo.registrar_save(instance, kwargs["created"])
+        ledger.registrar_save(instance, kwargs["created"])
+    else:
+        resumo.registrar_delete(instance)
+        ledger.registrar_delete(instance)
 
 class AuditLog(models.Model):
     ACTION_CHOICES = (
@@ -149,6 +304,8 @@ class AuditLog(models.Model):
         indexes = [
             models.Index(fields=["created_at"]),
             models.Index(fields=["action"]),
+            # historico: registros do usuário, do mais recente para o mais antigo
+            models.Index(fields=["user", "created_at", "id"], name="audit_user_created_idx"),
         ]
 
     def __str__(self):
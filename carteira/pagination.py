@@ -0,0 +1,87 @@
+# carteira/pagination.py
+"""
+Paginação por cursor (keyset) para listagens ordenadas por (campo, id).
+
+Em vez de OFFSET, cada página guarda o último (valor do campo, id) exibido e a
+próxima consulta continua a partir dele. O custo de cada página depende só do
+tamanho da página, não da quantidade de registros do lojista.
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime
+
+from django.db.models import F, Q
+
+PAGE_SIZE = 50
+
+
+def encode_cursor(valor, pk):
+    if isinstance(valor, (date, datetime)):
+        valor = valor.isoformat()
+    raw = json.dumps([valor, pk], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Retorna (valor, pk) ou None se o cursor estiver vazio/inválido."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        valor, pk = json.loads(raw)
+        return valor, int(pk)
+    except (binascii.Error, ValueError, TypeError):
+        return None
+
+
+def _after(field, direction, valor, pk, nullable):
+    """
+    Filtro "depois do cursor" coerente com a ordenação de `_order_qs`:
+    ASC com NULLs primeiro, DESC com NULLs por último, id como desempate.
+    """
+    if field == "id":
+        return Q(id__gt=pk) if direction == "asc" else Q(id__lt=pk)
+
+    if direction == "asc":
+        if valor is None:
+            return Q(**{f"{field}__isnull": True, "id__gt": pk}) | Q(**{f"{field}__isnull": False})
+        return Q(**{f"{field}__gt": valor}) | Q(**{field: valor, "id__gt": pk})
+
+    if valor is None:
+        return Q(**{f"{field}__isnull": True, "id__lt": pk})
+    cond = Q(**{f"{field}__lt": valor}) | Q(**{field: valor, "id__lt": pk})
+    if nullable:
+        cond |= Q(**{f"{field}__isnull": True})
+    return cond
+
+
+def keyset_page(qs, field, direction, cursor=None, limit=PAGE_SIZE, nullable=False):
+    """
+    Recebe um queryset já ordenado por (field, id) e devolve (linhas, próximo_cursor).
+    `próximo_cursor` é None quando não há mais registros.
+    """
+    rows = list(_pagina_qs(qs, field, direction, cursor, limit, nullable))
+    return _fechar_pagina(rows, limit)
+
+
+async def akeyset_page(qs, field, direction, cursor=None, limit=PAGE_SIZE, nullable=False):
+    """keyset_page para views async (ORM async)."""
+    rows = [r async for r in _pagina_qs(qs, field, direction, cursor, limit, nullable)]
+    return _fechar_pagina(rows, limit)
+
+
+def _pagina_qs(qs, field, direction, cursor, limit, nullable):
+    qs = qs.annotate(keyset_valor=F(field))
+    pos = decode_cursor(cursor)
+    if pos is not None:
+        qs = qs.filter(_after(field, direction, pos[0], pos[1], nullable))
+    return qs[:limit + 1]
+
+
+def _fechar_pagina(rows, limit):
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last.keyset_valor, last.pk)
@@ -0,0 +1,108 @@
+# carteira/pdf.py
+"""
+Gerador de PDF mínimo, sem dependências: páginas A4 com texto (Helvetica / Helvetica-Bold,
+acentos via WinAnsiEncoding) e linhas. Suficiente para os recibos (carteira.recibos).
+"""
+import zlib
+
+A4 = (595.28, 841.89)
+MARGEM = 40
+
+# larguras Helvetica (1/1000 em) dos caracteres usados em valores; o resto fica na média
+_LARGURAS = {
+    **{d: 556 for d in "0123456789$"},
+    " ": 278, ",": 278, ".": 278, "-": 333, "/": 278, ":": 278, "#": 556, "R": 722, "x": 500,
+}
+
+
+def largura(texto, tamanho):
+    return sum(_LARGURAS.get(ch, 556) for ch in texto) * tamanho / 1000
+
+
+def _escapar(texto):
+    b = texto.encode("cp1252", errors="replace")
+    return b.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+class Documento:
+    """Coordenadas a partir do topo da página (y cresce para baixo)."""
+
+    def __init__(self):
+        self.paginas = []
+        self.nova_pagina()
+
+    def nova_pagina(self):
+        self.paginas.append([])
+        self.y = MARGEM
+
+    def texto(self, x, y, texto, tamanho=10, negrito=False, direita=False):
+        if direita:
+            x -= largura(texto, tamanho)
+        fonte = b"/F2" if negrito else b"/F1"
+        self.paginas[-1].append(
+            b"BT %s %d Tf %.2f %.2f Td (%s) Tj ET" % (fonte, tamanho, x, A4[1] - y, _escapar(texto))
+        )
+
+    def linha(self, x1, y1, x2, y2, espessura=0.5):
+        self.paginas[-1].append(
+            b"%.2f w %.2f %.2f m %.2f %.2f l S" % (espessura, x1, A4[1] - y1, x2, A4[1] - y2)
+        )
+
+    # --- fluxo: escreve e desce self.y, quebrando a página quando precisa ---
+    def espaco(self, altura):
+        if self.y + altura > A4[1] - MARGEM:
+            self.nova_pagina()
+
+    def paragrafo(self, texto, tamanho=10, negrito=False, altura=None):
+        altura = altura or tamanho * 1.5
+        self.espaco(altura)
+        self.y += altura
+        self.texto(MARGEM, self.y, texto, tamanho, negrito)
+
+    def separador(self, altura=8):
+        self.espaco(altura)
+        self.y += altura
+        self.linha(MARGEM, self.y, A4[0] - MARGEM, self.y)
+
+    def colunas(self, valores, posicoes, tamanho=9, negrito=False, altura=14):
+        """`posicoes`: lista de (x, alinhado_a_direita) na mesma ordem dos valores."""
+        self.espaco(altura)
+        self.y += altura
+        for valor, (x, direita) in zip(valores, posicoes):
+            self.texto(x, self.y, str(valor), tamanho, negrito, direita)
+
+    def bytes(self):
+        objetos = []  # conteúdo de cada objeto; o número é a posição + 1
+
+        def novo(conteudo):
+            objetos.append(conteudo)
+            return len(objetos)
+
+        catalogo = novo(None)
+        raiz_paginas = novo(None)
+        f1 = novo(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        f2 = novo(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>")
+        kids = []
+        for comandos in self.paginas:
+            dados = zlib.compress(b"\n".join(comandos))
+            conteudo = novo(b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(dados), dados))
+            kids.append(novo(
+                b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %.2f %.2f] "
+                b"/Resources << /Font << /F1 %d 0 R /F2 %d 0 R >> >> /Contents %d 0 R >>"
+                % (raiz_paginas, A4[0], A4[1], f1, f2, conteudo)
+            ))
+        objetos[catalogo - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % raiz_paginas
+        objetos[raiz_paginas - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            b" ".join(b"%d 0 R" % k for k in kids), len(kids),
+        )
+
+        saida = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for i, conteudo in enumerate(objetos, start=1):
+            offsets.append(len(saida))
+            saida += b"%d 0 obj\n%s\nendobj\n" % (i, conteudo)
+        xref = len(saida)
+        saida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+        saida += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+        saida += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%EOF\n" % (len(objetos) + 1, catalogo, xref)
+        return bytes(saida)
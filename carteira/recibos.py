@@ -0,0 +1,173 @@
+# carteira/recibos.py
+"""
+Recibos prontos para reimpressão: HTML em cache e PDF em disco, pela versão da conta.
+
+`ContaCarteira.versao` sobe a cada mudança que aparece no recibo (itens, pagamentos,
+cliente, empresa — ver ledger e os sinais em models.py). Com a versão na chave não há
+invalidação explícita: uma alteração simplesmente passa a usar outra chave/arquivo, e as
+versões antigas expiram do cache (ou são apagadas do disco quando a nova é gerada).
+
+Reabrir/reimprimir um recibo custa uma consulta pela versão + uma leitura do cache (ou do
+arquivo), em vez de carregar conta/itens/pagamentos/empresa e renderizar o template.
+
+Configuração (settings, opcionais):
+- CARTEIRA_RECIBOS_CACHE_TIMEOUT (7 dias): validade do HTML no cache;
+- CARTEIRA_RECIBOS_PDF_DIR (BASE_DIR/recibos_pdf): pasta dos PDFs.
+"""
+import os
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .detalhe import carregar_conta, carregar_pagamento, empresa_do_lojista
+from .models import ContaCarteira, Pagamento
+from .pdf import A4, MARGEM, Documento
+
+CACHE_TIMEOUT = getattr(settings, "CARTEIRA_RECIBOS_CACHE_TIMEOUT", 7 * 24 * 60 * 60)
+
+
+def diretorio_pdf():
+    padrao = Path(getattr(settings, "BASE_DIR", ".")) / "recibos_pdf"
+    return Path(getattr(settings, "CARTEIRA_RECIBOS_PDF_DIR", padrao))
+
+
+# ====== VERSÕES ======
+def versao_da_conta(owner, conta_id):
+    versao = (
+        ContaCarteira.objects.filter(owner=owner, pk=conta_id, is_deleted=False)
+        .values_list("versao", flat=True).first()
+    )
+    if versao is None:
+        raise Http404
+    return versao
+
+
+def versao_do_pagamento(owner, pagamento_id):
+    """Versão da conta do pagamento (sobe também quando ele muda); None se não é do lojista."""
+    return Pagamento.objects.filter(pk=pagamento_id, owner=owner).values_list("conta__versao", flat=True).first()
+
+
+# ====== HTML ======
+def html_recibo_conta(request, conta_id):
+    imprimir = bool(request.GET.get("print"))
+    chave = f"carteira:recibo:conta:{conta_id}:v{versao_da_conta(request.user, conta_id)}:{int(imprimir)}"
+    html = cache.get(chave)
+    if html is None:
+        conta = carregar_conta(request.user, conta_id)
+        html = render_to_string(
+            "carteira/recibo_conta.html", {"conta": conta, "empresa": empresa_do_lojista(conta)}, request=request,
+        )
+        # chave pela versão efetivamente carregada (pode ter avançado desde a consulta acima)
+        cache.set(f"carteira:recibo:conta:{conta_id}:v{conta.versao}:{int(imprimir)}", html, CACHE_TIMEOUT)
+    return html
+
+
+def html_recibo_pagamento(request, pagamento_id, versao):
+    imprimir = bool(request.GET.get("print"))
+    chave = f"carteira:recibo:pg:{pagamento_id}:v{versao}:{int(imprimir)}"
+    html = cache.get(chave)
+    if html is None:
+        pg = carregar_pagamento(request.user, pagamento_id)
+        html = render_to_string(
+            "carteira/recibo_pagamento.html", {"pg": pg, "empresa": empresa_do_lojista(pg.conta)}, request=request,
+        )
+        cache.set(f"carteira:recibo:pg:{pagamento_id}:v{pg.conta.versao}:{int(imprimir)}", html, CACHE_TIMEOUT)
+    return html
+
+
+# ====== PDF ======
+def _brl(valor):
+    texto = f"{Decimal(valor):,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+    return f"R$ {texto}"
+
+
+def _cabecalho_empresa(doc, empresa):
+    if empresa is None:
+        return
+    doc.paragrafo(f"Empresa: {empresa.nome}", 10, negrito=True)
+    doc.paragrafo(f"CNPJ/CPF: {empresa.cnpj_cpf}   Telefone: {empresa.telefone}", 9)
+    doc.paragrafo(f"Endereço: {empresa.endereco}", 9)
+    doc.separador()
+
+
+def _pdf_conta(conta):
+    doc = Documento()
+    doc.paragrafo("Comprovante de Venda - Em Carteira", 14, negrito=True, altura=20)
+    doc.separador()
+    _cabecalho_empresa(doc, empresa_do_lojista(conta))
+    doc.paragrafo(f"Conta #{conta.id}   Data: {conta.criado_em:%d/%m/%Y}", 10, negrito=True)
+    c = conta.cliente
+    doc.paragrafo(f"Cliente: {c.nome}   CPF: {c.cpf}   Tel: {c.telefone}", 9)
+    doc.paragrafo(f"Vencimento: {conta.vencimento:%d/%m/%Y}" if conta.vencimento else "Vencimento: —", 9)
+    doc.separador()
+
+    direita = A4[0] - MARGEM
+    posicoes = [(MARGEM, False), (330, True), (430, True), (direita, True)]
+    doc.colunas(["Produto", "Qtd", "Unit.", "Subtotal"], posicoes, negrito=True)
+    for i in conta.itens.all():
+        doc.colunas([i.produto[:60], i.quantidade, _brl(i.valor_unit), _brl(i.valor_subtotal)], posicoes)
+    doc.separador(6)
+    doc.colunas(["Total", "", "", _brl(conta.total)], posicoes, tamanho=10, negrito=True)
+
+    doc.paragrafo("", altura=20)
+    doc.paragrafo("Declaro que recebi os produtos acima e me responsabilizo pelo pagamento até a data do vencimento.", 9)
+    doc.espaco(60)
+    doc.y += 50
+    doc.linha(MARGEM + 120, doc.y, direita - 120, doc.y)
+    doc.y += 12
+    doc.texto(A4[0] / 2 - 45, doc.y, "Assinatura do Devedor", 9)
+    doc.paragrafo("Comércio: via do estabelecimento — Cliente: via do cliente", 8, altura=24)
+    return doc.bytes()
+
+
+def _pdf_pagamento(pg):
+    doc = Documento()
+    doc.paragrafo("Recibo de Pagamento", 14, negrito=True, altura=20)
+    doc.separador()
+    _cabecalho_empresa(doc, empresa_do_lojista(pg.conta))
+    doc.paragrafo(f"Conta: #{pg.conta_id} — Cliente: {pg.conta.cliente.nome}", 10, negrito=True)
+    doc.paragrafo(f"Data: {timezone.localtime(pg.data):%d/%m/%Y %H:%M}", 10)
+    doc.paragrafo(f"Valor pago: {_brl(pg.valor)}", 10, negrito=True)
+    doc.paragrafo(f"Observação: {pg.observacao or '—'}", 10)
+    doc.paragrafo("", altura=10)
+    doc.paragrafo("Comprovamos o recebimento do valor acima referente à conta citada.", 10)
+    return doc.bytes()
+
+
+def _gravar_pdf(prefixo, versao, gerar):
+    """
+    Bytes do PDF da versão: lidos do disco ou, se o arquivo não existe, gerados, gravados e com as
+    versões antigas apagadas. Devolve os bytes e não o caminho: uma request concorrente por uma
+    versão mais nova pode apagar o arquivo a qualquer momento.
+    """
+    pasta = diretorio_pdf()
+    caminho = pasta / f"{prefixo}-v{versao}.pdf"
+    try:
+        return caminho.read_bytes()
+    except FileNotFoundError:
+        pass
+    pdf = gerar()
+    pasta.mkdir(parents=True, exist_ok=True)
+    tmp = caminho.with_name(f"{caminho.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(pdf)
+    tmp.replace(caminho)
+    for antigo in pasta.glob(f"{prefixo}-v*.pdf"):
+        if antigo != caminho:
+            antigo.unlink(missing_ok=True)
+    return pdf
+
+
+def pdf_recibo_conta(owner, conta_id):
+    versao = versao_da_conta(owner, conta_id)
+    return _gravar_pdf(f"conta-{conta_id}", versao, lambda: _pdf_conta(carregar_conta(owner, conta_id)))
+
+
+def pdf_recibo_pagamento(owner, pagamento_id, versao):
+    return _gravar_pdf(
+        f"pagamento-{pagamento_id}", versao, lambda: _pdf_pagamento(carregar_pagamento(owner, pagamento_id)),
+    )
@@ -0,0 +1,146 @@
+# carteira/replica.py
+"""
+Leituras dos relatórios numa réplica do banco; escritas sempre no primário.
+
+Ativação (settings):
+    DATABASES["replica"] = {...}                       # réplica de leitura do "default"
+    DATABASE_ROUTERS = ["carteira.replica.ReplicaRouter"]
+    MIDDLEWARE += ["carteira.replica.ReplicaMiddleware"]
+    CARTEIRA_DB_REPLICA = "replica"                    # alias; None/ausente desliga tudo
+    CARTEIRA_DB_REPLICA_FIXAR_SEGUNDOS = 5             # janela "lê o que escreveu"
+
+Só as views marcadas com `@le_da_replica` (dashboard, listas, exportações, relatórios) leem
+da réplica, e só enquanto a request não escreveu nada. Depois de qualquer escrita, o
+middleware grava um cookie curto que fixa o usuário no primário pelas próximas requests:
+quem acabou de registrar um pagamento não vê o dashboard antigo por atraso da replicação.
+Vale igual para views async (carteira/views_async.py): o estado fica num ContextVar, que
+o ORM async leva junto para as threads onde roda as consultas.
+"""
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.db import connections
+
+COOKIE = "fp_primario"
+
+_estado = contextvars.ContextVar("carteira_replica", default=None)
+
+
+def alias_replica():
+    alias = getattr(settings, "CARTEIRA_DB_REPLICA", None)
+    return alias if alias and alias in connections.settings else None
+
+
+def _fixar_segundos():
+    return getattr(settings, "CARTEIRA_DB_REPLICA_FIXAR_SEGUNDOS", 5)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        estado = _estado.get()
+        if estado is None or not estado["replica"] or estado["fixado"] or estado["escreveu"]:
+            return None
+        return alias_replica()
+
+    def db_for_write(self, model, **hints):
+        estado = _estado.get()
+        if estado is not None:
+            estado["escreveu"] = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # primário e réplica têm os mesmos dados
+        return True
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = self._iniciar(request)
+        try:
+            response = self.get_response(request)
+            escreveu = _estado.get()["escreveu"]
+        finally:
+            _estado.reset(token)
+        return self._fixar(response, escreveu)
+
+    async def __acall__(self, request):
+        # o ORM async roda em threads com cópia do contexto: o dict do estado é o mesmo objeto
+        token = self._iniciar(request)
+        try:
+            response = await self.get_response(request)
+            escreveu = _estado.get()["escreveu"]
+        finally:
+            _estado.reset(token)
+        return self._fixar(response, escreveu)
+
+    def _iniciar(self, request):
+        return _estado.set({"replica": False, "escreveu": False, "fixado": COOKIE in request.COOKIES})
+
+    def _fixar(self, response, escreveu):
+        if escreveu and alias_replica():
+            response.set_cookie(COOKIE, "1", max_age=_fixar_segundos(), httponly=True, samesite="Lax")
+        return response
+
+
+@contextmanager
+def _marcar():
+    estado = _estado.get()
+    token = None
+    if estado is None:
+        # sem o middleware: vale só para esta request, sem fixar no primário depois
+        token = _estado.set(estado := {"replica": False, "escreveu": False, "fixado": False})
+    anterior = estado["replica"]
+    estado["replica"] = True
+    try:
+        yield
+    finally:
+        estado["replica"] = anterior
+        if token is not None:
+            _estado.reset(token)
+
+
+@contextmanager
+def escrita_de_fundo():
+    """
+    Escritas que não são da request corrente (ex.: esvaziar a fila de auditoria do processo, com
+    registros de outras requests): não tiram a request da réplica nem fixam o usuário no primário.
+    """
+    estado = _estado.get()
+    if estado is None:
+        yield
+        return
+    anterior = estado["escreveu"]
+    try:
+        yield
+    finally:
+        estado["escreveu"] = anterior
+
+
+def le_da_replica(view):
+    """Marca a view (sync ou async) como só leitura: consultas vão para a réplica (se configurada e não fixado no primário)."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            with _marcar():
+                return await view(request, *args, **kwargs)
+        return wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with _marcar():
+            return view(request, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,198 @@
+# carteira/resumo.py
+"""
+Resumo diário por lojista (ResumoDiario): vendas e recebimentos de cada dia.
+
+Mantido de forma incremental, como o ledger faz com os totais da conta: cada item ou
+pagamento salvo/apagado soma (ou tira) só a sua diferença na linha (lojista, dia) com um
+UPDATE baseado em F(); a linha é criada no primeiro lançamento do dia. Contas excluídas
+(soft delete) saem do resumo na exclusão e voltam na restauração.
+
+- vendas: subtotal dos itens, no dia `criado_em` da conta;
+- recebido / n_pagamentos: pagamentos, no dia local de `data_pagamento`.
+
+Gráficos mensais/anuais leem algumas centenas de linhas daqui em vez de varrer
+ItemVenda/Pagamento. `reconstruir` (comando `reconstruir_resumo`) refaz tudo a partir
+das tabelas de origem — depois de cargas com bulk_create ou para corrigir divergências.
+"""
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum, Value
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import ContaCarteira, ItemVenda, Pagamento, ResumoDiario
+
+ZERO = Decimal("0")
+DEC = DecimalField(max_digits=14, decimal_places=2)
+LOTE = 5000
+
+
+def somar(owner_id, dia, vendas=ZERO, recebido=ZERO, pagamentos=0):
+    """Soma os deltas na linha (lojista, dia), criando-a se ainda não existe."""
+    if not (vendas or recebido or pagamentos) or owner_id is None:
+        return
+    if isinstance(dia, datetime):
+        # criado_em recém-criado ainda guarda o timezone.now() do default
+        dia = timezone.localdate(dia)
+    linha = ResumoDiario.objects.filter(owner_id=owner_id, dia=dia)
+    deltas = {}
+    if vendas:
+        deltas["vendas"] = F("vendas") + Value(Decimal(vendas), output_field=DEC)
+    if recebido:
+        deltas["recebido"] = F("recebido") + Value(Decimal(recebido), output_field=DEC)
+    if pagamentos:
+        deltas["n_pagamentos"] = F("n_pagamentos") + pagamentos
+    if linha.update(**deltas):
+        return
+    try:
+        with transaction.atomic():
+            ResumoDiario.objects.create(
+                owner_id=owner_id, dia=dia, vendas=vendas, recebido=recebido, n_pagamentos=pagamentos,
+            )
+    except IntegrityError:
+        # outra transação criou a linha entre o UPDATE e o INSERT
+        linha.update(**deltas)
+
+
+# ====== HOOKS (chamados pelos sinais em models.py, antes do ledger) ======
+def _conta(instance, conta_id):
+    """(owner_id, criado_em, is_deleted) da conta, sem consulta quando ela já está na instância."""
+    conta = instance._state.fields_cache.get("conta")
+    if conta is not None and conta.pk == conta_id:
+        return conta.owner_id, conta.criado_em, conta.is_deleted
+    return (
+        ContaCarteira.objects.filter(pk=conta_id).values_list("owner_id", "criado_em", "is_deleted").first()
+        or (None, None, True)
+    )
+
+
+def _lancar(instance, conta_id, valor, data_pagamento, sinal):
+    owner_id, criado_em, excluida = _conta(instance, conta_id)
+    if excluida:
+        return
+    if isinstance(instance, ItemVenda):
+        somar(owner_id, criado_em, vendas=sinal * valor)
+    else:
+        somar(owner_id, timezone.localdate(data_pagamento), recebido=sinal * valor, pagamentos=sinal)
+
+
+def _valor(instance):
+    return Decimal((instance.subtotal() if isinstance(instance, ItemVenda) else instance.valor) or 0)
+
+
+def registrar_save(instance, created):
+    atual = (instance.conta_id, _valor(instance), getattr(instance, "data_pagamento", None))
+    original = getattr(instance, "_ledger_original", None)
+    if original is not None:
+        original = (*original, getattr(instance, "_data_original", None))
+
+    if created:
+        _lancar(instance, *atual, 1)
+    elif original is None:
+        # sem o estado anterior não há como saber a diferença: refaz o resumo do lojista
+        owner_id, criado_em, _ = _conta(instance, atual[0])
+        if owner_id is not None:
+            reconstruir([owner_id])
+    elif original != atual:
+        _lancar(instance, *original, -1)
+        _lancar(instance, *atual, 1)
+
+    if not isinstance(instance, ItemVenda):
+        instance._data_original = instance.data_pagamento
+
+
+def registrar_delete(instance):
+    original = getattr(instance, "_ledger_original", None) or (instance.conta_id, _valor(instance))
+    _lancar(instance, *original, getattr(instance, "_data_original", getattr(instance, "data_pagamento", None)), -1)
+
+
+def aplicar_conta(conta, sinal):
+    """Tira (sinal=-1, exclusão) ou devolve (sinal=1, restauração) uma conta inteira do resumo."""
+    somar(conta.owner_id, conta.criado_em, vendas=sinal * conta.total)
+    por_dia = defaultdict(lambda: [ZERO, 0])
+    for data, valor in conta.pagamentos.values_list("data_pagamento", "valor"):
+        dia = por_dia[timezone.localdate(data)]
+        dia[0] += valor
+        dia[1] += 1
+    for dia, (valor, n) in por_dia.items():
+        somar(conta.owner_id, dia, recebido=sinal * valor, pagamentos=sinal * n)
+
+
+# ====== RECONSTRUÇÃO ======
+def _em_lotes(qs, campos, lote=LOTE):
+    """Tuplas (id, *campos) de `qs` em lotes por id."""
+    qs = qs.order_by("id").values_list("id", *campos)
+    ultimo = 0
+    while True:
+        bloco = list(qs.filter(id__gt=ultimo)[:lote])
+        yield from bloco
+        if len(bloco) < lote:
+            return
+        ultimo = bloco[-1][0]
+
+
+@transaction.atomic
+def reconstruir(owner_ids=None):
+    """
+    Refaz o resumo dos lojistas (todos, sem `owner_ids`) a partir de itens e pagamentos.
+    Vendas: um GROUP BY por (lojista, dia) no banco. Pagamentos: uma passada em lotes, somando
+    por dia local em Python (converter o fuso no SQL exige as tabelas de fuso no MySQL).
+    Retorna o nº de linhas gravadas.
+    """
+    contas = ContaCarteira.objects.filter(is_deleted=False)
+    resumos = ResumoDiario.objects.all()
+    if owner_ids is not None:
+        contas = contas.filter(owner_id__in=owner_ids)
+        resumos = resumos.filter(owner_id__in=owner_ids)
+
+    linhas = defaultdict(lambda: [ZERO, ZERO, 0])  # (owner, dia) -> [vendas, recebido, n]
+    subtotal = ExpressionWrapper(F("quantidade") * F("valor_unit"), output_field=DEC)
+    vendas = (
+        ItemVenda.objects.filter(conta__in=contas.values("id"))
+        .values("owner_id", "conta__criado_em")
+        .annotate(t=Sum(subtotal))
+        .order_by()
+    )
+    for r in vendas:
+        linhas[(r["owner_id"], r["conta__criado_em"])][0] += r["t"] or ZERO
+
+    pagamentos = Pagamento.objects.filter(conta__in=contas.values("id"))
+    for _, owner_id, data, valor in _em_lotes(pagamentos, ["owner_id", "data_pagamento", "valor"]):
+        linha = linhas[(owner_id, timezone.localdate(data))]
+        linha[1] += valor
+        linha[2] += 1
+
+    # sem cascatas nem sinais: o delete() do Django vira um único DELETE
+    resumos.delete()
+    ResumoDiario.objects.bulk_create(
+        [
+            ResumoDiario(owner_id=owner_id, dia=dia, vendas=v, recebido=r, n_pagamentos=n)
+            for (owner_id, dia), (v, r, n) in linhas.items()
+        ],
+        batch_size=LOTE,
+    )
+    return len(linhas)
+
+
+# ====== CONSULTAS ======
+def serie_diaria(owner, inicio, fim):
+    """[(dia, vendas, recebido, n_pagamentos)] de inicio a fim (inclusivos), só os dias com movimento."""
+    return list(
+        ResumoDiario.objects.filter(owner=owner, dia__gte=inicio, dia__lte=fim)
+        .order_by("dia").values_list("dia", "vendas", "recebido", "n_pagamentos")
+    )
+
+
+def serie_mensal(owner, inicio, fim):
+    """[(primeiro dia do mês, vendas, recebido, n_pagamentos)] de inicio a fim."""
+    rows = (
+        ResumoDiario.objects.filter(owner=owner, dia__gte=inicio, dia__lte=fim)
+        .annotate(mes=TruncMonth("dia"))
+        .values("mes")
+        .annotate(v=Sum("vendas"), r=Sum("recebido"), n=Sum("n_pagamentos"))
+        .order_by("mes")
+    )
+    return [(r["mes"], r["v"], r["r"], r["n"]) for r in rows]
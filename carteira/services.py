@@ -0,0 +1,41 @@
+# carteira/services.py
+"""Serviços de escrita que envolvem várias tabelas de uma vez."""
+from decimal import Decimal
+
+from django.db import transaction
+
+from . import resumo
+from .models import ContaCarteira, ItemVenda
+from .totais import invalidar_totais
+
+
+@transaction.atomic
+def registrar_venda(owner, cliente, vencimento, itens):
+    """
+    Cria a conta e todos os itens da venda em dois INSERTs, qualquer que seja o número de linhas.
+
+    `itens` é uma sequência de dicts com produto/quantidade/valor_unit (o cleaned_data do formset).
+    Os totais são calculados uma única vez aqui; bulk_create não dispara post_save, então os
+    sinais de ItemVenda (ledger e resumo diário) não rodam linha a linha.
+    """
+    objs = [
+        ItemVenda(owner=owner, produto=it["produto"], quantidade=it["quantidade"], valor_unit=it["valor_unit"])
+        for it in itens
+    ]
+    total = sum((i.subtotal() for i in objs), start=Decimal("0"))
+    saldo, status = ContaCarteira.calcular_saldo_status(total, Decimal("0"), vencimento)
+
+    conta = ContaCarteira.objects.create(
+        owner=owner,
+        cliente=cliente,
+        vencimento=vencimento,
+        total=total,
+        saldo=saldo,
+        status=status,
+    )
+    for obj in objs:
+        obj.conta = conta
+    ItemVenda.objects.bulk_create(objs, batch_size=500)
+    resumo.somar(owner.pk, conta.criado_em, vendas=total)
+    invalidar_totais(owner.pk)
+    return conta
@@ -0,0 +1,184 @@
+# carteira/sugestoes.py
+"""
+Cache do autocomplete de clientes (api_clientes_busca), por lojista.
+
+Quem digita "mar", "mari", "maria" dispara uma busca por tecla (depois do debounce do JS).
+Aqui cada lojista tem um LRU em memória do processo com as últimas consultas e seus
+resultados (já no formato do JSON), válidos por CARTEIRA_SUGESTOES_TTL segundos:
+- a mesma consulta de novo (ex.: apagar e redigitar uma letra) sai do LRU, sem banco;
+- uma consulta mais restrita que outra cuja resposta veio COMPLETA (menos que o limite de
+  resultados, ou seja, todos os clientes que casam) é filtrada em memória a partir dela:
+  "maria s" depois de "mari" com 6 resultados não consulta o banco.
+
+Invalidação: salvar/apagar cliente ou reindexar em lote (busca.indexar_cliente /
+indexar_em_lote) gera uma nova "geração" do lojista no cache do Django (compartilhado entre
+processos, como os totais), na hora e outra vez no commit. Cada request confere a geração
+(uma leitura do cache) e descarta o LRU do lojista se ela mudou.
+
+Configuração (settings, opcionais):
+- CARTEIRA_SUGESTOES_TTL (120): validade de cada consulta no LRU, em segundos;
+- CARTEIRA_SUGESTOES_POR_LOJISTA (64): consultas guardadas por lojista;
+- CARTEIRA_SUGESTOES_LOJISTAS (1000): lojistas guardados no processo.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .busca import _asugestoes, _sugestoes, _usa_trigram, ausa_trigram, termos, termos_da_consulta, texto_busca
+
+LIMITE = 10
+
+_lock = threading.Lock()
+_lru = OrderedDict()  # owner_id -> {"geracao": ..., "consultas": OrderedDict(chave -> entrada)}
+
+
+# lidos a cada uso: mudam sem reiniciar o processo (e com override_settings)
+def ttl():
+    """Validade de cada consulta, em segundos (também a do cache do autocomplete no navegador)."""
+    return getattr(settings, "CARTEIRA_SUGESTOES_TTL", 120)
+
+
+def _por_lojista():
+    return getattr(settings, "CARTEIRA_SUGESTOES_POR_LOJISTA", 64)
+
+
+def _lojistas():
+    return getattr(settings, "CARTEIRA_SUGESTOES_LOJISTAS", 1000)
+
+
+def _chave_geracao(owner_id):
+    return f"carteira:sugestoes:geracao:{owner_id}"
+
+
+def invalidar(*owner_ids):
+    """Nova geração dos lojistas: os LRUs de todos os processos deixam de valer."""
+    owner_ids = [pk for pk in owner_ids if pk]
+    if not owner_ids:
+        return
+
+    def _apagar():
+        cache.set_many({_chave_geracao(pk): time.time_ns() for pk in owner_ids}, None)
+        with _lock:
+            for pk in owner_ids:
+                _lru.pop(pk, None)
+
+    # já (esta transação vê o dado novo) e de novo no commit (descarta o que outra request
+    # tenha guardado lendo o dado antigo enquanto a transação não terminava)
+    _apagar()
+    transaction.on_commit(_apagar)
+
+
+def limpar():
+    """Esvazia o LRU deste processo."""
+    with _lock:
+        _lru.clear()
+
+
+def _dados(c):
+    return {
+        "id": c.id,
+        "nome": c.nome,
+        "cpf": c.cpf or "",
+        "telefone": c.telefone or "",
+        "email": c.email or "",
+        "endereco": c.endereco or "",
+    }
+
+
+# ====== FILTRO EM MEMÓRIA (mesma regra da consulta no banco) ======
+def _casa(palavras, r, trigram):
+    if trigram:
+        texto = texto_busca(r["nome"], r["cpf"], r["telefone"], r["email"])
+        return all(p in texto for p in palavras)
+    ts = termos(r["nome"], r["cpf"], r["telefone"], r["email"])
+    return all(any(t.startswith(p) for t in ts) for p in palavras)
+
+
+def _mais_restrita(novas, antigas, trigram):
+    """Todo cliente que casa com `novas` casa com `antigas`?"""
+    if trigram:
+        return all(any(a in n for n in novas) for a in antigas)
+    return all(any(n.startswith(a) for n in novas) for a in antigas)
+
+
+# ====== LRU ======
+def _consultas(owner_id, geracao):
+    """LRU do lojista (novo se a geração mudou); chamar com _lock."""
+    lojista = _lru.get(owner_id)
+    if lojista is None or lojista["geracao"] != geracao:
+        lojista = _lru[owner_id] = {"geracao": geracao, "consultas": OrderedDict()}
+    _lru.move_to_end(owner_id)
+    while len(_lru) > _lojistas():
+        _lru.popitem(last=False)
+    return lojista["consultas"]
+
+
+def _do_lru(owner_id, geracao, palavras, trigram):
+    chave = " ".join(palavras)
+    agora = time.monotonic()
+    with _lock:
+        consultas = _consultas(owner_id, geracao)
+        entrada = consultas.get(chave)
+        if entrada is not None and entrada["expira"] > agora:
+            consultas.move_to_end(chave)
+            return entrada["resultados"]
+        for antiga in reversed(consultas.values()):
+            if antiga["completo"] and antiga["expira"] > agora and _mais_restrita(palavras, antiga["palavras"], trigram):
+                resultados = [r for r in antiga["resultados"] if _casa(palavras, r, trigram)]
+                _guardar(consultas, chave, palavras, resultados, True, antiga["expira"])
+                return resultados
+    return None
+
+
+def _guardar(consultas, chave, palavras, resultados, completo, expira=None):
+    consultas[chave] = {
+        "palavras": palavras, "resultados": resultados, "completo": completo,
+        "expira": expira or time.monotonic() + ttl(),
+    }
+    consultas.move_to_end(chave)
+    while len(consultas) > _por_lojista():
+        consultas.popitem(last=False)
+
+
+def _gravar(owner_id, geracao, palavras, resultados, completo):
+    with _lock:
+        _guardar(_consultas(owner_id, geracao), " ".join(palavras), palavras, resultados, completo)
+
+
+def geracao(owner_id):
+    """Muda a cada cliente salvo/apagado do lojista (também é o ETag dos clientes na carteira.api)."""
+    return cache.get_or_set(_chave_geracao(owner_id), time.time_ns, None)
+
+
+# ====== API ======
+def sugerir(owner, q):
+    """Resultados do autocomplete (dicts do JSON) para `q`, do LRU quando possível."""
+    palavras = termos_da_consulta(q)
+    if not palavras:
+        return []
+    atual, trigram = geracao(owner.pk), _usa_trigram()
+    resultados = _do_lru(owner.pk, atual, palavras, trigram)
+    if resultados is None:
+        clientes, completo = _sugestoes(owner, q, LIMITE)
+        resultados = [_dados(c) for c in clientes]
+        _gravar(owner.pk, atual, palavras, resultados, completo)
+    return resultados
+
+
+async def asugerir(owner, q):
+    """sugerir para views async."""
+    palavras = termos_da_consulta(q)
+    if not palavras:
+        return []
+    atual = await cache.aget_or_set(_chave_geracao(owner.pk), time.time_ns, None)
+    trigram = await ausa_trigram()
+    resultados = _do_lru(owner.pk, atual, palavras, trigram)
+    if resultados is None:
+        clientes, completo = await _asugestoes(owner, q, LIMITE)
+        resultados = [_dados(c) for c in clientes]
+        _gravar(owner.pk, atual, palavras, resultados, completo)
+    return resultados
@@ -1,3 +1,1484 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import zipfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
+from xml.etree import ElementTree
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.backends.signed_cookies import SessionStore
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections, reset_queries
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, modify_settings, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from fiado_pro.hashers import MINIMO_ITERACOES, PBKDF2Configuravel
+
+from . import aging, arquivo, audit, confirmacao, exportar, extrato, gerador, metricas, recibos, replica, resumo, sugestoes, totais, views, views_async
+from .busca import buscar_clientes, indexar_em_lote, sugerir_clientes
+from .importar import importar_csv
+from .models import AuditLog, Cliente, ClienteTermo, ContaCarteira, Empresa, ItemVenda, Pagamento, ResumoDiario
+from .ledger import marcar_atrasos
+from .pagination import PAGE_SIZE, decode_cursor, encode_cursor, keyset_page
+from .services import registrar_venda
+from .totais import totais_do_lojista
+from .utils import log_event
+from .views import _order_qs, _secao_pagina
+
+
+class KeysetPaginacaoTests(TestCase):
+    """Seções do dashboard em páginas por cursor (keyset), em todas as ordenações."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("lojista", password="senha")
+        cls.cliente = Cliente.objects.create(owner=cls.user, nome="Ana")
+        vencimentos = [None, date(2099, 1, 1), date(2099, 1, 1), None, date(2099, 3, 1), date(2099, 2, 1), None]
+        ContaCarteira.objects.bulk_create([
+            ContaCarteira(owner=cls.user, cliente=cls.cliente, vencimento=v, total=1, saldo=1) for v in vencimentos
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_percorre_todas_as_contas_sem_repetir(self):
+        qs = ContaCarteira.objects.filter(owner=self.user)
+        for sort in ("id", "vencimento", "nome"):
+            for direcao in ("asc", "desc"):
+                esperado = list(_order_qs(qs, sort, direcao).values_list("id", flat=True))
+                ids, cursor = [], None
+                while True:
+                    pagina = _secao_pagina(qs, sort, direcao, cursor)
+                    ids += [c.id for c in pagina["rows"]]
+                    cursor = pagina["next"]
+                    if cursor is None:
+                        break
+                self.assertEqual(ids, esperado, (sort, direcao))
+                self.assertEqual(len(ids), 7)
+
+    def test_paginas_pequenas(self):
+        qs = ContaCarteira.objects.filter(owner=self.user)
+        for direcao in ("asc", "desc"):
+            esperado = list(_order_qs(qs, "vencimento", direcao).values_list("id", flat=True))
+            ids, cursor = [], None
+            while True:
+                rows, cursor = keyset_page(
+                    _order_qs(qs, "vencimento", direcao), "vencimento", direcao, cursor, limit=2, nullable=True,
+                )
+                self.assertLessEqual(len(rows), 2)
+                ids += [c.id for c in rows]
+                if cursor is None:
+                    break
+            self.assertEqual(ids, esperado, direcao)
+
+    def test_cursor_invalido_volta_ao_inicio(self):
+        self.assertIsNone(decode_cursor("não-é-cursor"))
+        self.assertEqual(decode_cursor(encode_cursor(date(2099, 1, 1), 5)), ("2099-01-01", 5))
+
+    def test_api_contas_pagina_continua_do_cursor(self):
+        ContaCarteira.objects.bulk_create([
+            ContaCarteira(owner=self.user, cliente=self.cliente, total=1, saldo=1) for _ in range(PAGE_SIZE)
+        ])
+        resp = self.client.get(reverse("carteira:dashboard"))
+        primeira = resp.context["em_aberto"]
+        self.assertEqual(len(primeira["rows"]), PAGE_SIZE)
+        self.assertIsNotNone(primeira["next"])
+
+        resp = self.client.get(reverse("carteira:api_contas_pagina"), {"secao": "em_aberto", "cursor": primeira["next"]})
+        dados = resp.json()
+        self.assertEqual(dados["count"], 7)
+        self.assertIsNone(dados["next"])
+        self.assertEqual(self.client.get(reverse("carteira:api_contas_pagina"), {"secao": "x"}).status_code, 400)
+
+
+class LedgerDeltaTests(TestCase):
+    """total/total_pago/saldo/status mantidos por delta (carteira.ledger) batem com o recálculo completo."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("lojista", password="senha")
+        cls.cliente = Cliente.objects.create(owner=cls.user, nome="Ana")
+
+    def setUp(self):
+        cache.clear()
+
+    def _estado(self, conta):
+        conta.refresh_from_db()
+        return conta.total, conta.total_pago, conta.saldo, conta.status
+
+    def _recalculado(self, conta):
+        conta.refresh_from_db()
+        conta.atualizar_totais(commit=False)
+        return conta.total, conta.total_pago, conta.saldo, conta.status
+
+    def test_centavos_quitam_a_conta(self):
+        # no SQLite 0.10 + 0.20 - 0.30 em ponto flutuante não é zero
+        conta = ContaCarteira.objects.create(owner=self.user, cliente=self.cliente, vencimento=date(2099, 1, 1))
+        ItemVenda.objects.create(conta=conta, produto="a", quantidade=1, valor_unit=Decimal("0.10"))
+        ItemVenda.objects.create(conta=conta, produto="b", quantidade=1, valor_unit=Decimal("0.20"))
+        Pagamento.objects.create(conta=conta, valor=Decimal("0.30"))
+        self.assertEqual(self._estado(conta), (Decimal("0.30"), Decimal("0.30"), Decimal("0"), "PAGO"))
+        self.assertEqual(ContaCarteira.objects.filter(pk=conta.pk, status="PAGO", saldo__lte=0).count(), 1)
+
+    def test_edicao_troca_de_conta_e_exclusao(self):
+        conta = ContaCarteira.objects.create(owner=self.user, cliente=self.cliente, vencimento=date(2099, 1, 1))
+        outra = ContaCarteira.objects.create(owner=self.user, cliente=self.cliente, vencimento=date(2000, 1, 1))
+        item = ItemVenda.objects.create(conta=conta, produto="a", quantidade=2, valor_unit=Decimal("10.00"))
+        ItemVenda.objects.create(conta=outra, produto="b", quantidade=1, valor_unit=Decimal("5.00"))
+        pg = Pagamento.objects.create(conta=conta, valor=Decimal("4.00"))
+        self.assertEqual(self._estado(conta), (Decimal("20.00"), Decimal("4.00"), Decimal("16.00"), "EM_ABERTO"))
+
+        item = ItemVenda.objects.get(pk=item.pk)
+        item.quantidade = 3
+        item.save()
+        pg = Pagamento.objects.get(pk=pg.pk)
+        pg.conta = outra
+        pg.save()
+        self.assertEqual(self._estado(conta), self._recalculado(conta))
+        self.assertEqual(self._estado(conta), (Decimal("30.00"), Decimal("0.00"), Decimal("30.00"), "EM_ABERTO"))
+        self.assertEqual(self._estado(outra), (Decimal("5.00"), Decimal("4.00"), Decimal("1.00"), "ATRASO"))
+
+        ItemVenda.objects.get(pk=item.pk).delete()
+        Pagamento.objects.create(conta=outra, valor=Decimal("1.00"))
+        self.assertEqual(self._estado(conta), (Decimal("0.00"), Decimal("0.00"), Decimal("0"), "PAGO"))
+        self.assertEqual(self._estado(outra), self._recalculado(outra))
+        self.assertEqual(self._estado(outra)[3], "PAGO")
+
+    def test_verificar_saldos_confere_status(self):
+        conta = ContaCarteira.objects.create(owner=self.user, cliente=self.cliente, vencimento=date(2099, 1, 1))
+        ItemVenda.objects.create(conta=conta, produto="a", quantidade=1, valor_unit=Decimal("3.00"))
+        Pagamento.objects.create(conta=conta, valor=Decimal("3.00"))
+        # saldo certo, status errado (o caso que escapava da verificação)
+        ContaCarteira.objects.filter(pk=conta.pk).update(status="EM_ABERTO")
+
+        out = StringIO()
+        call_command("verificar_saldos", stdout=out)
+        self.assertIn("1 divergente(s)", out.getvalue())
+        self.assertIn("status EM_ABERTO≠PAGO", out.getvalue())
+
+        call_command("verificar_saldos", "--corrigir", stdout=StringIO())
+        self.assertEqual(self._estado(conta)[3], "PAGO")
+        out = StringIO()
+        call_command("verificar_saldos", stdout=out)
+        self.assertIn("0 divergente(s)", out.getvalue())
+
+    def test_seed_respeita_o_invariante(self):
+        staff = User.objects.create_user("staff", is_staff=True)
+        self.client.force_login(staff)
+        self.client.get(reverse("carteira:seed_contas_fixas"), {"pago": 3, "atraso": 2, "aberto": 2})
+        contas = ContaCarteira.objects.filter(owner=staff)
+        self.assertEqual(contas.count(), 7)
+        for total, saldo, total_pago, status in contas.values_list("total", "saldo", "total_pago", "status"):
+            self.assertEqual(total - saldo, total_pago)
+            self.assertEqual(total_pago == total, status == "PAGO")
+
+
+class RegistrarVendaTests(TestCase):
+    """Nova conta com itens em número fixo de INSERTs (services.registrar_venda)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("lojista", password="senha")
+        cls.cliente = Cliente.objects.create(owner=cls.user, nome="Ana")
+
+    def setUp(self):
+        cache.clear()
+
+    def _itens(self, n):
+        return [{"produto": f"Produto {i}", "quantidade": 2, "valor_unit": Decimal("1.25")} for i in range(n)]
+
+    def _venda(self, n):
+        with CaptureQueriesContext(connection) as ctx:
+            conta = registrar_venda(self.user, self.cliente, date(2099, 1, 1), self._itens(n))
+        return conta, len(ctx.captured_queries)
+
+    def test_consultas_nao_crescem_com_os_itens(self):
+        self._venda(1)  # a primeira venda do dia cria a linha do resumo diário
+        _, poucas = self._venda(1)
+        conta, muitas = self._venda(40)
+        self.assertEqual(poucas, muitas)
+        conta.refresh_from_db()
+        self.assertEqual((conta.total, conta.saldo, conta.status), (Decimal("100.00"), Decimal("100.00"), "EM_ABERTO"))
+        self.assertEqual(conta.itens.count(), 40)
+        self.assertFalse(conta.itens.exclude(owner=self.user).exists())
+
+    def test_totais_iguais_ao_recalculo_e_resumo_do_dia(self):
+        conta, _ = self._venda(3)
+        conta.refresh_from_db()
+        esperado = (conta.total, conta.saldo, conta.status)
+        conta.atualizar_totais(commit=False)
+        self.assertEqual((conta.total, conta.saldo, conta.status), esperado)
+        self.assertEqual(ResumoDiario.objects.get(owner=self.user, dia=conta.criado_em).vendas, Decimal("7.50"))
+
+    def test_view_nova_conta(self):
+        self.client.force_login(self.user)
+        dados = {
+            "cliente_id": self.cliente.id, "vencimento": "2099-01-01",
+            "itens-TOTAL_FORMS": "2", "itens-INITIAL_FORMS": "0",
+            "itens-0-produto": "Arroz", "itens-0-quantidade": "2", "itens-0-valor_unit": "4.50",
+            "itens-1-produto": "Feijão", "itens-1-quantidade": "1", "itens-1-valor_unit": "6.00",
+        }
+        resp = self.client.post(reverse("carteira:nova"), dados)
+        conta = ContaCarteira.objects.get(owner=self.user)
+        self.assertRedirects(resp, reverse("carteira:recibo_conta", args=[conta.id]), fetch_redirect_response=False)
+        self.assertEqual((conta.total, conta.saldo), (Decimal("15.00"), Decimal("15.00")))
+
+
+class MarcarAtrasosTests(TestCase):
+    """Varredura diária EM_ABERTO -> ATRASO num UPDATE (ledger.marcar_atrasos)."""
+
+    def test_marca_so_vencidas_em_aberto(self):
+        user = User.objects.create_user("lojista")
+        cliente = Cliente.objects.create(owner=user, nome="Ana")
+        hoje = date(2030, 6, 10)
+        vencida, hoje_vence, futura, sem_venc, paga = ContaCarteira.objects.bulk_create([
+            ContaCarteira(owner=user, cliente=cliente, vencimento=date(2030, 6, 9), total=5, saldo=5),
+            ContaCarteira(owner=user, cliente=cliente, vencimento=hoje, total=5, saldo=5),
+            ContaCarteira(owner=user, cliente=cliente, vencimento=date(2030, 7, 1), total=5, saldo=5),
+            ContaCarteira(owner=user, cliente=cliente, vencimento=None, total=5, saldo=5),
+            ContaCarteira(owner=user, cliente=cliente, vencimento=date(2030, 1, 1), total=5, saldo=0, status="PAGO"),
+        ])
+        cache.clear()
+        self.assertEqual(totais_do_lojista(user)["em_atraso"], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(marcar_atrasos(hoje), 1)
+        self.assertEqual(totais_do_lojista(user)["em_atraso"], Decimal("5"))
+        status = dict(ContaCarteira.objects.values_list("id", "status"))
+        self.assertEqual(status[vencida.id], "ATRASO")
+        self.assertEqual(
+            [status[c.id] for c in (hoje_vence, futura, sem_venc, paga)], ["EM_ABERTO", "EM_ABERTO", "EM_ABERTO", "PAGO"],
+        )
+        self.assertEqual(ContaCarteira.objects.get(pk=vencida.id).versao, 1)
+        # idempotente
+        self.assertEqual(marcar_atrasos(hoje), 0)
+
+    def test_comando(self):
+        out = StringIO()
+        call_command("marcar_atrasos", stdout=out)
+        self.assertIn("0 conta(s) marcada(s) como ATRASO", out.getvalue())
+
+
+class BuscaClientesTests(TestCase):
+    """Busca por início de termo (nome, CPF, telefone, e-mail) no índice ClienteTermo."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("lojista")
+        cls.outro = User.objects.create_user("outro")
+        cls.joao = Cliente.objects.create(
+            owner=cls.user, nome="João da Silva", cpf="123.456.789-09", telefone="(63) 99876-5432", email="jsilva@mail.com",
+        )
+        cls.maria = Cliente.objects.create(owner=cls.user, nome="Maria Silveira", cpf="98765432100", telefone="6332145678")
+        Cliente.objects.create(owner=cls.outro, nome="João Outro")
+
+    def _ids(self, q, owner=None):
+        return set(buscar_clientes(owner or self.user, q).values_list("id", flat=True))
+
+    def test_casa_inicio_de_termo_sem_acento(self):
+        self.assertEqual(self._ids("joao"), {self.joao.id})
+        self.assertEqual(self._ids("JOÃO"), {self.joao.id})
+        self.assertEqual(self._ids("silv"), {self.joao.id, self.maria.id})
+        self.assertEqual(self._ids("ilva"), set())  # meio da palavra não casa (sem trigram)
+
+    def test_todas_as_palavras(self):
+        self.assertEqual(self._ids("silv mar"), {self.maria.id})
+        self.assertEqual(self._ids("joao maria"), set())
+
+    def test_documentos_telefone_e_email(self):
+        self.assertEqual(self._ids("123.456"), {self.joao.id})
+        self.assertEqual(self._ids("12345678909"), {self.joao.id})
+        self.assertEqual(self._ids("99876"), {self.joao.id})  # telefone sem DDD
+        self.assertEqual(self._ids("jsilva@mail"), {self.joao.id})
+
+    def test_so_clientes_do_lojista(self):
+        self.assertEqual(self._ids("joao", self.outro), set(Cliente.objects.filter(owner=self.outro).values_list("id", flat=True)))
+
+    def test_reindexa_ao_salvar_e_apagar(self):
+        self.maria.nome = "Mariana Costa"
+        self.maria.save()
+        self.assertEqual(self._ids("silveira"), set())
+        self.assertEqual(self._ids("costa"), {self.maria.id})
+        self.assertEqual(Cliente.objects.get(pk=self.maria.pk).busca, "mariana costa 98765432100 6332145678 email-do-cliente@mail.com.br")
+        self.maria.delete()
+        self.assertFalse(ClienteTermo.objects.filter(cliente_id=self.maria.id).exists())
+
+    def test_indexar_em_lote(self):
+        novos = Cliente.objects.bulk_create([Cliente(owner=self.user, nome=f"Zuleide {i}") for i in range(3)])
+        self.assertEqual(self._ids("zuleide"), set())
+        indexar_em_lote(novos)
+        self.assertEqual(self._ids("zuleide"), {c.id for c in novos})
+
+    def test_sugerir_em_ordem_de_nome_com_limite(self):
+        self.assertEqual([c.id for c in sugerir_clientes(self.user, "silv")], [self.joao.id, self.maria.id])
+        self.assertEqual(len(sugerir_clientes(self.user, "silv", limite=1)), 1)
+
+
+class TotaisCacheTests(TestCase):
+    """Totais do dashboard em cache por lojista, apagados no commit de cada mudança nas contas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("lojista", password="senha")
+        cls.cliente = Cliente.objects.create(owner=cls.user, nome="Ana")
+
+    def setUp(self):
+        cache.clear()
+        self.conta = registrar_venda(
+            self.user, self.cliente, date(2099, 1, 1), [{"produto": "a", "quantidade": 1, "valor_unit": Decimal("10.00")}],
+        )
+
+    def test_leitura_do_cache(self):
+        self.assertEqual(totais_do_lojista(self.user)["a_receber"], Decimal("10.00"))
+        with self.assertNumQueries(0):
+            self.assertEqual(totais_do_lojista(self.user)["a_receber"], Decimal("10.00"))
+
+    def test_pagamento_invalida_no_commit(self):
+        totais_do_lojista(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            Pagamento.objects.create(conta=self.conta, valor=Decimal("4.00"))
+            # antes do commit quem lê ainda vê os totais antigos
+            self.assertEqual(totais_do_lojista(self.user)["pago"], Decimal("0"))
+        totais = totais_do_lojista(self.user)
+        self.assertEqual((totais["pago"], totais["a_receber"]), (Decimal("4.00"), Decimal("6.00")))
+
+    @mock.patch("carteira.audit.ASSINCRONO", False)
+    def test_item_e_exclusao_invalidam(self):
+        totais_do_lojista(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            ItemVenda.objects.create(conta=self.conta, produto="b", quantidade=2, valor_unit=Decimal("5.00"))
+        self.assertEqual(totais_do_lojista(self.user)["face_value_total"], Decimal("20.00"))
+
+        self.client.force_login(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("carteira:excluir_conta", args=[self.conta.id]), {"motivo": "teste", "senha": "senha"},
+            )
+        self.assertEqual(totais_do_lojista(self.user)["face_value_total"], Decimal("0"))
+
+    def test_dashboard_com_filtro_nao_usa_o_cache(self):
+        self.client.force_login(self.user)
+        cache.set("carteira:totais:%d" % self.user.pk, {"a_receber": Decimal("999")}, 60)
+        resp = self.client.get(reverse("carteira:dashboard"))
+        self.assertEqual(resp.context["totais"]["a_receber"], Decimal("999"))
+        resp = self.client.get(reverse("carteira:dashboard"), {"status": "EM_ABERTO"})
+        self.assertEqual(resp.context["totais"]["a_receber"], Decimal("10.00"))
+
+    def test_seed_apaga_os_totais_e_refaz_o_resumo(self):
+        staff = User.objects.create_user("staff", is_staff=True)
+        self.assertEqual(totais_do_lojista(staff)["face_value_total"], Decimal("0"))
+        self.client.force_login(staff)
+        with mock.patch("carteira.views.resumo.reconstruir", wraps=resumo.reconstruir) as reconstruir, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse("carteira:seed_contas_fixas"), {"pago": 1, "atraso": 1, "aberto": 1})
+        reconstruir.assert_called_once_with([staff.pk])
+        face = sum(ContaCarteira.objects.filter(owner=staff).values_list("total", flat=True))
+        self.assertEqual(totais_do_lojista(staff)["face_value_total"], face)
+
+
+class AuditFilaTests(TestCase):
+    """AuditLog gravado em lote fora da request (carteira.audit), só se a transação confirmar."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("lojista", password="senha")
+
+    def _evento(self, descricao):
+        return AuditLog(user=self.user, action="outro", descricao=descricao)
+
+    def test_flush_grava_a_fila_em_lote(self):
+        for i in range(5):
+            audit._fila.put(self._evento(f"evento {i}"))
+        with self.assertNumQueries(1):
+            audit.flush()
+        self.assertEqual(AuditLog.objects.filter(user=self.user).count(), 5)
+        self.assertTrue(audit._fila.empty())
+
+    @mock.patch("carteira.audit.ASSINCRONO", False)
+    def test_log_event_so_no_commit(self):
+        request = RequestFactory().get("/")
+        request.user = self.user
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            log_event(request, "outro", "desfeito")
+        self.assertEqual(AuditLog.objects.count(), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            log_event(request, "outro", "confirmado")
+        self.assertEqual(list(AuditLog.objects.values_list("descricao", flat=True)), ["confirmado"])
+        self.assertEqual(len(callbacks), 1)
+
+    def test_historico_le_o_que_esta_na_fila(self):
+        audit._fila.put(self._evento("ainda na fila"))
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(reverse("carteira:historico")), "ainda na fila")
+
+
+class ArquivoAuditoriaTests(TestCase):
+    """Meses antigos do AuditLog em .jsonl.gz e lidos de volta (carteira.arquivo)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("lojista", password="senha")
+        cls.outro = User.objects.create_user("outro")
+
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.pasta = pasta.name
+        self.enterContext(self.settings(CARTEIRA_AUDIT_ARQUIVO_DIR=self.pasta))
+
+    def _logs(self, n, dia=1, user=None):
+        inicio = timezone.make_aware(datetime(2020, 3, dia, 12))
+        return AuditLog.objects.bulk_create([
+            AuditLog(user=user or self.user, action="outro", descricao=f"Evento {i}", created_at=inicio + timedelta(minutes=i))
+            for i in range(n)
+        ])
+
+    def test_ida_e_volta(self):
+        self._logs(5)
+        self._logs(2, user=self.outro)
+        self.assertEqual(arquivo.arquivar_mes(2020, 3), 7)
+        self.assertFalse(AuditLog.objects.exists())
+        self.assertEqual(arquivo.meses_arquivados(), ["2020-03"])
+
+        logs = arquivo.ler_mes("2020-03", user_id=self.user.id)
+        self.assertEqual([l.descricao for l in logs], [f"Evento {i}" for i in range(4, -1, -1)])
+        self.assertEqual(logs[0].created_at, timezone.make_aware(datetime(2020, 3, 1, 12, 4)))
+        self.assertEqual([l.descricao for l in arquivo.ler_mes("2020-03", user_id=self.user.id, limite=2)], ["Evento 4", "Evento 3"])
+        self.assertEqual([l.descricao for l in arquivo.ler_mes("2020-03", q="EVENTO 1")], ["Evento 1", "Evento 1"])
+
+    def test_mais_recentes_de_varias_partes_sem_repetir(self):
+        recentes = self._logs(2, dia=20)
+        arquivo.arquivar_mes(2020, 3)
+        # a segunda parte traz registros mais antigos que os da primeira e, como se o arquivamento
+        # anterior tivesse caído antes de apagar, as mesmas linhas de novo
+        self._logs(3, dia=1)
+        AuditLog.objects.bulk_create(recentes)
+        arquivo.arquivar_mes(2020, 3)
+        self.assertEqual(len(arquivo._arquivos_do_mes("2020-03")), 2)
+        logs = arquivo.ler_mes("2020-03", limite=3)
+        self.assertEqual([(l.created_at.day, l.descricao) for l in logs], [(20, "Evento 1"), (20, "Evento 0"), (1, "Evento 2")])
+        self.assertEqual(len(arquivo.ler_mes("2020-03")), 5)
+
+    def test_um_arquivo_por_usuario(self):
+        self._logs(3)
+        self._logs(2, user=self.outro)
+        arquivo.arquivar_mes(2020, 3)
+        self._logs(1, dia=2)
+        arquivo.arquivar_mes(2020, 3)
+        pasta = Path(self.pasta, "2020-03")
+        self.assertEqual(
+            sorted(p.name for p in pasta.iterdir()),
+            sorted([f"{self.user.id}.jsonl.gz", f"{self.user.id}.1.jsonl.gz", f"{self.outro.id}.jsonl.gz"]),
+        )
+        # o histórico de um lojista não abre os arquivos dos outros
+        with mock.patch("carteira.arquivo.gzip.open", wraps=gzip.open) as abrir:
+            logs = arquivo.ler_mes("2020-03", user_id=self.outro.id)
+        self.assertEqual([Path(c.args[0]).name for c in abrir.call_args_list], [f"{self.outro.id}.jsonl.gz"])
+        self.assertEqual([l.descricao for l in logs], ["Evento 1", "Evento 0"])
+        self.assertEqual(len(arquivo.ler_mes("2020-03", user_id=self.user.id)), 4)
+        self.assertEqual(len(arquivo.ler_mes("2020-03")), 6)
+
+    def test_le_o_formato_antigo(self):
+        linhas = [
+            {
+                "id": i, "user_id": uid, "action": "outro", "descricao": f"Antigo {i}",
+                "created_at": f"2019-05-0{i}T12:00:00+00:00", "path": "", "method": "", "ip": None,
+                "user_agent": "", "extra": {},
+            }
+            for i, uid in ((1, self.user.id), (2, self.outro.id))
+        ]
+        with gzip.open(Path(self.pasta, "auditlog-2019-05.jsonl.gz"), "wt", encoding="utf-8") as f:
+            f.writelines(json.dumps(l) + "\n" for l in linhas)
+        self.assertEqual(arquivo.meses_arquivados(), ["2019-05"])
+        self.assertEqual([l.descricao for l in arquivo.ler_mes("2019-05", user_id=self.outro.id)], ["Antigo 2"])
+        self.assertEqual(arquivo.remover_arquivos_antigos(12), ["2019-05"])
+        self.assertEqual(arquivo.meses_arquivados(), [])
+
+    def test_partes_em_ordem_numerica(self):
+        for sufixo in ("", ".1", ".2", ".10"):
+            Path(self.pasta, f"auditlog-2020-03{sufixo}.jsonl.gz").touch()
+        nomes = [p.name for p in arquivo._arquivos_do_mes("2020-03")]
+        self.assertEqual(nomes, [f"auditlog-2020-03{s}.jsonl.gz" for s in ("", ".1", ".2", ".10")])
+
+    def test_retencao(self):
+        self._logs(1)
+        arquivo.arquivar_mes(2020, 3)
+        self.assertEqual(arquivo.remover_arquivos_antigos(None), [])
+        self.assertEqual(arquivo.remover_arquivos_antigos(12), ["2020-03"])
+        self.assertEqual(arquivo.meses_arquivados(), [])
+
+
+@mock.patch("carteira.audit.ASSINCRONO", False)
+class ExportacaoTests(TestCase):
+    """Exportação em streaming (CSV/XLSX) com os filtros do dashboard (carteira.exportar)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("lojista", password="senha")
+        cls.cliente = Cliente.objects.create(owner=cls.user, nome="Ana Souza", cpf="12345678909")
+        for valor in ("10.00", "20.00", "30.00"):
+            registrar_venda(cls.user, cls.cliente, date(2099, 1, 1), [{"produto": "Pão", "quantidade": 2, "valor_unit": Decimal(valor)}])
+        outro = User.objects.create_user("outro")
+        registrar_venda(outro, Cliente.objects.create(owner=outro, nome="Bia"), None, [{"produto": "x", "quantidade": 1, "valor_unit": 1}])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _csv(self, tipo, **params):
+        resp = self.client.get(reverse("carteira:exportar", args=[tipo]), params)
+        self.assertEqual(resp["Content-Type"], "text/csv; charset=utf-8")
+        texto = b"".join(resp.streaming_content).decode("utf-8").lstrip("\ufeff")
+        return [l.split(";") for l in texto.splitlines()]
+
+    def test_csv_das_contas_do_lojista(self):
+        linhas = self._csv("contas")
+        self.assertEqual(linhas[0][:3], ["id", "cliente", "cpf"])
+        self.assertEqual(len(linhas), 4)
+        self.assertEqual({l[5] for l in linhas[1:]}, {"20.00", "40.00", "60.00"})
+        self.assertEqual({l[1] for l in linhas[1:]}, {"Ana Souza"})
+        self.assertEqual(linhas[1][4], "01/01/2099")
+
+    def test_itens_com_subtotal_e_filtro(self):
+        linhas = self._csv("itens")
+        self.assertEqual(sorted(l[-1] for l in linhas[1:]), ["20.00", "40.00", "60.00"])
+        self.assertEqual(len(self._csv("itens", venc_fim="2000-01-01")), 1)
+
+    def test_lotes_por_id(self):
+        qs = ContaCarteira.objects.filter(owner=self.user)
+        todas = list(exportar.linhas("contas", qs))
+        self.assertEqual(list(exportar.linhas("contas", qs, lote=2)), todas)
+        self.assertEqual(len(todas), 4)
+
+    def test_xlsx(self):
+        resp = self.client.get(reverse("carteira:exportar", args=["clientes"]), {"formato": "xlsx"})
+        with zipfile.ZipFile(BytesIO(b"".join(resp.streaming_content))) as zf:
+            planilha = zf.read("xl/worksheets/sheet1.xml").decode()
+        self.assertIn("Ana Souza", planilha)
+        self.assertNotIn("Bia", planilha)
+
+    def test_xlsx_sem_caracteres_de_controle(self):
+        Cliente.objects.create(owner=self.user, nome="Caio\x07 Lima\x00", endereco="Rua\x1f 1\tfundos")
+        resp = self.client.get(reverse("carteira:exportar", args=["clientes"]), {"formato": "xlsx"})
+        with zipfile.ZipFile(BytesIO(b"".join(resp.streaming_content))) as zf:
+            planilha = ElementTree.fromstring(zf.read("xl/worksheets/sheet1.xml"))
+        textos = [t.text for t in planilha.iter("{http://schemas.openxmlformats.org/spreadsheetml/2006/main}t")]
+        self.assertIn("Caio Lima", textos)
+        self.assertIn("Rua 1\tfundos", textos)
+
+    def test_tipo_invalido(self):
+        self.assertEqual(self.client.get(reverse("carteira:exportar", args=["senhas"])).status_code, 404)
+
+
+class ImportacaoCsvTests(TestCase):
+    """Importação em lote de clientes e contas em aberto (carteira.importar)."""
+
+    CSV = (
+        "Nome;CPF/CNPJ;Celular;E-mail;Vencimento;Saldo;Produto\n"
+        "João Silva;123.456.789-09;(63) 99876-5432;joao@mail.com;01/01/2099;1.234,50;Fiado antigo\n"
+        "Maria Souza;98765432100;6332145678;;;;\n"
+        "João de novo;12345678909;63998765432;;10/02/2099;10,00;\n"
+        "Sem documento;;63998765432;;;;\n"
+        "Valor ruim;11122233344;63998765432;;;abc;\n"
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("lojista")
+
+    def _importar(self, texto=None, lote=2):
+        with self.captureOnCommitCallbacks(execute=True):
+            return importar_csv(self.user, BytesIO((texto or self.CSV).encode("utf-8-sig")), lote=lote)
+
+    def test_importa_clientes_e_contas(self):
+        res = self._importar()
+        self.assertEqual(
+            (res["linhas"], res["clientes_criados"], res["clientes_existentes"], res["contas_criadas"], res["total_erros"]),
+            (5, 2, 1, 2, 2),
+        )
+        self.assertEqual([n for n, _ in res["erros"]], [5, 6])
+        joao = Cliente.objects.get(owner=self.user, cpf="12345678909")
+        contas = ContaCarteira.objects.filter(cliente=joao).order_by("id")
+        self.assertEqual([(c.total, c.saldo, c.status) for c in contas], [
+            (Decimal("1234.50"), Decimal("1234.50"), "EM_ABERTO"), (Decimal("10.00"), Decimal("10.00"), "EM_ABERTO"),
+        ])
+        self.assertEqual(contas[0].itens.get().produto, "Fiado antigo")
+        self.assertEqual(contas[1].itens.get().produto, "Saldo anterior")
+        self.assertEqual(set(buscar_clientes(self.user, "joao").values_list("id", flat=True)), {joao.id})
+        self.assertEqual(totais_do_lojista(self.user)["a_receber"], Decimal("1244.50"))
+
+    def test_reimportar_nao_duplica_clientes(self):
+        self._importar()
+        res = self._importar()
+        self.assertEqual((res["clientes_criados"], res["clientes_existentes"]), (0, 3))
+        self.assertEqual(Cliente.objects.filter(owner=self.user).count(), 2)
+
+    def test_virgula_e_cabecalho_obrigatorio(self):
+        res = self._importar("nome,cpf,telefone\nAna,12345678909,6399990000\n")
+        self.assertEqual(res["clientes_criados"], 1)
+        with self.assertRaises(ValueError):
+            self._importar("nome;telefone\nAna;6399990000\n")
+
+
+class ExtratoClienteTests(TestCase):
+    """Extrato do cliente: compras e pagamentos intercalados com saldo corrente (carteira.extrato)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("lojista")
+        cls.cliente = Cliente.objects.create(owner=cls.user, nome="Ana")
+        cls.outro = Cliente.objects.create(owner=cls.user, nome="Bia")
+        jan = ContaCarteira.objects.create(owner=cls.user, cliente=cls.cliente, criado_em=date(2026, 1, 10))
+        fev = ContaCarteira.objects.create(owner=cls.user, cliente=cls.cliente, criado_em=date(2026, 2, 5))
+        alheia = ContaCarteira.objects.create(owner=cls.user, cliente=cls.outro, criado_em=date(2026, 2, 5))
+        for i in range(7):
+            ItemVenda.objects.create(conta=jan, produto=f"p{i}", quantidade=2, valor_unit=Decimal("5"))
+        ItemVenda.objects.create(conta=fev, produto="z", quantidade=1, valor_unit=Decimal("30"))
+        ItemVenda.objects.create(conta=alheia, produto="w", quantidade=1, valor_unit=Decimal("99"))
+        Pagamento.objects.create(conta=jan, valor=Decimal("20"), data_pagamento=cls._em(2026, 1, 10, 15))
+        Pagamento.objects.create(conta=jan, valor=Decimal("10"), data_pagamento=cls._em(2026, 2, 1, 9))
+        Pagamento.objects.create(conta=fev, valor=Decimal("5"), data_pagamento=cls._em(2026, 2, 5, 0, 30))
+
+    @staticmethod
+    def _em(*args):
+        return timezone.make_aware(datetime(*args))
+
+    def test_intercala_em_lotes_com_saldo_corrente(self):
+        linhas = list(extrato.extrato(self.user, self.cliente.id, lote=2))
+        self.assertEqual([l["tipo"] for l in linhas], ["compra"] * 7 + ["pagamento"] * 2 + ["compra", "pagamento"])
+        self.assertEqual([l["saldo"] for l in linhas[6:]], [Decimal(v) for v in ("70", "50", "40", "70", "65")])
+        self.assertEqual(extrato.saldo_ate(self.user, self.cliente.id), Decimal("65"))
+
+    def test_periodo_parte_do_saldo_anterior(self):
+        self.assertEqual(extrato.saldo_anterior(self.user, self.cliente.id, date(2026, 2, 1)), Decimal("50"))
+        fev = list(extrato.extrato(self.user, self.cliente.id, date(2026, 2, 1), date(2026, 2, 28), lote=1))
+        self.assertEqual([l["saldo"] for l in fev], [Decimal("40"), Decimal("70"), Decimal("65")])
+        self.assertEqual(extrato.saldo_ate(self.user, self.cliente.id, date(2026, 1, 31)), Decimal("50"))
+
+    @mock.patch("carteira.audit.ASSINCRONO", False)
+    def test_view_html_e_csv(self):
+        self.client.force_login(self.user)
+        url = reverse("carteira:extrato_cliente", args=[self.cliente.id])
+        resp = self.client.get(url, {"de": "2026-02-01", "ate": "2026-02-28"})
+        self.assertContains(resp, "R$ 50,00")
+        self.assertContains(resp, "R$ 65,00")
+        resp = self.client.get(url, {"formato": "csv"})
+        linhas = b"".join(resp.streaming_content).decode().splitlines()
+        self.assertEqual(len(linhas), 12)
+        self.assertTrue(linhas[-1].endswith("65.00"), linhas[-1])
+        intruso = User.objects.create_user("intruso")
+        self.client.force_login(intruso)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class AgingTests(TestCase):
+    """Aging dos recebíveis por faixa de atraso (carteira.aging)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("lojista")
+        cls.ana = Cliente.objects.create(owner=cls.user, nome="Ana")
+        cls.bia = Cliente.objects.create(owner=cls.user, nome="Bia")
+        # valores em potências de 2: cada faixa soma um conjunto distinto de bits
+        for cliente, dias, valor in (
+            (cls.ana, None, 1), (cls.ana, -5, 2), (cls.ana, 0, 4), (cls.ana, 30, 8), (cls.bia, 31, 16),
+            (cls.bia, 60, 32), (cls.bia, 61, 64), (cls.bia, 90, 128), (cls.bia, 91, 256),
+        ):
+            cls._conta(cliente, dias, valor)
+        paga = cls._conta(cls.ana, 200, 512)
+        Pagamento.objects.create(conta=paga, valor=Decimal("512"))
+
+    @classmethod
+    def _conta(cls, cliente, dias, valor):
+        hoje = timezone.localdate()
+        vencimento = None if dias is None else hoje - timedelta(days=dias)
+        conta = ContaCarteira.objects.create(owner=cls.user, cliente=cliente, vencimento=vencimento)
+        ItemVenda.objects.create(conta=conta, produto="x", quantidade=1, valor_unit=Decimal(valor))
+        return conta
+
+    def setUp(self):
+        cache.clear()
+
+    def test_faixas_nas_bordas(self):
+        relatorio = aging.aging_do_lojista(self.user)
+        self.assertEqual(relatorio["faixas"], {
+            "a_vencer": Decimal("3.00"), "d0_30": Decimal("12.00"), "d31_60": Decimal("48.00"),
+            "d61_90": Decimal("192.00"), "d90_mais": Decimal("256.00"),
+        })
+        self.assertEqual((relatorio["total"], relatorio["contas"]), (Decimal("511.00"), 9))
+        self.assertEqual([l["cliente"] for l in aging.aging_do_lojista(self.user, por_cliente=True)], ["Bia", "Ana"])
+
+    def test_cache_apagado_com_os_totais(self):
+        aging.aging_do_lojista(self.user)
+        with self.assertNumQueries(0):
+            aging.aging_do_lojista(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self._conta(self.ana, 100, 1000)
+        self.assertEqual(aging.aging_do_lojista(self.user)["faixas"]["d90_mais"], Decimal("1256.00"))
+
+    def test_api_e_relatorio(self):
+        self.client.force_login(self.user)
+        url = reverse("carteira:api_aging")
+        resp = self.client.get(url, {"cliente": self.ana.id}).json()
+        self.assertEqual((resp["total"], resp["faixas"]["d0_30"]), ("15.00", "12.00"))
+        resp = self.client.get(url, {"por_cliente": "1"}).json()
+        self.assertEqual([l["cliente_id"] for l in resp["results"]], [self.bia.id, self.ana.id])
+        self.assertEqual(self.client.get(url, {"cliente": "x"}).status_code, 400)
+        self.assertContains(self.client.get(reverse("carteira:relatorio_aging")), "90+ dias")
+
+
+class ResumoDiarioTests(TestCase):
+    """Resumo diário mantido por deltas nos sinais e refeito por resumo.reconstruir."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("lojista", password="senha")
+        cls.cliente = Cliente.objects.create(owner=cls.user, nome="Ana")
+
+    @staticmethod
+    def _em(*args):
+        return timezone.make_aware(datetime(*args))
+
+    def _linhas(self, owner=None):
+        return sorted(
+            ResumoDiario.objects.filter(owner=owner or self.user)
+            .exclude(vendas=0, recebido=0, n_pagamentos=0)
+            .values_list("dia", "vendas", "recebido", "n_pagamentos")
+        )
+
+    def _assert_igual_reconstrucao(self):
+        incremental = self._linhas()
+        resumo.reconstruir([self.user.pk])
+        self.assertEqual(incremental, self._linhas())
+        return incremental
+
+    def test_deltas_acompanham_edicoes(self):
+        jan = ContaCarteira.objects.create(owner=self.user, cliente=self.cliente, criado_em=date(2026, 1, 10))
+        fev = ContaCarteira.objects.create(owner=self.user, cliente=self.cliente, criado_em=date(2026, 2, 1))
+        item = ItemVenda.objects.create(conta=jan, produto="a", quantidade=2, valor_unit=Decimal("5"))
+        pag = Pagamento.objects.create(conta=jan, valor=Decimal("3"), data_pagamento=self._em(2026, 1, 12, 10))
+        self.assertEqual(self._linhas(), [
+            (date(2026, 1, 10), Decimal("10.00"), Decimal("0.00"), 0),
+            (date(2026, 1, 12), Decimal("0.00"), Decimal("3.00"), 1),
+        ])
+
+        item = ItemVenda.objects.get(pk=item.pk)
+        item.quantidade, item.conta = 3, fev
+        item.save()
+        pag = Pagamento.objects.get(pk=pag.pk)
+        pag.valor, pag.data_pagamento = Decimal("4"), self._em(2026, 1, 15, 10)
+        pag.save()
+        Pagamento.objects.create(conta=fev, valor=Decimal("1"), data_pagamento=self._em(2026, 2, 2, 9)).delete()
+        self.assertEqual(self._assert_igual_reconstrucao(), [
+            (date(2026, 1, 15), Decimal("0.00"), Decimal("4.00"), 1),
+            (date(2026, 2, 1), Decimal("15.00"), Decimal("0.00"), 0),
+        ])
+
+    def test_conta_excluida_sai_do_resumo(self):
+        conta = ContaCarteira.objects.create(owner=self.user, cliente=self.cliente, criado_em=date(2026, 1, 10))
+        ItemVenda.objects.create(conta=conta, produto="a", quantidade=1, valor_unit=Decimal("8"))
+        Pagamento.objects.create(conta=conta, valor=Decimal("2"), data_pagamento=self._em(2026, 1, 11, 10))
+        conta.refresh_from_db()
+        resumo.aplicar_conta(conta, -1)
+        ContaCarteira.objects.filter(pk=conta.pk).update(is_deleted=True)
+        self.assertEqual(self._assert_igual_reconstrucao(), [])
+
+    def test_gerador_reconstruir_e_remover(self):
+        owner = User.objects.get(pk=gerador.gerar(1, 20, 2, semente=1)["lojistas"][0])
+        linhas = self._linhas(owner)
+        self.assertTrue(linhas)
+        resumo.reconstruir([owner.pk])
+        self.assertEqual(self._linhas(owner), linhas)
+
+        self.assertEqual(gerador.remover(owner_ids=[owner.pk]), 1)
+        for model in (Cliente, ClienteTermo, ContaCarteira, ItemVenda, Pagamento, ResumoDiario):
+            self.assertFalse(model.objects.filter(owner_id=owner.pk).exists(), model.__name__)
+
+    def test_api_graficos_com_zeros(self):
+        conta = ContaCarteira.objects.create(owner=self.user, cliente=self.cliente, criado_em=date(2026, 1, 10))
+        ItemVenda.objects.create(conta=conta, produto="a", quantidade=1, valor_unit=Decimal("8"))
+        self.client.force_login(self.user)
+        url = reverse("carteira:api_graficos")
+        mes = self.client.get(url, {"ano": 2026, "mes": 1}).json()
+        self.assertEqual(len(mes["labels"]), 31)
+        self.assertEqual((mes["vendas"][9], mes["vendas"][10]), ("8.00", "0.00"))
+        ano = self.client.get(url, {"periodo": "ano", "ano": 2026}).json()
+        self.assertEqual(ano["vendas"][:2], ["8.00", "0.00"])
+        self.assertEqual(len(ano["labels"]), 12)
+
+
+class OwnerItensPagamentosTests(TestCase):
+    """Cópia do dono da conta em ItemVenda/Pagamento (filtros por lojista sem JOIN)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("lojista")
+        cls.outro = User.objects.create_user("outro")
+        cls.cliente = Cliente.objects.create(owner=cls.user, nome="Ana")
+        cls.conta_outro = ContaCarteira.objects.create(
+            owner=cls.outro, cliente=Cliente.objects.create(owner=cls.outro, nome="Bia")
+        )
+
+    def test_owner_copiado_ao_salvar(self):
+        conta = registrar_venda(self.user, self.cliente, None, [{"produto": "x", "quantidade": 1, "valor_unit": Decimal("3")}])
+        self.assertEqual(conta.itens.get().owner_id, self.user.id)
+        pagamento = Pagamento.objects.create(conta=conta, valor=Decimal("1"))
+        self.assertEqual(pagamento.owner_id, self.user.id)
+        item = ItemVenda(conta_id=self.conta_outro.pk, produto="y", quantidade=1, valor_unit=Decimal("1"))
+        item.save()
+        self.assertEqual(item.owner_id, self.outro.id)
+
+    def test_trocar_de_conta_troca_o_owner(self):
+        conta = ContaCarteira.objects.create(owner=self.user, cliente=self.cliente)
+        pagamento = Pagamento.objects.get(pk=Pagamento.objects.create(conta=conta, valor=Decimal("1")).pk)
+        pagamento.conta_id = self.conta_outro.pk
+        pagamento.save()
+        self.assertEqual(Pagamento.objects.get(pk=pagamento.pk).owner_id, self.outro.id)
+        self.client.force_login(self.user)
+        resp = self.client.get(reverse("carteira:recibo_pagamento", args=[pagamento.pk]))
+        self.assertRedirects(resp, reverse("carteira:dashboard"), fetch_redirect_response=False)
+
+    def test_verificar_donos_corrige(self):
+        conta = ContaCarteira.objects.create(owner=self.user, cliente=self.cliente)
+        pagamento = Pagamento.objects.create(conta=conta, valor=Decimal("1"))
+        Pagamento.objects.filter(pk=pagamento.pk).update(owner=self.outro)
+        saida = StringIO()
+        call_command("verificar_donos", stdout=saida)
+        self.assertIn("1 linha(s)", saida.getvalue())
+        call_command("verificar_donos", "--corrigir", stdout=StringIO())
+        self.assertEqual(Pagamento.objects.get(pk=pagamento.pk).owner_id, self.user.id)
+
+
+@override_settings(AUTHENTICATION_BACKENDS=["fiado_pro.auth_backends.EmailOrUsernameBackend"])
+class LoginEmailOuUsernameTests(TestCase):
+    """Login por e-mail ou username numa consulta, com cache de identificadores inexistentes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ana = User.objects.create_user("Ana", email="ana@x.com", password="p")
+        # username igual ao e-mail da Ana: o e-mail tem preferência
+        User.objects.create_user("ana@x.com", email="outra@x.com", password="q")
+
+    def setUp(self):
+        cache.clear()
+
+    def test_email_ou_username_sem_diferenciar_maiusculas(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(authenticate(None, username=" ANA@x.com ", password="p"), self.ana)
+        self.assertEqual(authenticate(None, username="ana", password="p"), self.ana)
+        self.assertIsNone(authenticate(None, username="ana", password="errada"))
+        self.assertIsNone(authenticate(None, username="", password="p"))
+
+    def test_inexistente_fica_no_cache_ate_o_usuario_existir(self):
+        self.assertIsNone(authenticate(None, username="novo@x.com", password="p"))
+        with self.assertNumQueries(0):
+            self.assertIsNone(authenticate(None, username="Novo@x.com", password="p"))
+        novo = User.objects.create_user("novo", email="novo@x.com", password="p")
+        self.assertEqual(authenticate(None, username="novo@x.com", password="p"), novo)
+
+        self.assertIsNone(authenticate(None, username="ren", password="p"))
+        novo.username = "ren"
+        novo.save()
+        self.assertEqual(authenticate(None, username="ren", password="p"), novo)
+
+    @override_settings(CARTEIRA_LOGIN_FALHA_CACHE_SEGUNDOS=0)
+    def test_cache_desligado(self):
+        authenticate(None, username="ninguem", password="p")
+        with self.assertNumQueries(1):
+            self.assertIsNone(authenticate(None, username="ninguem", password="p"))
+
+    def test_indices_lower_em_auth_user(self):
+        with connection.cursor() as cursor:
+            nomes = connection.introspection.get_constraints(cursor, User._meta.db_table)
+        self.assertLessEqual({"auth_user_email_lower_idx", "auth_user_username_lower_idx"}, set(nomes))
+
+
+@mock.patch("carteira.audit.ASSINCRONO", False)
+class ConfirmacaoSenhaTests(TestCase):
+    """Janela de reuso da confirmação por senha (carteira.confirmacao) e política do PBKDF2."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("lojista", password="senha")
+        cliente = Cliente.objects.create(owner=cls.user, nome="Ana")
+        cls.c1 = ContaCarteira.objects.create(owner=cls.user, cliente=cliente)
+        cls.c2 = ContaCarteira.objects.create(owner=cls.user, cliente=cliente)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _excluir(self, conta, **dados):
+        self.client.post(reverse("carteira:excluir_conta", args=[conta.id]), {"motivo": "teste", **dados})
+        conta.refresh_from_db()
+        return conta.is_deleted
+
+    def _request(self):
+        request = RequestFactory().post("/")
+        request.user = User.objects.get(pk=self.user.pk)
+        request.session = SessionStore()
+        return request
+
+    def test_senha_certa_abre_a_janela(self):
+        self.assertFalse(self._excluir(self.c1, senha="errada"))
+        self.assertFalse(self._excluir(self.c1))
+        self.assertTrue(self._excluir(self.c1, senha="senha"))
+        with mock.patch.object(User, "check_password", side_effect=AssertionError("hash dentro da janela")):
+            self.assertTrue(self._excluir(self.c2))
+            self.assertContains(self.client.get(reverse("carteira:excluidos")), "Senha confirmada há pouco")
+            self.client.post(reverse("carteira:restaurar_conta", args=[self.c2.id]))
+            self.c2.refresh_from_db()
+            self.assertFalse(self.c2.is_deleted)
+
+    def test_janela_expira_e_pode_ser_desligada(self):
+        request = self._request()
+        self.assertTrue(confirmacao.confirmar(request, "senha"))
+        self.assertTrue(confirmacao.recente(request))
+        with mock.patch("carteira.confirmacao.time.time", return_value=time.time() + 301):
+            self.assertFalse(confirmacao.recente(request))
+        with self.settings(CARTEIRA_CONFIRMACAO_SEGUNDOS=0):
+            self.assertFalse(confirmacao.recente(request))
+
+    def test_trocar_a_senha_invalida_a_janela(self):
+        request = self._request()
+        self.assertTrue(confirmacao.confirmar(request, "senha"))
+        request.user.set_password("nova")
+        request.user.save()
+        self.assertFalse(confirmacao.recente(request))
+        self.assertFalse(confirmacao.confirmar(request, None))
+        self.assertNotIn(confirmacao.SESSAO, request.session)
+
+    def test_iteracoes_configuraveis_com_minimo(self):
+        with self.settings(CARTEIRA_PBKDF2_ITERACOES=1_000):
+            self.assertEqual(PBKDF2Configuravel().iterations, MINIMO_ITERACOES)
+        with self.settings(CARTEIRA_PBKDF2_ITERACOES=250_000):
+            self.assertEqual(PBKDF2Configuravel().iterations, 250_000)
+
+    @override_settings(PASSWORD_HASHERS=["fiado_pro.hashers.PBKDF2Configuravel"], CARTEIRA_PBKDF2_ITERACOES=100_000)
+    def test_confirmar_regrava_o_hash_sem_deslogar(self):
+        self.user.password = PBKDF2PasswordHasher().encode("senha", "saltsaltsalt1234567890", 120_000)
+        self.user.save()
+        self.client.force_login(self.user)
+        self.assertTrue(self._excluir(self.c1, senha="senha"))
+        self.user.refresh_from_db()
+        self.assertIn("$100000$", self.user.password)
+        self.assertEqual(self.client.get(reverse("carteira:excluidos")).status_code, 200)
+
+
+class ViewsAsyncTests(TestCase):
+    """As views async (CARTEIRA_VIEWS_ASYNC) respondem o mesmo que as síncronas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("lojista")
+        for i in range(5):
+            cliente = Cliente.objects.create(owner=cls.user, nome=f"Maria {i}", cpf=f"{i:011d}")
+            registrar_venda(cls.user, cliente, None, [{"produto": "x", "quantidade": 1, "valor_unit": Decimal("3")}])
+        AuditLog.objects.create(user=cls.user, action="outro", descricao="Evento da Maria")
+
+    def setUp(self):
+        cache.clear()
+
+    def _sincrona(self, view, url):
+        request = RequestFactory().get(url)
+        request.user, request.session = self.user, SessionStore()
+        return view(request)
+
+    def _async(self, view, url):
+        async def auser():
+            return self.user
+
+        request = AsyncRequestFactory().get(url)
+        request.auser, request.session = auser, SessionStore()
+        return async_to_sync(view)(request)
+
+    def _sem_csrf(self, resp):
+        return re.sub(rb'name="csrfmiddlewaretoken" value="[^"]+"', b"", resp.content)
+
+    def test_mesma_resposta_das_sincronas(self):
+        casos = [
+            ("dashboard", "/"),
+            ("dashboard", "/?q=maria&sort=nome&dir=asc"),
+            ("clientes_lista", "/clientes/?q=mar"),
+            ("historico", "/historico/?q=maria"),
+            ("api_clientes_busca", "/api/clientes/busca/?q=maria 1"),
+        ]
+        for nome, url in casos:
+            with self.subTest(url=url):
+                sincrona = self._sincrona(getattr(views, nome), url)
+                assincrona = self._async(getattr(views_async, nome), url)
+                self.assertEqual((sincrona.status_code, assincrona.status_code), (200, 200))
+                self.assertIn("Maria", assincrona.content.decode())
+                self.assertEqual(self._sem_csrf(sincrona), self._sem_csrf(assincrona))
+
+    def test_dashboard_async_usa_o_cache_dos_totais(self):
+        self._async(views_async.dashboard, "/")
+        self.assertEqual(cache.get(totais._chave(self.user.pk))["a_receber"], Decimal("15.00"))
+
+    def test_exige_login(self):
+        async def anonimo():
+            return AnonymousUser()
+
+        request = AsyncRequestFactory().get("/")
+        request.auser = anonimo
+        self.assertEqual(async_to_sync(views_async.dashboard)(request).status_code, 302)
+
+
+class SugestoesAutocompleteTests(TestCase):
+    """LRU do autocomplete de clientes por lojista (carteira.sugestoes)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("lojista")
+        for nome in ("Joana Silva", "Joaquim Souza", "Maria Joana", "Pedro Santos"):
+            Cliente.objects.create(owner=cls.user, nome=nome)
+
+    def setUp(self):
+        cache.clear()
+        sugestoes.limpar()
+
+    def _nomes(self, q):
+        return [r["nome"] for r in sugestoes.sugerir(self.user, q)]
+
+    def test_igual_a_busca_no_banco(self):
+        for q in ("jo", "joa", "joan", "joana s", "ma jo", "sou", "x"):
+            with self.subTest(q=q):
+                self.assertEqual(
+                    [r["id"] for r in sugestoes.sugerir(self.user, q)],
+                    [c.id for c in sugerir_clientes(self.user, q)],
+                )
+
+    def test_consulta_mais_restrita_sai_da_memoria(self):
+        self.assertEqual(len(self._nomes("jo")), 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(self._nomes("joana"), ["Joana Silva", "Maria Joana"])
+            self.assertEqual(self._nomes("joana s"), ["Joana Silva"])
+            self.assertEqual(len(self._nomes("jo")), 3)
+
+    def test_resposta_incompleta_nao_serve_de_base(self):
+        Cliente.objects.bulk_create([Cliente(owner=self.user, nome=f"Joca {i}") for i in range(sugestoes.LIMITE)])
+        indexar_em_lote(Cliente.objects.filter(owner=self.user, nome__startswith="Joca"))
+        self.assertEqual(len(self._nomes("jo")), sugestoes.LIMITE)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self._nomes("joana s"), ["Joana Silva"])
+        self.assertTrue(ctx.captured_queries)
+
+    def test_salvar_ou_apagar_cliente_invalida(self):
+        self.assertEqual(self._nomes("joana s"), ["Joana Silva"])
+        with self.captureOnCommitCallbacks(execute=True):
+            novo = Cliente.objects.create(owner=self.user, nome="Joana Souza")
+        self.assertEqual(len(self._nomes("joana s")), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            novo.nome = "Rita"
+            novo.save()
+        self.assertEqual(self._nomes("joana s"), ["Joana Silva"])
+        with self.captureOnCommitCallbacks(execute=True):
+            Cliente.objects.get(nome="Joana Silva").delete()
+        self.assertEqual(self._nomes("joana s"), [])
+
+        self.client.force_login(self.user)
+        resp = self.client.get(reverse("carteira:api_clientes_busca"), {"q": "rit"})
+        self.assertEqual([r["nome"] for r in resp.json()["results"]], ["Rita"])
+
+
+    def test_configuracao_lida_a_cada_uso(self):
+        with override_settings(CARTEIRA_SUGESTOES_TTL=0):
+            self._nomes("jo")
+            with CaptureQueriesContext(connection) as ctx:
+                self._nomes("jo")
+            self.assertTrue(ctx.captured_queries)
+        sugestoes.limpar()
+        with override_settings(CARTEIRA_SUGESTOES_POR_LOJISTA=1):
+            self._nomes("jo")
+            self._nomes("pe")
+            with CaptureQueriesContext(connection) as ctx:
+                self._nomes("jo")
+            self.assertTrue(ctx.captured_queries)
+
+    @override_settings(CARTEIRA_SUGESTOES_TTL=45)
+    def test_dashboard_usa_o_mesmo_prazo_no_navegador(self):
+        self.client.force_login(self.user)
+        resp = self.client.get(reverse("carteira:dashboard"))
+        self.assertContains(resp, "const RESPOSTA_MS = 45 * 1000;")
+
+
+@mock.patch("carteira.audit.ASSINCRONO", False)
+class ApiV1Tests(TestCase):
+    """API JSON (carteira.api): seleção de campos, paginação e ETag/If-None-Match/If-Match."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("lojista")
+        cls.outro = User.objects.create_user("outro")
+        cls.cliente = Cliente.objects.create(
+            owner=cls.user, nome="Ana Lima", cpf="12345678901", telefone="63999990000", email="ana@x.com", endereco="Rua A",
+        )
+        cls.conta = registrar_venda(
+            cls.user, cls.cliente, None, [{"produto": "Pão", "quantidade": 2, "valor_unit": Decimal("3.50")}]
+        )
+
+    def setUp(self):
+        cache.clear()
+        sugestoes.limpar()
+        self.client.force_login(self.user)
+
+    def _enviar(self, metodo, url, dados, **headers):
+        with self.captureOnCommitCallbacks(execute=True):
+            return getattr(self.client, metodo)(url, json.dumps(dados), content_type="application/json", **headers)
+
+    def test_campos(self):
+        resp = self.client.get(reverse("carteira:api_v1_contas"), {"campos": "id,saldo,cliente_nome"})
+        self.assertEqual(resp.json()["results"], [{"id": self.conta.id, "saldo": "7.00", "cliente_nome": "Ana Lima"}])
+        resp = self.client.get(reverse("carteira:api_v1_conta", args=[self.conta.id]))
+        self.assertEqual(resp.json()["itens"][0]["subtotal"], "7.00")
+        self.assertEqual(self.client.get(reverse("carteira:api_v1_clientes"), {"campos": "bla"}).status_code, 400)
+
+    def test_if_none_match_responde_304_sem_consultar_as_contas(self):
+        url = reverse("carteira:api_v1_conta", args=[self.conta.id])
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(3):  # sessão, usuário e a versão da conta
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        lista = reverse("carteira:api_v1_contas")
+        etag_lista = self.client.get(lista)["ETag"]
+        with self.assertNumQueries(2):  # a versão da lista vem do cache
+            self.assertEqual(self.client.get(lista, HTTP_IF_NONE_MATCH=etag_lista).status_code, 304)
+
+        resp = self._enviar("post", reverse("carteira:api_v1_pagamentos", args=[self.conta.id]), {"valor": "2.00"})
+        self.assertEqual(resp.json()["conta"]["saldo"], "5.00")
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.client.get(lista, HTTP_IF_NONE_MATCH=etag_lista).status_code, 200)
+
+    def test_if_match_desatualizado_responde_412(self):
+        url = reverse("carteira:api_v1_pagamentos", args=[self.conta.id])
+        etag = self.client.get(reverse("carteira:api_v1_conta", args=[self.conta.id]))["ETag"]
+        self.assertEqual(self._enviar("post", url, {"valor": "2.00"}, HTTP_IF_MATCH=etag).status_code, 201)
+        self.assertEqual(self._enviar("post", url, {"valor": "2.00"}, HTTP_IF_MATCH=etag).status_code, 412)
+        self.assertEqual(Pagamento.objects.filter(conta=self.conta).count(), 1)
+
+        cliente = reverse("carteira:api_v1_cliente", args=[self.cliente.id])
+        etag = self.client.get(cliente)["ETag"]
+        self.assertEqual(self._enviar("patch", cliente, {"nome": "Ana Souza"}).json()["nome"], "Ana Souza")
+        self.assertEqual(self._enviar("patch", cliente, {"nome": "Z"}, HTTP_IF_MATCH=etag).status_code, 412)
+
+    def test_paginacao_por_cursor(self):
+        ContaCarteira.objects.bulk_create(
+            [ContaCarteira(owner=self.user, cliente=self.cliente, total=1, saldo=1) for _ in range(6)]
+        )
+        ids, cursor = [], ""
+        while True:
+            pagina = self.client.get(reverse("carteira:api_v1_contas"), {"campos": "id", "limite": 3, "cursor": cursor}).json()
+            ids += [c["id"] for c in pagina["results"]]
+            if not pagina["next"]:
+                break
+            cursor = pagina["next"]
+        self.assertEqual(len(ids), 7)
+        self.assertEqual(ids, sorted(ids, reverse=True))
+
+    def test_isolado_por_lojista(self):
+        self.client.force_login(self.outro)
+        self.assertEqual(self.client.get(reverse("carteira:api_v1_conta", args=[self.conta.id])).status_code, 404)
+        self.assertEqual(self.client.get(reverse("carteira:api_v1_cliente", args=[self.cliente.id])).status_code, 404)
+        self.assertEqual(self.client.get(reverse("carteira:api_v1_contas")).json()["results"], [])
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse("carteira:api_v1_contas")).status_code, 401)
+
+
+@modify_settings(MIDDLEWARE={"append": "carteira.metricas.MetricasMiddleware"})
+class MetricasTests(TestCase):
+    """Histogramas por rota do MetricasMiddleware e a view de métricas (carteira.metricas)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("lojista")
+        cls.staff = User.objects.create_user("staff", is_staff=True)
+
+    def setUp(self):
+        metricas.zerar()
+        self.addCleanup(metricas.zerar)
+        self.client.force_login(self.user)
+
+    def test_percentil(self):
+        hist = metricas.Histograma()
+        self.assertEqual(hist.percentil(50), 0.0)
+        for valor in range(1, 101):
+            hist.adicionar(valor)
+        # limite superior do balde: até FATOR acima do valor exato
+        for p in (50, 95, 99):
+            self.assertGreaterEqual(hist.percentil(p), p)
+            self.assertLessEqual(hist.percentil(p), p * metricas.FATOR)
+        self.assertEqual(hist.percentil(100), 100)
+        hist.adicionar(0.2)
+        self.assertEqual(hist.percentil(0), 1.0)
+
+    def test_queries_e_latencia_por_rota(self):
+        # o request_started de cada request do client zera connection.queries
+        reset_queries()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse("carteira:dashboard"))
+        n_queries = len(ctx.captured_queries)
+        self.client.get(reverse("carteira:clientes_lista"))
+        rotas = metricas.relatorio()
+        self.assertEqual(set(rotas), {"carteira:dashboard", "carteira:clientes_lista"})
+        dashboard = rotas["carteira:dashboard"]
+        self.assertEqual(dashboard["n"], 1)
+        # com uma amostra o percentil é o próprio valor
+        self.assertEqual(dashboard["queries"]["p50"], n_queries)
+        self.assertGreater(dashboard["sql_ms"]["max"], 0)
+        self.assertGreater(dashboard["template_ms"]["max"], 0)
+        self.assertGreaterEqual(dashboard["total_ms"]["max"], dashboard["template_ms"]["max"])
+
+    def test_loga_acima_do_limite(self):
+        url = reverse("carteira:dashboard")
+        with self.assertNoLogs("carteira.metricas", "WARNING"):
+            self.client.get(url)
+        with self.settings(CARTEIRA_METRICAS_LIMITE_QUERIES=1), self.assertLogs("carteira.metricas", "WARNING") as logs:
+            self.client.get(url)
+        self.assertIn("(carteira:dashboard)", logs.output[0])
+        with self.settings(CARTEIRA_METRICAS_LIMITE_MS=0), self.assertLogs("carteira.metricas", "WARNING"):
+            self.client.get(url)
+        with self.settings(CARTEIRA_METRICAS_LIMITE_QUERIES=1000), self.assertNoLogs("carteira.metricas", "WARNING"):
+            self.client.get(url)
+
+    def test_view_so_para_staff(self):
+        url = reverse("carteira:metricas")
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(self.staff)
+        self.client.get(reverse("carteira:dashboard"))
+        resp = self.client.get(url).json()
+        self.assertEqual(resp["pid"], os.getpid())
+        self.assertEqual(resp["rotas"]["carteira:dashboard"]["n"], 1)
+        self.assertEqual(self.client.post(url).json()["rotas"], {})
+
+
+class DetalheContaQueriesTests(TestCase):
+    """Detalhe e recibos da conta: nº de queries não cresce com itens e pagamentos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("lojista", password="senha")
+        Empresa.objects.create(owner=cls.user, nome="Mercadinho", endereco="Rua 1")
+        cls.cliente = Cliente.objects.create(owner=cls.user, nome="Ana", cpf="12345678909")
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def _conta(self, n):
+        conta = ContaCarteira.objects.create(owner=self.user, cliente=self.cliente, vencimento=date(2099, 1, 1))
+        ItemVenda.objects.bulk_create([
+            ItemVenda(conta=conta, owner=self.user, produto=f"Produto {i}", quantidade=2, valor_unit=Decimal("3.50"))
+            for i in range(n)
+        ])
+        Pagamento.objects.bulk_create([Pagamento(conta=conta, owner=self.user, valor=Decimal("1.00")) for _ in range(n)])
+        conta.atualizar_totais()
+        return conta
+
+    def _queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        return len(ctx.captured_queries), resp
+
+    def test_conta_detalhe_queries_constantes(self):
+        pequena, grande = self._conta(1), self._conta(30)
+        n_pequena, _ = self._queries(reverse("carteira:conta", args=[pequena.id]))
+        n_grande, resp = self._queries(reverse("carteira:conta", args=[grande.id]))
+        self.assertEqual(n_pequena, n_grande)
+        # sessão + usuário + conta/cliente/empresa + itens + pagamentos
+        self.assertEqual(n_grande, 5)
+        self.assertEqual(len(resp.context["conta"].itens.all()), 30)
+
+    def test_recibo_conta_queries_constantes(self):
+        pequena, grande = self._conta(1), self._conta(30)
+        n_pequena, _ = self._queries(reverse("carteira:recibo_conta", args=[pequena.id]))
+        n_grande, resp = self._queries(reverse("carteira:recibo_conta", args=[grande.id]))
+        self.assertEqual(n_pequena, n_grande)
+        # sessão + usuário + versão + conta/cliente/empresa + itens + pagamentos
+        self.assertEqual(n_grande, 6)
+        self.assertContains(resp, "Mercadinho")
+        self.assertContains(resp, "7,00")
+
+    def test_recibo_conta_reimpressao_usa_cache(self):
+        conta = self._conta(30)
+        url = reverse("carteira:recibo_conta", args=[conta.id])
+        _, primeira = self._queries(url)
+        n, segunda = self._queries(url)
+        # sessão + usuário + versão
+        self.assertEqual(n, 3)
+        self.assertEqual(primeira.content, segunda.content)
+
+        ItemVenda.objects.create(conta=conta, produto="Novo item", quantidade=1, valor_unit=Decimal("9.90"))
+        self.assertContains(self.client.get(url), "Novo item")
+
+    def test_recibo_pagamento_uma_consulta(self):
+        conta = self._conta(5)
+        pg = conta.pagamentos.first()
+        n, resp = self._queries(reverse("carteira:recibo_pagamento", args=[pg.id]))
+        # sessão + usuário + dono/versão + pagamento/conta/cliente/empresa
+        self.assertEqual(n, 4)
+        self.assertContains(resp, "Mercadinho")
+
+    def test_recibo_pdf(self):
+        conta = self._conta(3)
+        with self.settings(CARTEIRA_RECIBOS_PDF_DIR=self._pasta_pdf()):
+            resp = self.client.get(reverse("carteira:recibo_conta", args=[conta.id]), {"formato": "pdf"})
+            self.assertEqual(resp["Content-Type"], "application/pdf")
+            self.assertTrue(b"".join(resp.streaming_content).startswith(b"%PDF-"))
+
+    def test_recibo_pdf_apagado_por_outra_request(self):
+        conta = self._conta(3)
+        url = reverse("carteira:recibo_conta", args=[conta.id])
+        pasta = Path(self._pasta_pdf())
+        gerar = recibos.pdf_recibo_conta
+
+        def e_outra_request_apaga(*args):
+            # uma request por versão mais nova apaga o arquivo antes desta responder
+            pdf = gerar(*args)
+            for arq in pasta.glob("*.pdf"):
+                arq.unlink()
+            return pdf
+
+        with self.settings(CARTEIRA_RECIBOS_PDF_DIR=pasta):
+            self.client.get(url, {"formato": "pdf"})
+            with mock.patch("carteira.views.recibos.pdf_recibo_conta", side_effect=e_outra_request_apaga):
+                resp = self.client.get(url, {"formato": "pdf"})
+            self.assertEqual(resp.status_code, 200)
+            self.assertTrue(b"".join(resp.streaming_content).startswith(b"%PDF-"))
+            # apagado entre a geração e a leitura: gera de novo em vez de falhar
+            resp = self.client.get(url, {"formato": "pdf"})
+            self.assertTrue(b"".join(resp.streaming_content).startswith(b"%PDF-"))
+            self.assertEqual(len(list(pasta.glob("*.pdf"))), 1)
+
+    def _pasta_pdf(self):
+        import tempfile
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        return pasta.name
+
+    def test_recibo_pagamento_de_outro_lojista(self):
+        outro = User.objects.create_user("outro", password="senha")
+        cliente = Cliente.objects.create(owner=outro, nome="Bia")
+        conta = ContaCarteira.objects.create(owner=outro, cliente=cliente)
+        pg = Pagamento.objects.create(conta=conta, valor=Decimal("1.00"))
+        resp = self.client.get(reverse("carteira:recibo_pagamento", args=[pg.id]))
+        self.assertRedirects(resp, reverse("carteira:dashboard"), fetch_redirect_response=False)
+
+
+REPLICA = "replica_teste"
+
+
+@override_settings(
+    CARTEIRA_DB_REPLICA=REPLICA,
+    DATABASE_ROUTERS=["carteira.replica.ReplicaRouter"],
+    MIDDLEWARE=[*settings.MIDDLEWARE, "carteira.replica.ReplicaMiddleware"],
+)
+class ReplicaRouterTests(TestCase):
+    """
+    Primário (banco de teste "default") e réplica num segundo arquivo SQLite, criado e migrado
+    aqui. Os dados de cada um diferem de propósito: a resposta mostra de onde a view leu.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        # o alias só existe nesta classe: registrado e migrado antes do setUpClass do TestCase,
+        # que passa a abrir a transação de cada teste também nele
+        cls._pasta = tempfile.mkdtemp()
+        config = {"ENGINE": "django.db.backends.sqlite3", "NAME": os.path.join(cls._pasta, "replica.sqlite3")}
+        connections.settings[REPLICA] = connections.configure_settings(
+            {"default": connections.settings["default"], REPLICA: config}
+        )[REPLICA]
+        call_command("migrate", database=REPLICA, verbosity=0)
+        cls.databases = {"default", REPLICA}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+        shutil.rmtree(cls._pasta, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("lojista", password="senha")
+        cls.cliente = Cliente.objects.create(owner=cls.user, nome="Cliente do primário")
+        cls.conta = ContaCarteira.objects.create(owner=cls.user, cliente=cls.cliente)
+        User.objects.using(REPLICA).create(pk=cls.user.pk, username="lojista")
+        Cliente.objects.using(REPLICA).create(owner_id=cls.user.pk, nome="Cliente da réplica")
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_views_de_leitura_usam_a_replica(self):
+        resp = self.client.get(reverse("carteira:clientes_lista"))
+        self.assertContains(resp, "Cliente da réplica")
+        self.assertNotContains(resp, "Cliente do primário")
+
+    def test_views_sem_marcacao_usam_o_primario(self):
+        resp = self.client.get(reverse("carteira:conta", args=[self.conta.id]))
+        self.assertContains(resp, "Cliente do primário")
+
+    def test_fixa_no_primario_depois_de_escrever(self):
+        resp = self.client.post(reverse("carteira:pagar", args=[self.conta.id]), {"valor": "1.00"})
+        self.assertEqual(resp.cookies["fp_primario"]["max-age"], 5)
+        self.assertEqual(Pagamento.objects.filter(conta=self.conta).count(), 1)
+
+        resp = self.client.get(reverse("carteira:clientes_lista"))
+        self.assertContains(resp, "Cliente do primário")
+
+        # cookie expirado: volta para a réplica
+        del self.client.cookies["fp_primario"]
+        resp = self.client.get(reverse("carteira:clientes_lista"))
+        self.assertContains(resp, "Cliente da réplica")
+
+    def test_caches_do_dashboard_calculados_no_primario(self):
+        # a réplica não tem contas: um total cacheado a partir dela ficaria zerado
+        ItemVenda.objects.create(conta=self.conta, produto="x", quantidade=1, valor_unit=Decimal("10"))
+        self.client.get(reverse("carteira:dashboard"))
+        self.client.get(reverse("carteira:relatorio_aging"))
+        self.assertEqual(cache.get(totais._chave(self.user.pk))["a_receber"], Decimal("10.00"))
+        self.assertEqual(cache.get(aging.chaves_do_dia(self.user.pk)[0])["total"], Decimal("10.00"))
+
+        cache.clear()
+        with replica._marcar():
+            self.assertEqual(async_to_sync(totais.atotais_do_lojista)(self.user)["a_receber"], Decimal("10.00"))
+
+    def test_historico_nao_fixa_no_primario(self):
+        # registro de outra request ainda na fila do processo: o histórico grava, mas segue na réplica
+        audit._fila.put_nowait(AuditLog(user=self.user, action="outro", descricao="Na fila"))
+        resp = self.client.get(reverse("carteira:historico"))
+        self.assertNotIn("fp_primario", resp.cookies)
+        self.assertTrue(AuditLog.objects.filter(descricao="Na fila").exists())
+
+        audit._fila.put_nowait(AuditLog(user=self.user, action="outro", descricao="Na fila de novo"))
+        request = AsyncRequestFactory().get(reverse("carteira:historico"))
+        request.session = SessionStore()
+        request.auser = self._auser
+        resp = async_to_sync(replica.ReplicaMiddleware(views_async.historico))(request)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn("fp_primario", resp.cookies)
+
+    async def _auser(self):
+        return self.user
+
+    @override_settings(CARTEIRA_DB_REPLICA=None)
+    def test_sem_replica_configurada(self):
+        resp = self.client.get(reverse("carteira:clientes_lista"))
+        self.assertContains(resp, "Cliente do primário")
@@ -0,0 +1,113 @@
+# carteira/totais.py
+"""
+Totais do dashboard (pago, a receber, em aberto, em atraso, valor de face, saldo).
+
+Os totais sem filtro de cada lojista ficam no cache do Django (CACHES["default"]) e são
+apagados sempre que uma conta do lojista muda (itens, pagamentos, exclusão/restauração,
+varredura de atrasos). Com mais de um processo, use um backend compartilhado
+(Redis, Memcached, banco ou arquivo) — o locmem só invalida o próprio processo.
+
+Os totais cacheados são sempre calculados no primário, mesmo quando a view lê da réplica
+(carteira.replica): o cache é apagado no commit e a réplica pode ainda não ter a escrita —
+um total lido dela ficaria no cache até a próxima mudança ou o timeout.
+
+Junto com os totais sai a versão das contas do lojista (`versao_do_lojista`), ETag das
+listas de contas da carteira.api.
+"""
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, Sum, When
+
+from .models import ContaCarteira
+
+DEC = DecimalField(max_digits=12, decimal_places=2)
+ZERO = Decimal("0.00")
+CACHE_TIMEOUT = getattr(settings, "CARTEIRA_TOTAIS_CACHE_TIMEOUT", 60 * 60)
+
+# pago = total - saldo (independe de status)
+pago_expr = ExpressionWrapper(F("total") - F("saldo"), output_field=DEC)
+
+
+def _chave(owner_id):
+    return f"carteira:totais:{owner_id}"
+
+
+def _chave_versao(owner_id):
+    return f"carteira:totais:versao:{owner_id}"
+
+
+def _agregados():
+    return dict(
+        total_face=Sum("total", default=ZERO),
+        total_saldo=Sum("saldo", default=ZERO),
+        total_pago=Sum(pago_expr, default=ZERO),
+        total_em_aberto=Sum(
+            Case(When(status="EM_ABERTO", then=F("saldo")), default=ZERO, output_field=DEC),
+            default=ZERO,
+        ),
+        total_em_atraso=Sum(
+            Case(When(status="ATRASO", then=F("saldo")), default=ZERO, output_field=DEC),
+            default=ZERO,
+        ),
+    )
+
+
+def _totais(agg):
+    em_aberto = agg["total_em_aberto"] or Decimal("0")
+    em_atraso = agg["total_em_atraso"] or Decimal("0")
+    return {
+        "pago": agg["total_pago"] or Decimal("0"),
+        "a_receber": em_aberto + em_atraso,
+        "em_aberto": em_aberto,
+        "em_atraso": em_atraso,
+        "face_value_total": agg["total_face"] or Decimal("0"),
+        "saldo_total": agg["total_saldo"] or Decimal("0"),
+    }
+
+
+def agregar_totais(qs):
+    """Os cinco totais do dashboard sobre um queryset de ContaCarteira (uma consulta)."""
+    return _totais(qs.aggregate(**_agregados()))
+
+
+async def aagregar_totais(qs):
+    return _totais(await qs.aaggregate(**_agregados()))
+
+
+def _do_lojista(owner):
+    # primário: ver o docstring do módulo
+    return ContaCarteira.objects.using(DEFAULT_DB_ALIAS).filter(owner=owner, is_deleted=False)
+
+
+def totais_do_lojista(owner):
+    """Totais sem filtro das contas não excluídas do lojista, lidos do cache quando possível."""
+    totais = cache.get(_chave(owner.pk))
+    if totais is None:
+        totais = agregar_totais(_do_lojista(owner))
+        cache.set(_chave(owner.pk), totais, CACHE_TIMEOUT)
+    return totais
+
+
+async def atotais_do_lojista(owner):
+    totais = await cache.aget(_chave(owner.pk))
+    if totais is None:
+        totais = await aagregar_totais(_do_lojista(owner))
+        await cache.aset(_chave(owner.pk), totais, CACHE_TIMEOUT)
+    return totais
+
+
+def versao_do_lojista(owner_id):
+    """Muda a cada invalidar_totais do lojista, ou seja, a cada mudança em qualquer conta dele."""
+    return cache.get_or_set(_chave_versao(owner_id), time.time_ns, None)
+
+
+def invalidar_totais(*owner_ids):
+    """Apaga os totais (e o aging do dia) no commit: antes dele, quem recalcular ainda vê os dados antigos."""
+    from .aging import chaves_do_dia
+    chaves = [c for pk in owner_ids if pk for c in [_chave(pk), _chave_versao(pk), *chaves_do_dia(pk)]]
+    if chaves:
+        transaction.on_commit(lambda: cache.delete_many(chaves))
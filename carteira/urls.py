@@ -1,12 +1,18 @@
 # carteira/urls.py
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, views, views_async
 
 app_name = "carteira"
 
+# sob ASGI, as views de leitura mais chamadas têm versão async (carteira/views_async.py)
+leitura = views_async if getattr(settings, "CARTEIRA_VIEWS_ASYNC", False) else views
+
 urlpatterns = [
-    path("", views.dashboard, name="dashboard"),
-    path("clientes/", views.clientes_lista, name="clientes_lista"),
+    path("", leitura.dashboard, name="dashboard"),
+    path("clientes/", leitura.clientes_lista, name="clientes_lista"),
+    path("clientes/importar/", views.importar_clientes, name="importar_clientes"),
+    path("clientes/<int:cliente_id>/extrato/", views.extrato_cliente, name="extrato_cliente"),
     path("nova/", views.nova_conta, name="nova"),
     path("conta/<int:conta_id>/", views.conta_detalhe, name="conta"),
     path("conta/<int:conta_id>/pagar/", views.pagar, name="pagar"),
@@ -15,10 +21,25 @@ urlpatterns = [
     path("conta/<int:conta_id>/excluir/", views.excluir_conta, name="excluir_conta"),
     path("excluidos/", views.excluidos, name="excluidos"),
     path("conta/<int:conta_id>/restaurar/", views.restaurar_conta, name="restaurar_conta"),
-    path("historico/", views.historico, name="historico"),
+    path("historico/", leitura.historico, name="historico"),
+    path("exportar/<str:tipo>/", views.exportar, name="exportar"),
+    path("relatorios/aging/", views.relatorio_aging, name="relatorio_aging"),
+    path("relatorios/graficos/", views.relatorio_graficos, name="relatorio_graficos"),
 
     # API de busca de clientes (NOVO)
-    path("api/clientes/busca/", views.api_clientes_busca, name="api_clientes_busca"),
+    path("api/clientes/busca/", leitura.api_clientes_busca, name="api_clientes_busca"),
+    path("api/contas/pagina/", views.api_contas_pagina, name="api_contas_pagina"),
+    path("api/aging/", views.api_aging, name="api_aging"),
+    path("api/graficos/", views.api_graficos, name="api_graficos"),
+
+    # API JSON para PDV/apps (carteira/api.py)
+    path("api/v1/clientes/", api.clientes, name="api_v1_clientes"),
+    path("api/v1/clientes/<int:cliente_id>/", api.cliente, name="api_v1_cliente"),
+    path("api/v1/contas/", api.contas, name="api_v1_contas"),
+    path("api/v1/contas/<int:conta_id>/", api.conta, name="api_v1_conta"),
+    path("api/v1/contas/<int:conta_id>/pagamentos/", api.pagamentos, name="api_v1_pagamentos"),
+
+    path("metricas/", views.metricas_view, name="metricas"),
 
     #contas testes
     path("teste/", views.seed_contas_fixas, name="seed_contas_fixas"),
@@ -1,4 +1,7 @@
 # carteira/utils.py
+from django.db import transaction
+
+from .audit import registrar
 from .models import AuditLog
 
 def _client_ip(request):
@@ -10,7 +13,7 @@ def _client_ip(request):
 
 def log_event(request, action, descricao, extra=None):
     try:
-        AuditLog.objects.create(
+        evento = AuditLog(
             user=request.user if getattr(request, "user", None) and request.user.is_authenticated else None,
             action=action,
             descricao=descricao,
@@ -20,6 +23,8 @@ def log_event(request, action, descricao, extra=None):
             user_agent=(request.META.get("HTTP_USER_AGENT") or "")[:512],
             extra=extra or {},
         )
+        # gravado em lote fora da request (carteira.audit), só se a transação for confirmada
+        transaction.on_commit(lambda: registrar(evento), robust=True)
     except Exception:
         # não quebrar a aplicação por falha de log
         pass
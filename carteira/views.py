@@ -1,5 +1,5 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.db import transaction
+from django.db import router, transaction
 from django.contrib import messages
 from django.views.decorators.http import require_POST
 from django.db.models import Sum, Case, When, DecimalField, F, Q, ExpressionWrapper
@@ -8,35 +8,52 @@ from .models import Cliente, ContaCarteira, ItemVenda, Pagamento, Empresa, Audit
 from django.utils import timezone
 from .forms import (
     ClienteForm, ContaForm, ItemInlineForm, PagamentoForm,
-    DeleteConfirmForm, RestoreConfirmForm
+    DeleteConfirmForm, RestoreConfirmForm, ImportarClientesForm
 )
 from django.forms import formset_factory
-from datetime import timedelta
+from datetime import date, timedelta
+from io import BytesIO
+from itertools import islice
 from decimal import Decimal
+import os
 import random
 from django.contrib.admin.views.decorators import staff_member_required
-from django.http import JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_GET
 from django.contrib.auth import get_user_model
+from django.template.loader import render_to_string
 from .utils import log_event
+from . import aging, audit, arquivo, confirmacao, exportar as exp, extrato, metricas, recibos, resumo, sugestoes
+from .importar import importar_csv, linhas_por_segundo
+from .pagination import keyset_page
+from .replica import le_da_replica
+from .services import registrar_venda
+from .detalhe import carregar_conta
+from .busca import buscar_clientes
+from .totais import agregar_totais, invalidar_totais, pago_expr, totais_do_lojista
 
 
 # ====== CONSTANTS / HELPERS ======
 User = get_user_model()
 DEC = DecimalField(max_digits=12, decimal_places=2)
 ALLOWED_SORTS = {"id": "id", "nome": "cliente__nome", "vencimento": "vencimento"}
+NULLABLE_SORTS = {"vencimento"}
+SECOES = {"atrasados": "ATRASO", "em_aberto": "EM_ABERTO", "quitados": "PAGO"}
 
 ItemFormSet = formset_factory(ItemInlineForm, extra=1, can_delete=True)
 
 
-def _apply_filters(qs, params):
+def _apply_filters(qs, params, owner):
     q = params.get("q", "").strip()
     status = params.get("status", "").strip()
     venc_ini = params.get("venc_ini", "").strip()
     venc_fim = params.get("venc_fim", "").strip()
 
     if q:
-        qs = qs.filter(Q(cliente__nome__icontains=q) | Q(id__icontains=q))
+        cond = Q(cliente__in=buscar_clientes(owner, q).values("id"))
+        if q.lstrip("#").isdigit():
+            cond |= Q(id=int(q.lstrip("#")))
+        qs = qs.filter(cond)
     if status in {"EM_ABERTO", "PAGO", "ATRASO"}:
         qs = qs.filter(status=status)
     if venc_ini:
@@ -48,50 +65,58 @@ def _apply_filters(qs, params):
 
 def _order_qs(qs, sort_key, direction):
     field = ALLOWED_SORTS.get(sort_key, "id")
-    prefix = "" if direction == "asc" else "-"
+    if field in NULLABLE_SORTS:
+        # NULLs explícitos (ASC primeiro / DESC por último) para o cursor ser igual em qualquer banco
+        primary = F(field).asc(nulls_first=True) if direction == "asc" else F(field).desc(nulls_last=True)
+    else:
+        primary = field if direction == "asc" else f"-{field}"
     # secondary key keeps id deterministic
-    return qs.order_by(f"{prefix}{field}", f"{'-' if direction=='desc' else ''}id")
+    return qs.order_by(primary, "id" if direction == "asc" else "-id")
+
+
+def _secao_pagina(qs, sort_key, direction, cursor=None):
+    """Uma página (keyset) de uma seção do dashboard: {"rows": [...], "next": cursor}."""
+    direction = "asc" if direction == "asc" else "desc"
+    field = ALLOWED_SORTS.get(sort_key, "id")
+    rows, next_cursor = keyset_page(
+        _order_qs(qs, sort_key, direction).select_related("cliente"),
+        field, direction, cursor, nullable=field in NULLABLE_SORTS,
+    )
+    return {"rows": rows, "next": next_cursor}
+
+
+def _dashboard_secoes(qs, sort_key, direction):
+    return {nome: _secao_pagina(qs.filter(status=status), sort_key, direction) for nome, status in SECOES.items()}
 
 
 # ====== VIEWS ======
 @login_required
+@le_da_replica
 def dashboard(request):
     sort_key = request.GET.get("sort", "id").lower()
     direction = request.GET.get("dir", "desc").lower()
 
     base_qs = ContaCarteira.objects.filter(owner=request.user, is_deleted=False)
-    qs = _apply_filters(base_qs, request.GET)
-
-    # pago = total - saldo (independe de status)
-    pago_expr = ExpressionWrapper(F("total") - F("saldo"), output_field=DEC)
-
-    agg = qs.aggregate(
-        total_face=Sum("total", default=Decimal("0.00")),
-        total_saldo=Sum("saldo", default=Decimal("0.00")),
-        total_pago=Sum(pago_expr, default=Decimal("0.00")),
-        total_em_aberto=Sum(
-            Case(When(status="EM_ABERTO", then=F("saldo")),
-                 default=Decimal("0.00"), output_field=DEC),
-            default=Decimal("0.00"),
-        ),
-        total_em_atraso=Sum(
-            Case(When(status="ATRASO", then=F("saldo")),
-                 default=Decimal("0.00"), output_field=DEC),
-            default=Decimal("0.00"),
-        ),
-    )
-    a_receber = (agg["total_em_aberto"] or Decimal("0")) + (agg["total_em_atraso"] or Decimal("0"))
+    qs = _apply_filters(base_qs, request.GET, request.user)
+
+    # sem filtros, os totais do lojista vêm do cache (invalidado a cada mudança nas contas)
+    if any(request.GET.get(k, "").strip() for k in ("q", "status", "venc_ini", "venc_fim")):
+        totais = agregar_totais(qs)
+    else:
+        totais = totais_do_lojista(request.user)
 
-    qs_annot = qs.annotate(pago=pago_expr)
-    atrasados = _order_qs(qs_annot.filter(status="ATRASO"), sort_key, direction).select_related("cliente")
-    em_aberto = _order_qs(qs_annot.filter(status="EM_ABERTO"), sort_key, direction).select_related("cliente")
-    quitados = _order_qs(qs_annot.filter(status="PAGO"), sort_key, direction).select_related("cliente")
+    # só a primeira página de cada seção; o restante vem de api_contas_pagina ao rolar
+    secoes = _dashboard_secoes(qs.annotate(pago=pago_expr), sort_key, direction)
 
     base_params_qd = request.GET.copy()
     base_params_qd.pop("sort", None)
     base_params_qd.pop("dir", None)
     base_params = base_params_qd.urlencode()
 
+    pagina_params_qd = request.GET.copy()
+    pagina_params_qd.pop("cursor", None)
+    pagina_params_qd.pop("secao", None)
+
     def _icon(col):
         return "▲" if request.GET.get("sort")==col and request.GET.get("dir")=="asc" else ("▼" if request.GET.get("sort")==col else "")
 
@@ -102,17 +127,9 @@ def dashboard(request):
 
     context = {
         "q": request.GET.get("q", ""),
-        "atrasados": atrasados,
-        "em_aberto": em_aberto,
-        "quitados": quitados,
-        "totais": {
-            "pago": agg["total_pago"] or Decimal("0"),
-            "a_receber": a_receber,
-            "em_aberto": agg["total_em_aberto"] or Decimal("0"),
-            "em_atraso": agg["total_em_atraso"] or Decimal("0"),
-            "face_value_total": agg["total_face"] or Decimal("0"),
-            "saldo_total": agg["total_saldo"] or Decimal("0"),
-        },
+        **secoes,
+        "pagina_params": pagina_params_qd.urlencode(),
+        "totais": totais,
         "base_params": base_params,
         "sort": {
             "current": request.GET.get("sort","id"),
@@ -126,6 +143,8 @@ def dashboard(request):
         "item_formset": ItemFormSet(prefix="itens"),
         # IMPORTANTE para o modal Excluir Conta (evita erro de campos vazios)
         "del_form": DeleteConfirmForm(),
+        "confirmado": confirmacao.recente(request),
+        "sugestoes_ttl": sugestoes.ttl(),
     }
     return render(request, "carteira/dashboard.html", context)
 
@@ -134,30 +153,39 @@ def dashboard(request):
 @require_GET
 def api_clientes_busca(request):
     """
-    Retorna até 10 clientes do usuário logado cujo nome contenha o termo informado.
+    Retorna até 10 clientes do usuário logado com alguma palavra do nome, CPF, telefone
+    ou e-mail começando pelo termo informado (sem diferenciar acentos/maiúsculas).
     Usado no autocomplete do modal de Nova Conta.
     """
     termo = request.GET.get("q", "").strip()
     if len(termo) < 2:
         return JsonResponse({"results": []})
 
-    qs = (
-        Cliente.objects
-        .filter(owner=request.user, nome__icontains=termo)
-        .order_by("nome")[:10]
-    )
+    # LRU por lojista: tecla a tecla, a maioria das consultas não chega ao banco
+    return JsonResponse({"results": sugestoes.sugerir(request.user, termo)})
 
-    data = []
-    for c in qs:
-        data.append({
-            "id": c.id,
-            "nome": c.nome,
-            "cpf": c.cpf or "",
-            "telefone": c.telefone or "",
-            "email": c.email or "",
-            "endereco": c.endereco or "",
-        })
-    return JsonResponse({"results": data})
+
+@login_required
+@require_GET
+@le_da_replica
+def api_contas_pagina(request):
+    """
+    Próxima página (keyset) de uma seção do dashboard, com os mesmos filtros e ordenação.
+    Usado no carregamento incremental (scroll) das tabelas.
+    """
+    status = SECOES.get(request.GET.get("secao", ""))
+    if status is None:
+        return JsonResponse({"error": "secao inválida"}, status=400)
+
+    qs = _apply_filters(ContaCarteira.objects.filter(owner=request.user, is_deleted=False), request.GET, request.user)
+    pagina = _secao_pagina(
+        qs.filter(status=status),
+        request.GET.get("sort", "id").lower(),
+        request.GET.get("dir", "desc").lower(),
+        request.GET.get("cursor"),
+    )
+    html = render_to_string("carteira/_conta_linhas.html", {"contas": pagina["rows"]}, request=request)
+    return JsonResponse({"html": html, "count": len(pagina["rows"]), "next": pagina["next"]})
 
 
 def _get_conta_or_404(user, conta_id, include_deleted=False):
@@ -167,20 +195,107 @@ def _get_conta_or_404(user, conta_id, include_deleted=False):
     return get_object_or_404(qs, pk=conta_id)
 
 
+# ====== RELATÓRIOS ======
+def _aging_json(linha):
+    return {
+        "faixas": {k: str(v) for k, v in linha["faixas"].items()},
+        "total": str(linha["total"]),
+        "contas": linha["contas"],
+    }
+
+
 @login_required
+@require_GET
+@le_da_replica
+def relatorio_aging(request):
+    """Saldo em aberto por faixa de atraso: total do lojista e os clientes de maior saldo."""
+    return render(request, "carteira/aging.html", {
+        "faixas": aging.FAIXAS,
+        "resumo": aging.aging_do_lojista(request.user),
+        "clientes": aging.aging_do_lojista(request.user, por_cliente=True),
+        "hoje": timezone.localdate(),
+    })
+
+
+@login_required
+@require_GET
+@le_da_replica
+def api_aging(request):
+    """
+    Aging em JSON. ?cliente=<id>: só esse cliente (calculado na hora);
+    ?por_cliente=1: os clientes de maior saldo, cada um com suas faixas.
+    """
+    cliente = request.GET.get("cliente", "").strip()
+    if cliente:
+        if not cliente.isdigit():
+            return JsonResponse({"error": "cliente inválido"}, status=400)
+        return JsonResponse(_aging_json(aging.calcular(request.user, cliente_id=int(cliente))))
+    if request.GET.get("por_cliente"):
+        linhas = aging.aging_do_lojista(request.user, por_cliente=True)
+        return JsonResponse({"results": [
+            {"cliente_id": l["cliente_id"], "cliente": l["cliente"], **_aging_json(l)} for l in linhas
+        ]})
+    return JsonResponse(_aging_json(aging.aging_do_lojista(request.user)))
+
+
+def _serie_graficos(user, params):
+    """Série do resumo diário: dias do mês (?ano=&mes=) ou meses do ano (?periodo=ano&ano=), com zeros."""
+    hoje = timezone.localdate()
+    try:
+        ano = int(params.get("ano") or hoje.year)
+        mes = int(params.get("mes") or hoje.month)
+        date(ano, mes, 1)
+    except ValueError:
+        ano, mes = hoje.year, hoje.month
+    if params.get("periodo") == "ano":
+        pontos = {d: (v, r, n) for d, v, r, n in resumo.serie_mensal(user, date(ano, 1, 1), date(ano, 12, 31))}
+        chaves = [date(ano, m, 1) for m in range(1, 13)]
+        rotulos = [f"{d:%m/%Y}" for d in chaves]
+    else:
+        inicio = date(ano, mes, 1)
+        fim = (inicio + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        pontos = {d: (v, r, n) for d, v, r, n in resumo.serie_diaria(user, inicio, fim)}
+        chaves = [inicio + timedelta(days=i) for i in range(fim.day)]
+        rotulos = [f"{d:%d/%m}" for d in chaves]
+    vazio = (Decimal("0"), Decimal("0"), 0)
+    centavos = Decimal("0.01")
+    return {
+        "periodo": "ano" if params.get("periodo") == "ano" else "mes",
+        "ano": ano,
+        "mes": mes,
+        "labels": rotulos,
+        "vendas": [str(pontos.get(d, vazio)[0].quantize(centavos)) for d in chaves],
+        "recebido": [str(pontos.get(d, vazio)[1].quantize(centavos)) for d in chaves],
+        "n_pagamentos": [pontos.get(d, vazio)[2] for d in chaves],
+    }
+
+
+@login_required
+@require_GET
+@le_da_replica
+def relatorio_graficos(request):
+    return render(request, "carteira/graficos.html", {"hoje": timezone.localdate()})
+
+
+@login_required
+@require_GET
+@le_da_replica
+def api_graficos(request):
+    """
+    Vendas e recebimentos por dia do mês (padrão) ou por mês do ano (?periodo=ano), lidos do
+    resumo diário (carteira.resumo) — no máximo 31 linhas por mês e 365 por ano.
+    """
+    return JsonResponse(_serie_graficos(request.user, request.GET))
+
+
+@login_required
+@le_da_replica
 def clientes_lista(request):
     user = request.user
 
-    qs = Cliente.objects.filter(owner=user)  # só clientes do usuário logado
-
     q = request.GET.get("q", "").strip()
-    if q:
-        qs = qs.filter(
-            Q(nome__icontains=q) |
-            Q(cpf__icontains=q) |
-            Q(telefone__icontains=q) |
-            Q(email__icontains=q)
-        )
+    # só clientes do usuário logado; com termo, usa o índice de busca (nome, CPF, telefone, e-mail)
+    qs = buscar_clientes(user, q) if q else Cliente.objects.filter(owner=user)
 
     qs = qs.order_by("nome")
 
@@ -192,6 +307,147 @@ def clientes_lista(request):
     return render(request, "carteira/clientes_lista.html", context)
 
 
+EXTRATO_MAX_LINHAS = 500
+
+
+def _data_param(params, nome):
+    try:
+        d = date.fromisoformat(params.get(nome, "").strip())
+    except ValueError:
+        return None
+    return d if 1900 <= d.year <= 2100 else None
+
+
+@login_required
+@require_GET
+@le_da_replica
+def extrato_cliente(request, cliente_id):
+    """
+    Extrato do cliente por período (?de=AAAA-MM-DD&ate=AAAA-MM-DD; padrão: mês corrente),
+    com saldo corrente. ?formato=csv exporta o período em streaming (sem ?de/?ate: tudo).
+    """
+    cliente = get_object_or_404(Cliente, owner=request.user, pk=cliente_id)
+    de, ate = _data_param(request.GET, "de"), _data_param(request.GET, "ate")
+
+    if request.GET.get("formato") == "csv":
+        linhas = extrato.extrato(
+            request.user, cliente.id, de, ate,
+            saldo_inicial=extrato.saldo_anterior(request.user, cliente.id, de), using=router.db_for_read(Pagamento),
+        )
+        resp = StreamingHttpResponse(exp.stream_csv(extrato.linhas_csv(linhas)), content_type="text/csv; charset=utf-8")
+        resp["Content-Disposition"] = f'attachment; filename="extrato-{cliente.id}-{timezone.localdate():%Y%m%d}.csv"'
+        log_event(request, "outro", f"Exportação do extrato de {cliente.nome}")
+        return resp
+
+    if de is None and ate is None:
+        de = timezone.localdate().replace(day=1)
+    if de and ate and ate < de:
+        de, ate = ate, de
+    inicio_mes = (de or ate or timezone.localdate()).replace(day=1)
+    mes_anterior = (inicio_mes - timedelta(days=1)).replace(day=1)
+    proximo_mes = (inicio_mes + timedelta(days=32)).replace(day=1)
+
+    saldo_inicial = extrato.saldo_anterior(request.user, cliente.id, de)
+    linhas = list(islice(extrato.extrato(request.user, cliente.id, de, ate, saldo_inicial), EXTRATO_MAX_LINHAS + 1))
+    truncado = len(linhas) > EXTRATO_MAX_LINHAS
+    linhas = linhas[:EXTRATO_MAX_LINHAS]
+    saldo_final = extrato.saldo_ate(request.user, cliente.id, ate)
+
+    return render(request, "carteira/extrato.html", {
+        "cliente": cliente,
+        "linhas": linhas,
+        "truncado": truncado,
+        "max_linhas": EXTRATO_MAX_LINHAS,
+        "de": de,
+        "ate": ate,
+        "saldo_inicial": saldo_inicial,
+        "saldo_final": saldo_final,
+        "mes_anterior": mes_anterior,
+        "fim_mes_anterior": inicio_mes - timedelta(days=1),
+        "proximo_mes": proximo_mes,
+        "fim_proximo_mes": (proximo_mes + timedelta(days=32)).replace(day=1) - timedelta(days=1),
+    })
+
+
+@login_required
+@require_GET
+@le_da_replica
+def exportar(request, tipo):
+    """
+    Exporta contas, itens, pagamentos ou clientes do lojista em CSV (padrão) ou XLSX (?formato=xlsx),
+    com os mesmos filtros do dashboard (clientes: só a busca ?q=). A resposta é gerada em streaming.
+    """
+    if tipo not in exp.EXPORTACOES:
+        raise Http404
+    user = request.user
+    formato = request.GET.get("formato", "csv").lower()
+
+    if tipo == "clientes":
+        q = request.GET.get("q", "").strip()
+        qs = buscar_clientes(user, q) if q else Cliente.objects.filter(owner=user)
+    else:
+        contas = _apply_filters(ContaCarteira.objects.filter(owner=user, is_deleted=False), request.GET, user)
+        if tipo == "contas":
+            qs = contas
+        elif tipo == "itens":
+            qs = ItemVenda.objects.filter(owner=user, conta__in=contas.values("id"))
+        else:
+            qs = Pagamento.objects.filter(owner=user, conta__in=contas.values("id"))
+
+    # o corpo é gerado depois que a view retorna: fixa o banco de leitura escolhido agora
+    linhas = exp.linhas(tipo, qs.using(qs.db))
+    nome = f"{tipo}-{timezone.localdate():%Y%m%d}"
+    if formato == "xlsx":
+        resp = StreamingHttpResponse(
+            exp.stream_xlsx(linhas, nome_planilha=tipo.capitalize()),
+            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
+        nome += ".xlsx"
+    else:
+        resp = StreamingHttpResponse(exp.stream_csv(linhas), content_type="text/csv; charset=utf-8")
+        nome += ".csv"
+    resp["Content-Disposition"] = f'attachment; filename="{nome}"'
+    log_event(request, "outro", f"Exportação de {tipo} ({formato})")
+    return resp
+
+
+@login_required
+def importar_clientes(request):
+    """Upload de CSV com clientes e contas em aberto (formato em carteira.importar)."""
+    resultado = None
+    form = ImportarClientesForm(request.POST or None, request.FILES or None)
+    if request.method == "POST" and form.is_valid():
+        try:
+            resultado = importar_csv(request.user, form.cleaned_data["arquivo"])
+        except (ValueError, UnicodeDecodeError) as e:
+            messages.error(request, f"Não foi possível ler o arquivo: {e}")
+        else:
+            messages.success(
+                request,
+                f"{resultado['linhas']} linha(s) lida(s): {resultado['clientes_criados']} cliente(s) e "
+                f"{resultado['contas_criadas']} conta(s) criados em {resultado['segundos']:.1f} s.",
+            )
+            log_event(
+                request,
+                action="outro",
+                descricao=f"Usuário {request.user}: Importou {resultado['clientes_criados']} cliente(s) e "
+                          f"{resultado['contas_criadas']} conta(s) via CSV",
+                extra={k: v for k, v in resultado.items() if k != "erros"},
+            )
+    return render(request, "carteira/importar.html", {
+        "form": form,
+        "resultado": resultado,
+        "linhas_por_segundo": linhas_por_segundo(resultado) if resultado else 0,
+    })
+
+
+def _itens_do_formset(formset):
+    return [
+        form.cleaned_data for form in formset
+        if form.cleaned_data and not form.cleaned_data.get("DELETE")
+    ]
+
+
 @login_required
 @transaction.atomic
 def nova_conta(request):
@@ -211,24 +467,9 @@ def nova_conta(request):
         if conta_form.is_valid() and formset.is_valid():
             cliente = get_object_or_404(Cliente, pk=cliente_id, owner=request.user)
 
-            conta = ContaCarteira.objects.create(
-                owner=request.user,
-                cliente=cliente,
-                vencimento=conta_form.cleaned_data.get("vencimento"),
+            conta = registrar_venda(
+                request.user, cliente, conta_form.cleaned_data.get("vencimento"), _itens_do_formset(formset),
             )
-
-            for form in formset:
-                cd = form.cleaned_data
-                if not cd or cd.get("DELETE"):
-                    continue
-                ItemVenda.objects.create(
-                    conta=conta,
-                    produto=cd["produto"],
-                    quantidade=cd["quantidade"],
-                    valor_unit=cd["valor_unit"],
-                )
-
-            conta.atualizar_totais()
             messages.success(request, f"Conta #{conta.id} criada para {cliente.nome}.")
             log_event(
                 request,
@@ -248,24 +489,9 @@ def nova_conta(request):
             cliente.owner = request.user        # define o dono
             cliente.save()
 
-            conta = ContaCarteira.objects.create(
-                owner=request.user,
-                cliente=cliente,
-                vencimento=conta_form.cleaned_data.get("vencimento"),
+            conta = registrar_venda(
+                request.user, cliente, conta_form.cleaned_data.get("vencimento"), _itens_do_formset(formset),
             )
-
-            for form in formset:
-                cd = form.cleaned_data
-                if not cd or cd.get("DELETE"):
-                    continue
-                ItemVenda.objects.create(
-                    conta=conta,
-                    produto=cd["produto"],
-                    quantidade=cd["quantidade"],
-                    valor_unit=cd["valor_unit"],
-                )
-
-            conta.atualizar_totais()
             messages.success(request, f"Conta #{conta.id} criada para {cliente.nome}.")
             log_event(
                 request,
@@ -278,27 +504,25 @@ def nova_conta(request):
             messages.error(request, "Corrija os dados do cliente e da conta.")
 
     # ====== Se chegou aqui, teve erro → re-renderiza dashboard com modal aberto ======
-    base = ContaCarteira.objects.filter(owner=request.user, is_deleted=False).select_related("cliente")
-    atrasados = base.filter(status="ATRASO")
-    em_aberto = base.filter(status="EM_ABERTO")
-    quitados = base.filter(status="PAGO")
+    base = ContaCarteira.objects.filter(owner=request.user, is_deleted=False)
 
     return render(request, "carteira/dashboard.html", {
         "q": request.GET.get("q", "").strip(),
-        "atrasados": atrasados.order_by("vencimento", "id"),
-        "em_aberto": em_aberto.order_by("vencimento", "id"),
-        "quitados": quitados.order_by("vencimento", "id"),
+        **_dashboard_secoes(base, "vencimento", "asc"),
+        "pagina_params": "sort=vencimento&dir=asc",
         "cliente_form": cform or ClienteForm(),
         "conta_form": conta_form,
         "item_formset": formset,
         "del_form": DeleteConfirmForm(),
+        "confirmado": confirmacao.recente(request),
+        "sugestoes_ttl": sugestoes.ttl(),
         "open_modal": True,
     })
 
 
 @login_required
 def conta_detalhe(request, conta_id):
-    conta = _get_conta_or_404(request.user, conta_id)
+    conta = carregar_conta(request.user, conta_id)
     pgform = PagamentoForm()
     del_form = DeleteConfirmForm()
     return render(request, "carteira/conta_detalhe.html", {"conta": conta, "pgform": pgform, "del_form": del_form})
@@ -334,25 +558,34 @@ def pagar(request, conta_id):
 
 @login_required
 def recibo_conta(request, conta_id):
-    conta = _get_conta_or_404(request.user, conta_id)
-    empresa = getattr(request.user, "empresa", None)
+    # HTML/PDF prontos por versão da conta (carteira.recibos): reimprimir não re-renderiza
+    if request.GET.get("formato") == "pdf":
+        pdf = recibos.pdf_recibo_conta(request.user, conta_id)
+        resp = FileResponse(BytesIO(pdf), content_type="application/pdf", filename=f"recibo-conta-{conta_id}.pdf")
+    else:
+        resp = HttpResponse(recibos.html_recibo_conta(request, conta_id))
     from .utils import log_event
-    log_event(request, action="conta_recibo", descricao=f"Usuário {request.user}: Acessou recibo da conta #{conta.id}", extra={"conta_id": conta.id})
+    log_event(request, action="conta_recibo", descricao=f"Usuário {request.user}: Acessou recibo da conta #{conta_id}", extra={"conta_id": conta_id})
     if request.GET.get("print"):
-        log_event(request, action="conta_recibo_print", descricao=f"Usuário {request.user}: Imprimiu recibo da conta #{conta.id}", extra={"conta_id": conta.id})
-    return render(request, "carteira/recibo_conta.html", {"conta": conta, "empresa": empresa})
+        log_event(request, action="conta_recibo_print", descricao=f"Usuário {request.user}: Imprimiu recibo da conta #{conta_id}", extra={"conta_id": conta_id})
+    return resp
 
 @login_required
 def recibo_pagamento(request, pagamento_id):
-    pg = get_object_or_404(Pagamento.objects.select_related("conta", "conta__cliente"), pk=pagamento_id)
-    empresa = getattr(request.user, "empresa", None)
-    if pg.conta.owner_id != request.user.id:
+    # o dono faz parte da consulta: pagamento de outro lojista (ou inexistente) volta ao dashboard
+    versao = recibos.versao_do_pagamento(request.user, pagamento_id)
+    if versao is None:
         return redirect("carteira:dashboard")
+    if request.GET.get("formato") == "pdf":
+        pdf = recibos.pdf_recibo_pagamento(request.user, pagamento_id, versao)
+        resp = FileResponse(BytesIO(pdf), content_type="application/pdf", filename=f"recibo-pagamento-{pagamento_id}.pdf")
+    else:
+        resp = HttpResponse(recibos.html_recibo_pagamento(request, pagamento_id, versao))
     from .utils import log_event
-    log_event(request, action="pgto_recibo", descricao=f"Usuário {request.user}: Acessou recibo do pagamento #{pg.id} (conta #{pg.conta_id})", extra={"pagamento_id": pg.id, "conta_id": pg.conta_id})
+    log_event(request, action="pgto_recibo", descricao=f"Usuário {request.user}: Acessou recibo do pagamento #{pagamento_id}", extra={"pagamento_id": pagamento_id})
     if request.GET.get("print"):
-        log_event(request, action="pgto_recibo_print", descricao=f"Usuário {request.user}: Imprimiu recibo do pagamento #{pg.id} (conta #{pg.conta_id})", extra={"pagamento_id": pg.id, "conta_id": pg.conta_id})
-    return render(request, "carteira/recibo_pagamento.html", {"pg": pg, "empresa": empresa})
+        log_event(request, action="pgto_recibo_print", descricao=f"Usuário {request.user}: Imprimiu recibo do pagamento #{pagamento_id}", extra={"pagamento_id": pagamento_id})
+    return resp
 
 @require_POST
 @login_required
@@ -368,7 +601,7 @@ def excluir_conta(request, conta_id):
     motivo = form.cleaned_data["motivo"].strip()
     senha = form.cleaned_data["senha"]
 
-    if not request.user.check_password(senha):
+    if not confirmacao.confirmar(request, senha):
         messages.error(request, "Senha incorreta. Exclusão não realizada.")
         return redirect(request.META.get("HTTP_REFERER") or "carteira:conta", conta_id=conta.id)
 
@@ -377,6 +610,8 @@ def excluir_conta(request, conta_id):
     conta.deleted_reason = motivo
     conta.deleted_by = request.user
     conta.save(update_fields=["is_deleted", "deleted_at", "deleted_reason", "deleted_by"])
+    resumo.aplicar_conta(conta, -1)
+    invalidar_totais(conta.owner_id)
 
     from .utils import log_event
     log_event(request, action="conta_excluir", descricao=f"Usuário {request.user}: Excluiu conta #{conta.id} de {conta.cliente.nome} (motivo: {motivo})", extra={"conta_id": conta.id, "motivo": motivo})
@@ -386,13 +621,14 @@ def excluir_conta(request, conta_id):
     return redirect("carteira:dashboard")
 
 @login_required
+@le_da_replica
 def excluidos(request):
     q = request.GET.get("q", "").strip()
     base = ContaCarteira.objects.filter(owner=request.user, is_deleted=True).select_related("cliente")
     if q:
-        base = base.filter(cliente__nome__icontains=q)
+        base = base.filter(cliente__in=buscar_clientes(request.user, q).values("id"))
     contas = base.order_by("-deleted_at", "-id")
-    return render(request, "carteira/excluidos.html", {"q": q, "contas": contas})
+    return render(request, "carteira/excluidos.html", {"q": q, "contas": contas, "confirmado": confirmacao.recente(request)})
 
 @login_required
 @transaction.atomic
@@ -411,7 +647,7 @@ def restaurar_conta(request, conta_id):
             return redirect("carteira:excluidos")
 
         senha = form.cleaned_data["senha"]
-        if not request.user.check_password(senha):
+        if not confirmacao.confirmar(request, senha):
             messages.error(request, "Senha incorreta. A restauração não foi realizada.")
             return redirect("carteira:excluidos")
 
@@ -420,6 +656,8 @@ def restaurar_conta(request, conta_id):
         conta.deleted_reason = ""
         conta.deleted_by = None
         conta.save(update_fields=["is_deleted", "deleted_at", "deleted_reason", "deleted_by"])
+        resumo.aplicar_conta(conta, 1)
+        invalidar_totais(conta.owner_id)
 
         from .utils import log_event
         log_event(request, action="conta_restaurar", descricao=f"Usuário {request.user}: Restaurou conta #{conta.id} de {conta.cliente.nome}", extra={"conta_id": conta.id})
@@ -430,13 +668,36 @@ def restaurar_conta(request, conta_id):
     return redirect("carteira:excluidos")
 
 @login_required
+@le_da_replica
 def historico(request):
+    # grava o que ainda está na fila deste processo para o histórico já mostrar as últimas ações
+    audit.flush()
     q = request.GET.get("q", "").strip()
-    base = AuditLog.objects.filter(user=request.user)
-    if q:
-        base = base.filter(descricao__icontains=q)
-    logs = base.order_by("-created_at", "-id")[:500]
-    return render(request, "carteira/historico.html", {"logs": logs, "q": q})
+    mes = request.GET.get("mes", "").strip()
+    meses_arquivados = arquivo.meses_arquivados()
+    if mes in meses_arquivados:
+        # mês já fora da tabela: lido sob demanda do arquivo em disco
+        logs = arquivo.ler_mes(mes, user_id=request.user.id, q=q, limite=500)
+    else:
+        mes = ""
+        base = AuditLog.objects.filter(user=request.user)
+        if q:
+            base = base.filter(descricao__icontains=q)
+        logs = base.order_by("-created_at", "-id")[:500]
+    return render(request, "carteira/historico.html", {
+        "logs": logs, "q": q, "mes": mes, "meses_arquivados": meses_arquivados,
+    })
+
+# ====== MÉTRICAS (apenas staff) ======
+@staff_member_required
+def metricas_view(request):
+    """
+    p50/p95/p99 de queries, SQL, template e latência por rota, coletados pelo MetricasMiddleware
+    neste processo. POST zera os histogramas.
+    """
+    if request.method == "POST":
+        metricas.zerar()
+    return JsonResponse({"pid": os.getpid(), "rotas": metricas.relatorio()}, json_dumps_params={"indent": 2})
 
 # ====== SEED (apenas staff) ======
 @staff_member_required
@@ -458,7 +719,7 @@ def seed_contas_fixas(request):
         clientes = []
         for i in range(qtd):
             nome = f"{prefixo} {i+1:02d}"
-            c, _ = Cliente.objects.get_or_create(nome=nome)
+            c, _ = Cliente.objects.get_or_create(owner=request.user, nome=nome)
             clientes.append(c)
             # Caso seu Cliente exija campos extras, ajuste aqui.
         return clientes
@@ -477,7 +738,7 @@ def seed_contas_fixas(request):
         venc = hoje - timedelta(days=random.randint(1, 90))
         objs.append(ContaCarteira(
             owner=request.user, cliente=clientes_pago[i % len(clientes_pago)],
-            criado_em=criado_em, vencimento=venc, total=total, saldo=Decimal("0.00"), status="PAGO",
+            criado_em=criado_em, vencimento=venc, total=total, total_pago=total, saldo=Decimal("0.00"), status="PAGO",
         ))
     created = ContaCarteira.objects.bulk_create(objs, batch_size=200)
     criadas["PAGO"] = [c.id for c in created]
@@ -490,7 +751,7 @@ def seed_contas_fixas(request):
         venc = hoje - timedelta(days=random.randint(1, 60))
         objs.append(ContaCarteira(
             owner=request.user, cliente=clientes_atraso[i % len(clientes_atraso)],
-            criado_em=criado_em, vencimento=venc, total=total, saldo=total, status="ATRASO",
+            criado_em=criado_em, vencimento=venc, total=total, total_pago=Decimal("0.00"), saldo=total, status="ATRASO",
         ))
     created = ContaCarteira.objects.bulk_create(objs, batch_size=200)
     criadas["ATRASO"] = [c.id for c in created]
@@ -503,9 +764,13 @@ def seed_contas_fixas(request):
         venc = hoje + timedelta(days=random.randint(1, 180))
         objs.append(ContaCarteira(
             owner=request.user, cliente=clientes_aberto[i % len(clientes_aberto)],
-            criado_em=criado_em, vencimento=venc, total=total, saldo=total, status="EM_ABERTO",
+            criado_em=criado_em, vencimento=venc, total=total, total_pago=Decimal("0.00"), saldo=total, status="EM_ABERTO",
         ))
     created = ContaCarteira.objects.bulk_create(objs, batch_size=200)
     criadas["EM_ABERTO"] = [c.id for c in created]
 
+    # bulk_create não dispara os sinais: totais (cache) e resumo diário do lojista refeitos aqui
+    invalidar_totais(request.user.pk)
+    resumo.reconstruir([request.user.pk])
+
     return redirect("carteira:dashboard")
\ No newline at end of file
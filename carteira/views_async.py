@@ -0,0 +1,166 @@
+# carteira/views_async.py
+"""
+Versões async (ASGI) das views de leitura mais chamadas: dashboard, lista de clientes,
+histórico e o autocomplete de clientes (uma chamada por tecla digitada no modal de Nova Conta).
+
+Mesmas URLs, templates e respostas de carteira.views; ligadas no lugar das síncronas com
+CARTEIRA_VIEWS_ASYNC = True (ver carteira/urls.py) quando o projeto roda sob ASGI
+(fiado_pro.asgi, com uvicorn/daphne/hypercorn). Sob WSGI as síncronas são melhores: o Django
+rodaria cada view async num event loop próprio, por request.
+
+Regras para continuar async de ponta a ponta:
+- o usuário vem de `await request.auser()` (o `request.user` preguiçoso consultaria o banco
+  de forma síncrona) e é devolvido em `request.user` para os templates;
+- todo queryset é consumido aqui (aiterator/aaggregate) antes do render: o template
+  não pode disparar consulta;
+- o que só existe síncrono (fila de auditoria, arquivos .jsonl.gz) vai por sync_to_async;
+- middlewares precisam aceitar async (o ReplicaMiddleware aceita; o MetricasMiddleware é
+  só síncrono e, se ligado, faz o Django adaptar a cadeia de volta para uma thread por request).
+
+Comparação de vazão WSGI x ASGI: comando `bench_async`.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import render
+from django.views.decorators.http import require_GET
+
+from . import arquivo, audit, confirmacao, sugestoes
+from .busca import ausa_trigram, buscar_clientes
+from .forms import ClienteForm, ContaForm, DeleteConfirmForm
+from .models import AuditLog, Cliente, ContaCarteira
+from .pagination import akeyset_page
+from .replica import le_da_replica
+from .totais import aagregar_totais, atotais_do_lojista, pago_expr
+from .views import ALLOWED_SORTS, NULLABLE_SORTS, SECOES, ItemFormSet, _apply_filters, _order_qs
+
+FILTROS = ("q", "status", "venc_ini", "venc_fim")
+
+
+async def _usuario(request):
+    user = await request.auser()
+    request.user = user
+    return user
+
+
+async def _secao_pagina(qs, sort_key, direction, cursor=None):
+    direction = "asc" if direction == "asc" else "desc"
+    field = ALLOWED_SORTS.get(sort_key, "id")
+    rows, next_cursor = await akeyset_page(
+        _order_qs(qs, sort_key, direction).select_related("cliente"),
+        field, direction, cursor, nullable=field in NULLABLE_SORTS,
+    )
+    return {"rows": rows, "next": next_cursor}
+
+
+# ====== VIEWS ======
+@login_required
+@le_da_replica
+async def dashboard(request):
+    user = await _usuario(request)
+    sort_key = request.GET.get("sort", "id").lower()
+    direction = request.GET.get("dir", "desc").lower()
+
+    base_qs = ContaCarteira.objects.filter(owner=user, is_deleted=False)
+    await ausa_trigram()  # depois disso a montagem da busca não consulta o banco
+    qs = _apply_filters(base_qs, request.GET, user)
+
+    if any(request.GET.get(k, "").strip() for k in FILTROS):
+        totais = await aagregar_totais(qs)
+    else:
+        totais = await atotais_do_lojista(user)
+
+    anotado = qs.annotate(pago=pago_expr)
+    secoes = {
+        nome: await _secao_pagina(anotado.filter(status=status), sort_key, direction)
+        for nome, status in SECOES.items()
+    }
+
+    base_params_qd = request.GET.copy()
+    base_params_qd.pop("sort", None)
+    base_params_qd.pop("dir", None)
+
+    pagina_params_qd = request.GET.copy()
+    pagina_params_qd.pop("cursor", None)
+    pagina_params_qd.pop("secao", None)
+
+    def _icon(col):
+        return "▲" if request.GET.get("sort")==col and request.GET.get("dir")=="asc" else ("▼" if request.GET.get("sort")==col else "")
+
+    def _next(col):
+        cur = request.GET.get("sort")
+        d = request.GET.get("dir","desc")
+        return "asc" if cur==col and d=="desc" else "desc"
+
+    context = {
+        "q": request.GET.get("q", ""),
+        **secoes,
+        "pagina_params": pagina_params_qd.urlencode(),
+        "totais": totais,
+        "base_params": base_params_qd.urlencode(),
+        "sort": {
+            "current": request.GET.get("sort","id"),
+            "dir": request.GET.get("dir","desc"),
+            "icon": {"id": _icon("id"), "nome": _icon("nome"), "vencimento": _icon("vencimento")},
+            "next": {"id": _next("id"), "nome": _next("nome"), "vencimento": _next("vencimento")},
+        },
+        "cliente_form": ClienteForm(),
+        "conta_form": ContaForm(),
+        "item_formset": ItemFormSet(prefix="itens"),
+        "del_form": DeleteConfirmForm(),
+        "confirmado": confirmacao.recente(request),
+        "sugestoes_ttl": sugestoes.ttl(),
+    }
+    return render(request, "carteira/dashboard.html", context)
+
+
+@login_required
+@require_GET
+async def api_clientes_busca(request):
+    """Autocomplete de clientes (ver views.api_clientes_busca)."""
+    user = await _usuario(request)
+    termo = request.GET.get("q", "").strip()
+    if len(termo) < 2:
+        return JsonResponse({"results": []})
+
+    return JsonResponse({"results": await sugestoes.asugerir(user, termo)})
+
+
+@login_required
+@le_da_replica
+async def clientes_lista(request):
+    user = await _usuario(request)
+    q = request.GET.get("q", "").strip()
+    await ausa_trigram()
+    qs = buscar_clientes(user, q) if q else Cliente.objects.filter(owner=user)
+    qs = qs.order_by("nome")
+
+    clientes = [c async for c in qs.aiterator(chunk_size=2000)]
+    context = {
+        "clientes": clientes,
+        "q": q,
+        "total_clientes": len(clientes),
+    }
+    return render(request, "carteira/clientes_lista.html", context)
+
+
+@login_required
+@le_da_replica
+async def historico(request):
+    user = await _usuario(request)
+    # grava o que ainda está na fila deste processo para o histórico já mostrar as últimas ações
+    await sync_to_async(audit.flush)()
+    q = request.GET.get("q", "").strip()
+    mes = request.GET.get("mes", "").strip()
+    meses_arquivados = await sync_to_async(arquivo.meses_arquivados)()
+    if mes in meses_arquivados:
+        logs = await sync_to_async(arquivo.ler_mes)(mes, user_id=user.id, q=q, limite=500)
+    else:
+        mes = ""
+        base = AuditLog.objects.filter(user=user)
+        if q:
+            base = base.filter(descricao__icontains=q)
+        logs = [log async for log in base.order_by("-created_at", "-id")[:500].aiterator()]
+    return render(request, "carteira/historico.html", {
+        "logs": logs, "q": q, "mes": mes, "meses_arquivados": meses_arquivados,
+    })
@@ -1,22 +1,79 @@
 
 # fiado_pro/auth_backends.py
-from django.contrib.auth.backends import ModelBackend
+"""
+Login por e-mail ou username (sem diferenciar maiúsculas) numa única consulta.
+
+A busca compara LOWER(email) e LOWER(username) com o identificador já em minúsculas:
+são as mesmas expressões dos índices funcionais criados pela migração
+carteira/0020_auth_user_lower_idx, então o banco resolve pelo índice em vez de varrer
+auth_user (o `__iexact` de antes não usava índice nenhum e rodava até duas vezes).
+Se o identificador for e-mail de um usuário e username de outro, vale o e-mail.
+
+Identificadores inexistentes ficam um tempo no cache (CARTEIRA_LOGIN_FALHA_CACHE_SEGUNDOS,
+60 s; 0 desliga): tentativas repetidas com contas que não existem — o grosso de um ataque de
+credential stuffing — não chegam ao banco. A marca é apagada quando um usuário com aquele
+e-mail/username é salvo (sinal em carteira/models.py). Senha errada não é guardada.
+"""
+import hashlib
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Lower
 
 User = get_user_model()
 
+
+def _falha_segundos():
+    return getattr(settings, "CARTEIRA_LOGIN_FALHA_CACHE_SEGUNDOS", 60)
+
+
+def _chave_falha(identificador):
+    digest = hashlib.sha256(identificador.encode()).hexdigest()
+    return f"fiado_pro:login:inexistente:{digest}"
+
+
+def esquecer_falhas(*identificadores):
+    """Tira do cache de inexistentes (ex.: usuário criado ou renomeado)."""
+    chaves = [_chave_falha(i.strip().lower()) for i in identificadores if i]
+    if chaves:
+        cache.delete_many(chaves)
+
+
+def buscar_usuario(identificador):
+    """Usuário cujo e-mail (preferido) ou username é `identificador`, ignorando maiúsculas; 1 consulta."""
+    chave = identificador.strip().lower()
+    if not chave:
+        return None
+    return (
+        User.objects.alias(email_lower=Lower("email"), username_lower=Lower("username"))
+        .filter(Q(email_lower=chave) | Q(username_lower=chave))
+        .alias(por_email=Case(When(email_lower=chave, then=Value(0)), default=Value(1), output_field=IntegerField()))
+        .order_by("por_email", "pk")
+        .first()
+    )
+
+
 class EmailOrUsernameBackend(ModelBackend):
     """Authenticate using either username or email field."""
     def authenticate(self, request, username=None, password=None, **kwargs):
         if username is None:
             username = kwargs.get(User.USERNAME_FIELD)
+        if not username or password is None:
+            return None
+        segundos = _falha_segundos()
+        chave = _chave_falha(username.strip().lower())
         try:
-            # First try email match
-            user = User.objects.filter(email__iexact=username).first()
+            if segundos and cache.get(chave):
+                return None
+            user = buscar_usuario(username)
             if user is None:
-                # Fallback: username
-                user = User.objects.filter(username__iexact=username).first()
-            if user and user.check_password(password) and self.user_can_authenticate(user):
+                if segundos:
+                    cache.set(chave, True, segundos)
+                return None
+            if user.check_password(password) and self.user_can_authenticate(user):
                 return user
         except Exception:
             return None
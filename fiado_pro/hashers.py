@@ -0,0 +1,32 @@
+# fiado_pro/hashers.py
+"""
+PBKDF2 com o nº de iterações vindo das settings (CARTEIRA_PBKDF2_ITERACOES).
+
+O custo de cada login/confirmação de senha é praticamente todo o PBKDF2: a política é
+escolhida medindo (comando `bench_senha`, que mostra ms de CPU por verificação e sugere
+as iterações para um alvo em ms) em vez de herdar o padrão do Django da versão instalada.
+
+Uso (settings):
+    PASSWORD_HASHERS = [
+        "fiado_pro.hashers.PBKDF2Configuravel",   # no lugar do PBKDF2PasswordHasher
+        "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+        ...
+    ]
+    CARTEIRA_PBKDF2_ITERACOES = 600_000
+
+O algoritmo continua "pbkdf2_sha256": os hashes existentes seguem válidos. Quando a política
+muda, cada hash é regravado com as novas iterações no próximo login ou confirmação de senha
+certa (must_update do Django), sem migração nem reset de senhas.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+# abaixo disto o hash fica barato demais para resistir a força bruta offline
+MINIMO_ITERACOES = 100_000
+
+
+class PBKDF2Configuravel(PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        configurado = getattr(settings, "CARTEIRA_PBKDF2_ITERACOES", PBKDF2PasswordHasher.iterations)
+        return max(int(configurado), MINIMO_ITERACOES)